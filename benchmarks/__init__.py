@@ -0,0 +1 @@
+# Benchmarks for parsing, matching and controller latency
@@ -0,0 +1,215 @@
+import argparse
+import ipaddress
+import json
+import random
+import sys
+from typing import Dict, Iterator, List, Optional, Sequence
+
+SEPARATOR = "-" * 70
+# FirewallManager's built-in ranges, repeated so generating never creates a backend
+DEFAULT_TARGETS = ["34.1.48.0/20", "34.152.84.0/23", "34.166.0.0/16", "34.177.48.0/23", "35.192.0.0/12", "34.32.0.0/11"]
+
+# Labels and values netsh prints, per display language
+LAYOUTS = {
+    "en": {
+        "labels": {
+            "name": "Rule Name", "enabled": "Enabled", "direction": "Direction", "profiles": "Profiles",
+            "grouping": "Grouping", "localip": "LocalIP", "remoteip": "RemoteIP", "protocol": "Protocol",
+            "localport": "LocalPort", "remoteport": "RemotePort", "edge": "Edge traversal",
+            "program": "Program", "action": "Action",
+        },
+        "yes": "Yes", "no": "No", "in": "In", "out": "Out",
+        "actions": {"Block": "Block", "Allow": "Allow"},
+        "profiles": "Domain,Private,Public", "any": "Any", "ok": "Ok.",
+    },
+    "de": {
+        "labels": {
+            "name": "Regelname", "enabled": "Aktiviert", "direction": "Richtung", "profiles": "Profile",
+            "grouping": "Gruppierung", "localip": "Lokale IP", "remoteip": "Remote-IP", "protocol": "Protokoll",
+            "localport": "Lokaler Port", "remoteport": "Remoteport", "edge": "Edgeausnahme",
+            "program": "Programm", "action": "Aktion",
+        },
+        "yes": "Ja", "no": "Nein", "in": "Eingehend", "out": "Ausgehend",
+        "actions": {"Block": "Blockieren", "Allow": "Zulassen"},
+        "profiles": "Domäne,Privat,Öffentlich", "any": "Beliebig", "ok": "OK.",
+    },
+}
+
+PROGRAMS = [
+    r"C:\Program Files\Mozilla Firefox\firefox.exe",
+    r"C:\Program Files (x86)\Steam\steam.exe",
+    r"C:\Program Files (x86)\Overwatch\_retail_\Overwatch.exe",
+    r"%SystemRoot%\system32\svchost.exe",
+    r"C:\Windows\System32\spoolsv.exe",
+]
+GROUPS = ["", "@FirewallAPI.dll,-28502", "Core Networking", "File and Printer Sharing", "Remote Desktop"]
+
+def random_address(rng: random.Random) -> str:
+    """A public-looking address outside our target ranges"""
+    return f"{rng.randint(1, 33)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+def target_address(rng: random.Random, networks: Sequence[ipaddress.IPv4Network]) -> str:
+    """A prefix inside one of the target networks, written with a dotted mask like netsh does"""
+    network = rng.choice(networks)
+    prefix = max(network.prefixlen, rng.choice([20, 24, 28, 32]))
+    subnets = 1 << (prefix - network.prefixlen)
+    subnet = ipaddress.IPv4Network((int(network.network_address) + rng.randrange(subnets) * (1 << (32 - prefix)), prefix))
+    return f"{subnet.network_address}/{subnet.netmask}"
+
+def generate_rules(count: int, target_share: float = 0.05, target_cidrs: Optional[List[str]] = None,
+                   seed: int = 0) -> List[Dict]:
+    """Rule records resembling a typical Windows firewall, with target_share of them blocking targets"""
+    rng = random.Random(seed)
+    networks = [ipaddress.IPv4Network(cidr) for cidr in (target_cidrs or DEFAULT_TARGETS)]
+    rules = []
+    for index in range(count):
+        direction = "inbound" if rng.random() < 0.7 else "outbound"
+        if rng.random() < target_share:
+            remote = ",".join(target_address(rng, networks) for _ in range(rng.randint(1, 4)))
+            rules.append({"name": f"Block Target {index}", "direction": direction, "action": "Block",
+                          "enabled": rng.random() < 0.8, "remoteip": remote, "protocol": "Any"})
+            continue
+
+        kind = rng.random()
+        if kind < 0.6:
+            remote = "Any"
+        elif kind < 0.75:
+            remote = "LocalSubnet"
+        else:
+            remote = ",".join(f"{random_address(rng)}/255.255.255.255" for _ in range(rng.randint(1, 3)))
+        protocol = rng.choice(["TCP", "UDP", "Any", "ICMPv4"])
+        rule = {"name": f"{rng.choice(['App', 'Service', 'Core Networking', 'Game'])} Rule {index}",
+                "direction": direction, "action": "Block" if rng.random() < 0.1 else "Allow",
+                "enabled": rng.random() < 0.9, "remoteip": remote, "protocol": protocol,
+                "grouping": rng.choice(GROUPS)}
+        if protocol in ("TCP", "UDP"):
+            rule["localport"] = str(rng.randint(1, 65535)) if rng.random() < 0.5 else "Any"
+            rule["remoteport"] = "Any"
+        if rng.random() < 0.5:
+            rule["program"] = rng.choice(PROGRAMS)
+        rules.append(rule)
+    return rules
+
+def format_rules(rules: List[Dict], layout: str = "en") -> Iterator[str]:
+    """Lines of `show rule name=all` output for the given records"""
+    words = LAYOUTS[layout]
+    labels = words["labels"]
+    width = max(len(label) for label in labels.values()) + 2
+
+    def field(key: str, value: str) -> str:
+        return f"{labels[key] + ':':<{width}}{value}".rstrip()
+
+    for rule in rules:
+        yield ""
+        yield field("name", rule["name"])
+        yield SEPARATOR
+        yield field("enabled", words["yes"] if rule["enabled"] else words["no"])
+        yield field("direction", words["in"] if rule["direction"] == "inbound" else words["out"])
+        yield field("profiles", words["profiles"])
+        yield field("grouping", rule.get("grouping", ""))
+        yield field("localip", words["any"])
+        yield field("remoteip", words["any"] if rule["remoteip"] == "Any" else rule["remoteip"])
+        yield field("protocol", words["any"] if rule["protocol"] == "Any" else rule["protocol"])
+        if rule["protocol"] in ("TCP", "UDP"):
+            for key in ("localport", "remoteport"):
+                value = rule.get(key, "Any")
+                yield field(key, words["any"] if value == "Any" else value)
+        yield field("edge", words["no"])
+        if rule.get("program"):
+            yield field("program", rule["program"])
+        yield field("action", words["actions"][rule["action"]])
+    yield ""
+    yield words["ok"]
+
+def format_json_rules(rules: List[Dict]) -> Iterator[str]:
+    """Lines the PowerShell rule source prints: one JSON object per rule with an IPv4 remote address"""
+    for rule in rules:
+        # PowerShell filters out Any, LocalSubnet and the like before printing
+        if not rule["remoteip"][:1].isdigit():
+            continue
+        yield json.dumps({"name": rule["name"], "direction": "Inbound" if rule["direction"] == "inbound" else "Outbound",
+                          "enabled": "True" if rule["enabled"] else "False", "action": rule["action"],
+                          "remoteip": rule["remoteip"]}, separators=(",", ":"))
+
+def generate_dump(count: int, layout: str = "en", target_share: float = 0.05, seed: int = 0,
+                  target_cidrs: Optional[List[str]] = None) -> str:
+    """Complete `show rule name=all` output with count rules, or PowerShell JSON lines for the "json" layout"""
+    rules = generate_rules(count, target_share, target_cidrs, seed)
+    lines = format_json_rules(rules) if layout == "json" else format_rules(rules, layout)
+    return "\n".join(lines) + "\n"
+
+# Column layouts of netstat, per platform
+NETSTAT_LAYOUTS = {
+    "windows": {
+        "header": ["", "Active Connections", "", "  Proto  Local Address          Foreign Address        State           PID"],
+        "states": ["ESTABLISHED", "ESTABLISHED", "ESTABLISHED", "TIME_WAIT", "CLOSE_WAIT", "SYN_SENT"],
+    },
+    "linux": {
+        "header": ["Active Internet connections (servers and established)",
+                   "Proto Recv-Q Send-Q Local Address           Foreign Address         State       PID/Program name"],
+        "states": ["ESTABLISHED", "ESTABLISHED", "ESTABLISHED", "TIME_WAIT", "CLOSE_WAIT", "SYN_SENT"],
+    },
+}
+
+def format_socket(layout: str, protocol: str, local: str, remote: str, state: str, pid: int, program: str) -> str:
+    """One socket line the way netstat prints it"""
+    if layout == "windows":
+        return f"  {protocol.upper():<7}{local:<23}{remote:<23}{state:<16}{pid}"
+    owner = f"{pid}/{program}" if pid else "-"
+    return f"{protocol.lower():<6}{0:>6} {0:>6} {local:<24}{remote:<24}{state:<12}{owner}"
+
+def generate_netstat(count: int, layout: str = "windows", target_share: float = 0.01, seed: int = 0,
+                     target_cidrs: Optional[List[str]] = None) -> str:
+    """netstat output with count sockets, target_share of them connected to target ranges"""
+    rng = random.Random(seed)
+    networks = [ipaddress.IPv4Network(cidr) for cidr in (target_cidrs or DEFAULT_TARGETS)]
+    words = NETSTAT_LAYOUTS[layout]
+    wildcard = "0.0.0.0:0" if layout == "windows" else "0.0.0.0:*"
+    lines = list(words["header"])
+    for _ in range(count):
+        pid = rng.randint(4, 30000)
+        program = rng.choice(PROGRAMS).rsplit("\\", 1)[-1]
+        local = f"192.168.1.{rng.randint(2, 254)}:{rng.randint(1024, 65535)}"
+        kind = rng.random()
+        if kind < 0.15:
+            # Listening sockets
+            lines.append(format_socket(layout, "tcp", f"0.0.0.0:{rng.randint(1, 65535)}", wildcard, "LISTENING"
+                                       if layout == "windows" else "LISTEN", pid, program))
+            continue
+        if kind < 0.25:
+            lines.append(format_socket(layout, "udp", local, "*:*" if layout == "windows" else wildcard, "", pid, program))
+            continue
+        if rng.random() < target_share:
+            network = rng.choice(networks)
+            address = ipaddress.IPv4Address(int(network.network_address) + rng.randrange(network.num_addresses))
+        else:
+            address = random_address(rng)
+        lines.append(format_socket(layout, "tcp", local, f"{address}:{rng.choice([443, 80, 3074, 26503])}",
+                                   rng.choice(words["states"]), pid, program))
+    return "\n".join(lines) + "\n"
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Write a synthetic dump to stdout or a file"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.generator")
+    parser.add_argument("count", type=int, help="number of rules, or sockets with --netstat")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS) + ["json"], default="en",
+                        help="netsh display language, or json for the PowerShell rule source")
+    parser.add_argument("--netstat", choices=sorted(NETSTAT_LAYOUTS), help="write netstat output in this layout instead")
+    parser.add_argument("--target-share", type=float, default=0.05, help="fraction of rules blocking target ranges")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.netstat:
+        dump = generate_netstat(args.count, args.netstat, args.target_share, args.seed)
+    else:
+        dump = generate_dump(args.count, args.layout, args.target_share, args.seed)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(dump)
+    else:
+        sys.stdout.write(dump)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
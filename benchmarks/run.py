@@ -0,0 +1,281 @@
+import argparse
+import gc
+import ipaddress
+import json
+import platform
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from src.core.backends.powershell import iter_json_rules
+from src.core.backends.simulator import SimulatedBackend
+from src.core.firewall import FirewallManager
+from src.core.rule_parser import iter_output_lines, iter_rules
+from src.core.rule_store import FirewallRule, RuleStore
+
+from .generator import LAYOUTS, NETSTAT_LAYOUTS, format_rules, generate_dump, generate_netstat, generate_rules
+
+SIZES = [100, 1000, 10000, 50000]
+SOCKET_COUNTS = [1000, 10000, 50000]
+CIDR_COUNTS = [6, 100, 1000, 10000]
+
+def best_of(repeat: int, function: Callable[[], object]) -> float:
+    """Fastest wall time of repeat runs, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def random_cidrs(count: int, seed: int = 0) -> List[str]:
+    """count distinct /24 prefixes, the shape of a large published blocklist"""
+    rng = random.Random(seed)
+    prefixes = set()
+    while len(prefixes) < count:
+        prefixes.add(rng.randrange(1 << 24))
+    return [str(ipaddress.IPv4Network((prefix << 8, 24))) for prefix in sorted(prefixes)]
+
+def count_rules(analyzed_rules: Dict[str, Dict[str, List[str]]]) -> int:
+    """Total number of rules in an analyze_rules result"""
+    return sum(len(names) for states in analyzed_rules.values() for names in states.values())
+
+def bench_parse(sizes: List[int], target_share: float, repeat: int) -> List[Dict]:
+    """analyze_rules throughput on captured dumps, per size and layout, and on PowerShell JSON lines"""
+    firewall = FirewallManager(SimulatedBackend())
+
+    def analyze(dump: str, layout: str):
+        if layout == "json":
+            return firewall.analyze_records(iter_json_rules(dump.splitlines()))
+        return firewall.analyze_rules(dump)
+
+    results = []
+    for size in sizes:
+        for layout in sorted(LAYOUTS) + ["json"]:
+            dump = generate_dump(size, layout, target_share)
+            matched = count_rules(analyze(dump, layout))
+            seconds = best_of(repeat, lambda: analyze(dump, layout))
+            results.append({
+                "rules": size,
+                "layout": layout,
+                "bytes": len(dump.encode("utf-8")),
+                "matched": matched,
+                "seconds": seconds,
+                "rules_per_second": size / seconds,
+                "mb_per_second": len(dump.encode("utf-8")) / seconds / 1e6,
+            })
+    return results
+
+def bench_memory(sizes: List[int], target_share: float) -> List[Dict]:
+    """Peak allocations while analyzing, for a captured string and for streamed lines, and memory kept per rule"""
+    firewall = FirewallManager(SimulatedBackend())
+    results = []
+    for size in sizes:
+        rules = generate_rules(size, target_share)
+        dump = "\n".join(format_rules(rules)) + "\n"
+
+        gc.collect()
+        tracemalloc.start()
+        firewall.analyze_rules(dump)
+        _, captured_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        gc.collect()
+        tracemalloc.start()
+        firewall.analyze_rules(format_rules(rules))
+        _, streamed_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # Memory kept for every rule: parsed records as dicts, and the same rules in a RuleStore
+        gc.collect()
+        tracemalloc.start()
+        records = list(iter_rules(format_rules(rules)))
+        records_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        gc.collect()
+        tracemalloc.start()
+        store = RuleStore(FirewallRule.from_record(record) for record in iter_rules(format_rules(rules)))
+        store_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del records, store
+
+        results.append({
+            "rules": size,
+            "dump_bytes": len(dump.encode("utf-8")),
+            "captured_peak_bytes": captured_peak,
+            "streamed_peak_bytes": streamed_peak,
+            "records_bytes": records_bytes,
+            "store_bytes": store_bytes,
+        })
+    return results
+
+def bench_matching(size: int, cidr_counts: List[int], target_share: float, repeat: int) -> List[Dict]:
+    """Cost of matching pre-parsed rules as the number of target CIDRs grows"""
+    results = []
+    for cidr_count in cidr_counts:
+        cidrs = random_cidrs(cidr_count)
+        records = list(iter_rules(iter_output_lines(generate_dump(size, target_share=target_share, target_cidrs=cidrs))))
+        firewall = FirewallManager(SimulatedBackend())
+        firewall.IP_LIST = cidrs
+
+        index_seconds = best_of(1, lambda: firewall.target_index)
+        # analyze_records annotates records in place, so every run gets fresh copies
+        seconds = best_of(repeat, lambda: firewall.analyze_records(dict(record) for record in records))
+        results.append({
+            "rules": size,
+            "target_cidrs": cidr_count,
+            "index_build_seconds": index_seconds,
+            "seconds": seconds,
+            "rules_per_second": size / seconds,
+        })
+    return results
+
+def bench_audit(socket_counts: List[int], repeat: int) -> List[Dict]:
+    """Connection audit throughput on netstat snapshots, per size and layout"""
+    firewall = FirewallManager(SimulatedBackend())
+    results = []
+    for count in socket_counts:
+        for layout in sorted(NETSTAT_LAYOUTS):
+            lines = generate_netstat(count, layout).splitlines(keepends=True)
+            _, report = firewall.audit_connections(lines)
+            seconds = best_of(repeat, lambda: firewall.audit_connections(lines))
+            results.append({
+                "sockets": report["sockets"],
+                "layout": layout,
+                "offending": report["offending"],
+                "seconds": seconds,
+                "sockets_per_second": report["sockets"] / seconds,
+            })
+    return results
+
+class HeadlessRoot:
+    """Stand-in for the Tk root: runs after(0, ...) callbacks at once, drops timers"""
+
+    def after(self, delay_ms: int, callback: Callable[[], None]):
+        if delay_ms == 0:
+            callback()
+
+class HeadlessLog:
+    """Stand-in for the log textbox"""
+
+    def insert(self, index: str, text: str):
+        pass
+
+class HeadlessGui:
+    """Just enough of MainWindow for AppController, signalling each status redraw"""
+
+    def __init__(self):
+        self.root = HeadlessRoot()
+        self.log = HeadlessLog()
+        self.updated = threading.Event()
+        self.last_status = None
+
+    def get_root(self):
+        return self.root
+
+    def get_log_widget(self):
+        return self.log
+
+    def set_buttons_state(self, enabled: bool):
+        pass
+
+    def set_profiles(self, names: List[str], active: str):
+        pass
+
+    def update_button_states(self, active: int, disabled: int):
+        self.updated.set()
+
+    def update_status_display(self, rules: Dict, provisional: bool = False):
+        self.last_status = rules
+        self.updated.set()
+
+    def confirm_status(self):
+        self.updated.set()
+
+def bench_controller(sizes: List[int], target_share: float, latency: float, per_rule_latency: float) -> List[Dict]:
+    """Time from a button press until the status redraw, against the simulated firewall"""
+    from src.core.app_controller import AppController
+    from src.utils.logger import Logger
+    from src.utils.state_store import StateStore
+
+    results = []
+    for size in sizes:
+        backend = SimulatedBackend(latency, per_rule_latency)
+        for rule in generate_rules(size, target_share):
+            backend.add_rule(**rule)
+        gui = HeadlessGui()
+        state_path = os.path.join(tempfile.gettempdir(), "owmeblock-bench-state.json")
+        controller = AppController(gui, Logger(), FirewallManager(backend), StateStore(state_path))
+
+        timings = {}
+        for name, action in (("scan", controller.scan_rules), ("block", controller.block_ips),
+                             ("rescan", controller.scan_rules), ("unblock", controller.unblock_ips),
+                             ("delete", controller.delete_rules)):
+            # A scan submitted while the previous operation finishes would be coalesced away
+            while controller.scheduler.is_busy():
+                time.sleep(0.001)
+            gui.updated.clear()
+            start = time.perf_counter()
+            action()
+            gui.updated.wait()
+            timings[name] = time.perf_counter() - start
+
+        controller.shutdown()
+        results.append({"rules": size, "seconds": timings, "netsh_calls": dict(backend.calls)})
+    return results
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmarks and write the results as JSON"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma separated rule counts")
+    parser.add_argument("--cidrs", default=",".join(map(str, CIDR_COUNTS)), help="comma separated target CIDR counts")
+    parser.add_argument("--target-share", type=float, default=0.05, help="fraction of generated rules blocking targets")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per timing, the fastest is kept")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per netsh process")
+    parser.add_argument("--per-rule-latency", type=float, default=0.0, help="simulated seconds per listed rule")
+    parser.add_argument("--sockets", default=",".join(map(str, SOCKET_COUNTS)), help="comma separated netstat socket counts")
+    parser.add_argument("--only", choices=["parse", "memory", "matching", "controller", "audit"], action="append",
+                        help="run only these benchmarks (repeatable)")
+    parser.add_argument("--output", help="JSON file to write instead of stdout")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    selected = args.only or ["parse", "memory", "matching", "controller", "audit"]
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "target_share": args.target_share,
+        "results": {},
+    }
+    results = report["results"]
+    if "parse" in selected:
+        results["parse"] = bench_parse(sizes, args.target_share, args.repeat)
+    if "memory" in selected:
+        results["memory"] = bench_memory(sizes, args.target_share)
+    if "matching" in selected:
+        results["matching"] = bench_matching(min(max(sizes), 10000), [int(count) for count in args.cidrs.split(",")],
+                                             args.target_share, args.repeat)
+    if "controller" in selected:
+        results["controller"] = bench_controller(sizes, args.target_share, args.latency, args.per_rule_latency)
+    if "audit" in selected:
+        results["audit"] = bench_audit([int(count) for count in args.sockets.split(",")], args.repeat)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,9 +5,6 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.core.admin import AdminManager
-from src.core.app_controller import AppController
-from src.gui.main_window import MainWindow
-from src.utils.logger import Logger
 
 class OverwatchFirewallManager:
     def __init__(self):
@@ -16,6 +13,11 @@ class OverwatchFirewallManager:
             AdminManager.request_admin()
             return
         
+        # The GUI stack is only imported here so command line runs never load it
+        from src.core.app_controller import AppController
+        from src.gui.main_window import MainWindow
+        from src.utils.logger import Logger
+        
         # Initialize components
         self.logger = Logger()
         
@@ -24,14 +26,22 @@ class OverwatchFirewallManager:
             on_block_callback=self.block_ips,
             on_unblock_callback=self.unblock_ips,
             on_delete_callback=self.delete_rules,
-            on_scan_callback=self.scan_rules
+            on_scan_callback=self.scan_rules,
+            on_close_callback=self.shutdown,
+            on_metrics_callback=self.show_metrics,
+            on_watch_callback=self.set_watch,
+            watch_enabled=os.environ.get("OWMEBLOCK_WATCH") == "1",
+            on_profile_callback=self.switch_profile,
+            on_audit_callback=self.audit_connections
         )
         
         # Initialize controller
         self.controller = AppController(self.gui, self.logger)
         
-        # Initial scan
-        self.controller.scan_rules()
+        # Show the last known state, then verify it with a scan
+        self.controller.start()
+        if os.environ.get("OWMEBLOCK_WATCH") == "1":
+            self.controller.set_watch(True)
     
     def block_ips(self):
         """Block IP addresses callback"""
@@ -49,12 +59,36 @@ class OverwatchFirewallManager:
         """Scan rules callback"""
         self.controller.scan_rules()
     
+    def switch_profile(self, profile: str):
+        """Profile menu callback"""
+        self.controller.switch_profile(profile)
+    
+    def set_watch(self, enabled: bool):
+        """Watch mode checkbox callback"""
+        self.controller.set_watch(enabled)
+    
+    def audit_connections(self):
+        """Connections button callback"""
+        self.controller.audit_connections()
+    
+    def show_metrics(self):
+        """Metrics hotkey callback"""
+        self.controller.log_metrics()
+    
+    def shutdown(self):
+        """Window close callback"""
+        self.controller.shutdown()
+    
     def run(self):
         """Start the application"""
         self.logger.log_success("Overwatch Firewall Manager started")
         self.gui.run()
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        from src.cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+    
     try:
         app = OverwatchFirewallManager()
         app.run()
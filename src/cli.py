@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional, Tuple
+
+from .core.admin import AdminManager
+from .core.firewall import FirewallManager, create_backend
+from .core.watcher import DriftWatcher
+from .utils.metrics import metrics
+from .utils.state_store import StateStore
+
+def print_results(results: List[Tuple[str, bool, str]], verb: str) -> int:
+    """Print per-rule results and return how many failed"""
+    failures = 0
+    for name, success, output in results:
+        if success:
+            print(f"{verb} rule: {name}")
+        else:
+            failures += 1
+            print(f"Failed to {verb.lower()} rule {name}: {output.strip()}", file=sys.stderr)
+    return failures
+
+def block(firewall: FirewallManager) -> int:
+    """Create, repair and enable the blocking rules"""
+    success, steps = firewall.plan_block()
+    if not success:
+        print("Failed to get firewall rules for blocking", file=sys.stderr)
+        return 1
+    if not steps:
+        print("Blocking rules are already up to date")
+        return 0
+
+    return 1 if print_steps(firewall.apply_plan(steps)) else 0
+
+def print_steps(applied) -> int:
+    """Print per-step results of a reconcile plan and return how many failed"""
+    failures = 0
+    for step, success, output in applied:
+        if success:
+            print(f"{step.action}: {step.name}")
+        else:
+            failures += 1
+            print(f"Failed to {step.action} {step.name}: {output.strip()}", file=sys.stderr)
+    return failures
+
+def switch(firewall: FirewallManager, profile: str) -> int:
+    """Make profile the active one, flipping enable flags of the already created rules"""
+    try:
+        success, applied = firewall.switch_profile(profile)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    if not success:
+        print("Failed to get firewall rules for switching profile", file=sys.stderr)
+        return 1
+    if print_steps(applied):
+        print(f"Profile {profile} was not applied, {firewall.active_profile} stays active", file=sys.stderr)
+        return 1
+    StateStore().save_profile(profile)
+    return 0
+
+def profiles(firewall: FirewallManager) -> int:
+    """List profiles and the regions they block"""
+    for name in firewall.profiles.profile_names():
+        marker = "*" if name == firewall.active_profile else " "
+        regions = firewall.profiles.regions_for(name)
+        print(f"{marker} {name}: {', '.join(regions) if regions else 'nothing blocked'}")
+    return 0
+
+def watch(firewall: FirewallManager, interval: float, max_interval: float) -> int:
+    """Block, then keep restoring our rules whenever something else changes them"""
+    result = block(firewall)
+    if result:
+        return result
+
+    def check():
+        success, drifted, current = firewall.detect_drift()
+        if not success:
+            print("Failed to check the blocking rules", file=sys.stderr)
+            return None
+        if not drifted:
+            return False
+        print("Blocking rules were changed outside owmeblock, restoring them")
+        print_steps(firewall.repair_drift(current))
+        return True
+
+    watcher = DriftWatcher(check, interval, max_interval)
+    watcher.start()
+    print("Watching the blocking rules, press Ctrl+C to stop")
+    try:
+        while watcher.is_running():
+            watcher.thread.join(1)
+    except KeyboardInterrupt:
+        watcher.stop()
+    return 0
+
+def unblock(firewall: FirewallManager) -> int:
+    """Disable every enabled target rule, including those created by other programs"""
+    success, analyzed_rules = firewall.scan_target_rules(full=True)
+    if not success:
+        print("Failed to get firewall rules for unblocking", file=sys.stderr)
+        return 1
+    names = analyzed_rules["inbound"]["enabled"] + analyzed_rules["outbound"]["enabled"]
+    if not names:
+        print("No enabled target rules found to unblock")
+        return 0
+    return 1 if print_results(firewall.disable_rules(names), "Disabled") else 0
+
+def delete(firewall: FirewallManager) -> int:
+    """Delete every rule that covers the target ranges"""
+    success, analyzed_rules = firewall.scan_target_rules(full=True)
+    if not success:
+        print("Failed to get firewall rules for deletion", file=sys.stderr)
+        return 1
+    names = [name for states in analyzed_rules.values() for names in states.values() for name in names]
+    if not names:
+        print("No target rules found to delete")
+        return 0
+    return 1 if print_results(firewall.delete_rules(names), "Deleted") else 0
+
+def status(firewall: FirewallManager, as_json: bool) -> int:
+    """Print how many target rules are active and disabled"""
+    success, analyzed_rules = firewall.scan_target_rules()
+    if not success:
+        print("Failed to get firewall rules", file=sys.stderr)
+        return 1
+
+    if as_json:
+        print(json.dumps({
+            direction: {state: {"count": len(names), "rules": names} for state, names in states.items()}
+            for direction, states in analyzed_rules.items()
+        }, indent=2))
+    else:
+        for direction, states in analyzed_rules.items():
+            print(f"{direction.capitalize()}: {len(states['enabled'])} active, {len(states['disabled'])} disabled")
+    return 0
+
+def classify(firewall: FirewallManager, paths: List[str], column: Optional[str], as_json: bool, limit: int) -> int:
+    """Count how many addresses from connection or capture exports fall into the target ranges"""
+    # Imported here so the other commands start without loading numpy
+    from .core.classifier import RangeClassifier
+
+    classifier = RangeClassifier(firewall.all_target_cidrs())
+    for path in paths:
+        try:
+            classifier.add_file(path, column)
+        except (OSError, ValueError) as e:
+            print(f"Could not read {path}: {e}", file=sys.stderr)
+            return 1
+    report = classifier.report(limit)
+
+    if as_json:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f"{report['total']} addresses: {report['matched']} in target ranges, {report['unmatched']} outside, "
+          f"{report['invalid']} invalid")
+    for cidr, hits in report["ranges"].items():
+        if hits:
+            print(f"  {cidr}: {hits}")
+    if report["unmatched_addresses"]:
+        print("Most frequent addresses outside the target ranges:")
+        for entry in report["unmatched_addresses"]:
+            print(f"  {entry['address']}: {entry['count']}")
+    return 0
+
+def audit(firewall: FirewallManager, path: Optional[str], as_json: bool) -> int:
+    """List processes that still hold connections to blocked ranges"""
+    try:
+        if path:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                success, report = firewall.audit_connections(f)
+        else:
+            success, report = firewall.audit_connections()
+    except OSError as e:
+        print(f"Could not read {path}: {e}", file=sys.stderr)
+        return 1
+    if not success:
+        print("Failed to list open connections", file=sys.stderr)
+        return 1
+
+    if as_json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['sockets']} sockets, {report['offending']} connected to blocked ranges")
+        for process in report["processes"]:
+            program = f" ({process['program']})" if process["program"] else ""
+            for connection in process["connections"]:
+                state = f" {connection['state']}" if connection["state"] else ""
+                print(f"  PID {process['pid']}{program}: {connection['protocol']} {connection['local']} -> "
+                      f"{connection['remote']}{state} [{connection['region']}]")
+    # Non-zero so launch scripts can tell the block isn't effective yet
+    return 2 if report["offending"] else 0
+
+def build_parser() -> argparse.ArgumentParser:
+    """Command line interface used when main.py is given arguments"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--list", dest="blocklist", help="text, ip-ranges JSON or binary blocklist to use instead of the built-in ranges")
+    common.add_argument("--region", help="only use prefixes from this region or scope of an ip-ranges JSON file")
+    common.add_argument("--backend", help="firewall backend to use (netsh, powershell, nftables or simulator, default from OWMEBLOCK_BACKEND)")
+    common.add_argument("--profile", help="blocking profile to use instead of the one chosen last")
+    common.add_argument("--metrics", action="store_true", help="print operation timings to stderr when done")
+    common.add_argument("--metrics-json", help="write operation timings as JSON to this file")
+
+    parser = argparse.ArgumentParser(prog="main.py", description="Block Overwatch Middle East servers without opening the GUI")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("block", parents=[common], help="create or enable the blocking rules")
+    commands.add_parser("unblock", parents=[common], help="disable the blocking rules")
+    commands.add_parser("delete", parents=[common], help="delete every rule covering the target ranges")
+    status_parser = commands.add_parser("status", parents=[common], help="show the current rule state")
+    status_parser.add_argument("--json", action="store_true", help="print machine readable output")
+    commands.add_parser("apply", parents=[common], help="block the ranges from --list, updating existing rules in place")
+    switch_parser = commands.add_parser("switch", parents=[common], help="make another profile active, only flipping rules on or off")
+    switch_parser.add_argument("name", help="profile to switch to")
+    commands.add_parser("profiles", parents=[common], help="list the blocking profiles")
+    watch_parser = commands.add_parser("watch", parents=[common], help="block, then restore the rules whenever they are changed")
+    watch_parser.add_argument("--interval", type=float, default=5, help="seconds between checks right after a change")
+    watch_parser.add_argument("--max-interval", type=float, default=120, help="longest wait between checks while nothing changes")
+    classify_parser = commands.add_parser("classify", parents=[common], help="count addresses from log or capture files per target range")
+    classify_parser.add_argument("files", nargs="+", help="text files with one address per line, or CSV files")
+    classify_parser.add_argument("--column", help="CSV column holding the addresses, by header name or position")
+    classify_parser.add_argument("--unmatched", type=int, default=20, help="how many unmatched addresses to list")
+    classify_parser.add_argument("--json", action="store_true", help="print machine readable output")
+    audit_parser = commands.add_parser("audit", parents=[common], help="list open connections to blocked ranges")
+    audit_parser.add_argument("--input", help="saved netstat -ano output to check instead of a live snapshot")
+    audit_parser.add_argument("--json", action="store_true", help="print machine readable output")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run one command against the firewall and return the exit code"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == "apply" and not args.blocklist:
+        parser.error("apply needs --list")
+    if args.command not in ("status", "profiles", "classify", "audit") and os.name == "nt" and not AdminManager.is_admin():
+        print("Administrator privileges are required to change firewall rules", file=sys.stderr)
+        return 1
+
+    if args.metrics or args.metrics_json:
+        metrics.enabled = True
+
+    firewall = FirewallManager(create_backend(args.backend))
+    try:
+        with metrics.span(f"cli.{args.command}"):
+            if args.blocklist:
+                firewall.load_blocklist(args.blocklist, args.region)
+            if firewall.profile_error:
+                print(f"Could not load profiles: {firewall.profile_error}", file=sys.stderr)
+            profile = args.profile or StateStore().load_profile()
+            if profile in firewall.profiles.profiles:
+                firewall.active_profile = profile
+            elif args.profile:
+                parser.error(f"unknown profile: {args.profile}")
+
+            if args.command in ("block", "apply"):
+                return block(firewall)
+            if args.command == "unblock":
+                return unblock(firewall)
+            if args.command == "delete":
+                return delete(firewall)
+            if args.command == "switch":
+                return switch(firewall, args.name)
+            if args.command == "profiles":
+                return profiles(firewall)
+            if args.command == "watch":
+                return watch(firewall, args.interval, args.max_interval)
+            if args.command == "audit":
+                return audit(firewall, args.input, args.json)
+            if args.command == "classify":
+                return classify(firewall, args.files, args.column, args.json, args.unmatched)
+            return status(firewall, args.json)
+    finally:
+        firewall.close()
+        if args.metrics:
+            for line in metrics.report():
+                print(line, file=sys.stderr)
+        if args.metrics_json:
+            metrics.dump(args.metrics_json)
@@ -1,165 +1,420 @@
+import json
+import os
+import tempfile
 import threading
-from typing import Dict
+from typing import Callable, Dict, Iterable, Optional, Tuple
 
-from ..core.firewall import FirewallManager
+from ..core.firewall import FirewallManager, Progress
+from ..core.scheduler import OperationScheduler
+from ..core.watcher import DriftWatcher
 from ..utils.logger import Logger
+from ..utils.metrics import metrics
+from ..utils.state_store import StateStore
 
 class AppController:
-    def __init__(self, gui, logger: Logger):
+    def __init__(self, gui, logger: Logger, firewall: Optional[FirewallManager] = None, state_store: Optional[StateStore] = None):
         self.gui = gui
         self.logger = logger
-        self.firewall = FirewallManager()
+        self.firewall = firewall or FirewallManager()
+        self.scheduler = OperationScheduler()
+        self.state_store = state_store or StateStore()
+        # What the status display shows, and whether it still awaits a real scan
+        self.displayed: Optional[Dict[str, Dict[str, int]]] = None
+        self.provisional = False
+        # Whether the block should be in force; None until the first scan tells
+        self.keep_blocked: Optional[bool] = None
+        self.watcher = DriftWatcher(self.check_block)
+        
+        saved_profile = self.state_store.load_profile()
+        if saved_profile in self.firewall.profiles.profiles:
+            self.firewall.active_profile = saved_profile
         
         self.logger.set_log_widget(self.gui.get_log_widget(), self.gui.get_root())
     
-    def scan_rules(self):
-        """Scan for existing firewall rules"""
-        self.logger.log_info("Scanning existing firewall rules...")
+    def disable_buttons(self):
+        """Lock the buttons until the next status redraw"""
+        # The redraw that unlocks them can't be skipped as a provisional confirmation
+        self.provisional = False
         self.gui.set_buttons_state(False)
+    
+    def start(self):
+        """Show the state saved by the last session at once, then verify it in the background"""
+        self.gui.set_profiles(self.firewall.profiles.profile_names(), self.firewall.active_profile)
+        if self.firewall.profile_error:
+            self.logger.log_error(f"Could not load profiles, only the built-in ones are available: {self.firewall.profile_error}")
+        
+        saved = self.state_store.load(self.firewall.state_fingerprint())
+        if saved is None:
+            self.scan_rules()
+            return
+        
+        self.displayed = saved
+        self.provisional = True
+        self.gui.update_status_display(saved, provisional=True)
+        self.scheduler.submit("scan", self.timed("scan", self.refresh_status))
+    
+    def scan_rules(self, max_age: Optional[float] = None):
+        """Scan for existing firewall rules, reusing a snapshot younger than max_age"""
+        # Cleared before queueing, so the worker can't skip the redraw that unlocks the buttons
+        self.provisional = False
+        if self.scheduler.submit("scan", self.timed("scan", lambda: self.refresh_status(max_age))):
+            # A coalesced scan locks nothing: the operation that absorbed it redraws on its own
+            self.gui.set_buttons_state(False)
+    
+    def refresh_status(self, max_age: Optional[float] = None):
+        """Read the rule state and publish it to the GUI; runs on the scheduler worker"""
+        if self.scheduler.cancelled.is_set():
+            return
+        self.logger.log_info("Scanning existing firewall rules...")
+        
+        try:
+            success, store = self.firewall.scan_rule_store(max_age=max_age)
+            rules = store.counts() if success else self.firewall.count_by_state(None)
+            self.publish_status(rules)
+            if success:
+                self.state_store.save(rules, self.firewall.state_fingerprint())
+                if self.keep_blocked is None:
+                    self.keep_blocked = rules["inbound"]["enabled"] + rules["outbound"]["enabled"] > 0
+            
+            inbound_total = rules['inbound']['enabled'] + rules['inbound']['disabled']
+            outbound_total = rules['outbound']['enabled'] + rules['outbound']['disabled']
 
-        def scan_thread():
-            try:
-                rules = self.firewall.get_existing_rules_by_ip()
-                self.gui.root.after(0, lambda: self.gui.update_status_display(rules))
-                
-                inbound_total = rules['inbound']['enabled'] + rules['inbound']['disabled']
-                outbound_total = rules['outbound']['enabled'] + rules['outbound']['disabled']
-
-                if inbound_total > 0 or outbound_total > 0:
-                    inbound_msg = f"Inbound: {rules['inbound']['enabled']} active, {rules['inbound']['disabled']} disabled"
-                    outbound_msg = f"Outbound: {rules['outbound']['enabled']} active, {rules['outbound']['disabled']} disabled"
-                    self.gui.root.after(0, lambda: self.logger.log_success(f"Rule scan complete - {inbound_msg} | {outbound_msg}"))
-                else:
-                    self.gui.root.after(0, lambda: self.logger.log_info("No existing blocking rules found for target IPs"))
+            if inbound_total > 0 or outbound_total > 0:
+                inbound_msg = f"Inbound: {rules['inbound']['enabled']} active, {rules['inbound']['disabled']} disabled"
+                outbound_msg = f"Outbound: {rules['outbound']['enabled']} active, {rules['outbound']['disabled']} disabled"
+                self.logger.log_success(f"Rule scan complete - {inbound_msg} | {outbound_msg}")
+            else:
+                self.logger.log_info("No existing blocking rules found for target IPs")
 
+        except Exception as e:
+            self.logger.log_error(f"Error scanning rules: {str(e)}")
+            self.gui.root.after(0, lambda: self.gui.update_button_states(0, 0))
+    
+    def publish_status(self, rules: Dict[str, Dict[str, int]]):
+        """Hand a scan result to the GUI, skipping the redraw if it confirms a provisional display"""
+        if self.provisional and rules == self.displayed:
+            self.gui.root.after(0, self.gui.confirm_status)
+        else:
+            self.gui.root.after(0, lambda: self.gui.update_status_display(rules))
+        self.displayed = rules
+        self.provisional = False
+    
+    def set_watch(self, enabled: bool):
+        """Turn the background check that keeps the block in force on or off"""
+        if enabled:
+            self.watcher.start()
+            self.logger.log_info("Watch mode on: blocking rules changed by other programs will be restored")
+        else:
+            self.watcher.stop()
+            self.logger.log_info("Watch mode off")
+    
+    def check_block(self) -> Optional[bool]:
+        """Watcher callback: verify our rules on the scheduler worker and wait for the answer"""
+        if not self.keep_blocked:
+            return False
+        
+        result: Dict[str, Optional[bool]] = {}
+        finished = threading.Event()
+        
+        def watch_operation():
+            try:
+                result["drifted"] = self.restore_block()
+            finally:
+                finished.set()
+        
+        if not self.scheduler.submit("watch", self.timed("watch", watch_operation)):
+            return None
+        # The scheduler drops queued work on shutdown, so don't wait forever
+        finished.wait(self.watcher.max_interval)
+        return result.get("drifted")
+    
+    def restore_block(self) -> Optional[bool]:
+        """Repair our rules if something changed them; runs on the scheduler worker"""
+        if self.scheduler.cancelled.is_set() or not self.keep_blocked:
+            return None
+        success, drifted, current = self.firewall.detect_drift()
+        if not success:
+            return None
+        if not drifted:
+            return False
+        
+        self.logger.log_warning("Blocking rules were changed outside the app, restoring them...")
+        for step, success, output in self.firewall.repair_drift(current):
+            if success:
+                self.logger.log_success(f"✅ {self.describe_step(step)}")
+            else:
+                self.logger.log_error(f"❌ Failed: {self.describe_step(step)}: {output.strip()}")
+        self.refresh_status(max_age=self.firewall.SNAPSHOT_TTL)
+        return True
+    
+    def shutdown(self):
+        """Cancel queued and running operations when the window closes"""
+        self.watcher.stop()
+        self.scheduler.shutdown()
+        self.firewall.close()
+        if metrics.enabled:
+            try:
+                metrics.dump(self.metrics_path())
+            except OSError as e:
+                # Runs inside the window's close handler, which must not be cut short
+                self.logger.log_error(f"Could not write metrics: {str(e)}")
+    
+    @staticmethod
+    def timed(name: str, operation: Callable[[], None]) -> Callable[[], None]:
+        """Wrap a scheduler operation in a metrics span"""
+        def run():
+            with metrics.span(f"controller.{name}"):
+                operation()
+        return run
+    
+    @staticmethod
+    def metrics_path() -> str:
+        """Where collected metrics are written as JSON"""
+        return os.environ.get("OWMEBLOCK_METRICS_FILE") or os.path.join(tempfile.gettempdir(), "owmeblock-metrics.json")
+    
+    def log_metrics(self):
+        """Show the collected timings in the log, switching collection on the first time"""
+        if not metrics.enabled:
+            metrics.enabled = True
+            self.logger.log_info("Metrics collection started, request them again after a few operations")
+            return
+        
+        lines = metrics.report()
+        if not lines:
+            self.logger.log_info("No operations measured yet")
+            return
+        self.logger.log_info("Operation timings:")
+        for line in lines:
+            self.logger.log_message(f"  {line}", "METRIC")
+        path = self.metrics_path()
+        try:
+            metrics.dump(path)
+            self.logger.log_info(f"Metrics written to {path}")
+        except OSError as e:
+            self.logger.log_error(f"Could not write metrics: {str(e)}")
+    
+    @staticmethod
+    def audit_path() -> str:
+        """Where the last connection audit is written as JSON"""
+        return os.environ.get("OWMEBLOCK_AUDIT_FILE") or os.path.join(tempfile.gettempdir(), "owmeblock-audit.json")
+    
+    def audit_connections(self, lines: Optional[Iterable[str]] = None):
+        """Check whether any process still holds a connection to a blocked range"""
+        # lines replaces the live netstat snapshot, for fixtures and benchmarks
+        self.logger.log_info("Checking open connections...")
+        
+        def audit_operation():
+            if self.scheduler.cancelled.is_set():
+                return
+            try:
+                success, report = self.firewall.audit_connections(lines)
+                if not success:
+                    self.logger.log_error("Failed to list open connections")
+                    return
+                self.log_audit(report)
             except Exception as e:
-                self.gui.root.after(0, lambda: self.logger.log_error(f"Error scanning rules: {str(e)}"))
-                self.gui.root.after(0, lambda: self.gui.update_button_states(0, 0))
-
-        threading.Thread(target=scan_thread, daemon=True).start()
+                self.logger.log_error(f"Error checking connections: {str(e)}")
+        
+        self.scheduler.submit("audit", self.timed("audit", audit_operation))
+    
+    def log_audit(self, report: Dict):
+        """Show offending processes and endpoints in the log and save the full report"""
+        if not report["offending"]:
+            self.logger.log_success(f"No open connections to blocked ranges ({report['sockets']} sockets checked)")
+        else:
+            # Rules only stop new connections; sessions opened before blocking stay up until closed
+            self.logger.log_warning(f"{report['offending']} open connections to blocked ranges, "
+                                    "restart the game to drop them")
+            for process in report["processes"]:
+                program = f" ({process['program']})" if process["program"] else ""
+                for connection in process["connections"]:
+                    state = f" {connection['state']}" if connection["state"] else ""
+                    self.logger.log_message(f"  PID {process['pid']}{program}: {connection['protocol']} "
+                                            f"{connection['local']} -> {connection['remote']}{state} "
+                                            f"[{connection['region']}]", "AUDIT")
+        
+        path = self.audit_path()
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            self.logger.log_info(f"Audit written to {path}")
+        except OSError as e:
+            self.logger.log_error(f"Could not write audit: {str(e)}")
     
     def block_ips(self):
         """Block the target IP addresses"""
         self.logger.log_info("Starting IP blocking process...")
-        self.gui.set_buttons_state(False)
+        self.disable_buttons()
+        
+        def block_operation():
+            try:
+                success, steps = self.firewall.plan_block(max_age=self.firewall.SNAPSHOT_TTL)
+                if not success:
+                    self.logger.log_error("Failed to get firewall rules for blocking")
+                    return
+                if self.scheduler.cancelled.is_set():
+                    return
+                self.keep_blocked = True
+                
+                if not steps:
+                    self.logger.log_info("Blocking rules are already up to date")
+                
+                for step, success, output in self.firewall.apply_plan(steps):
+                    if success:
+                        self.logger.log_success(f"✅ {self.describe_step(step)}")
+                    else:
+                        self.logger.log_error(f"❌ Failed: {self.describe_step(step)}: {output.strip()}")
+                
+                self.logger.log_success("IP blocking completed! 🚫")
+                
+            except Exception as e:
+                self.logger.log_error(f"Error during blocking: {str(e)}")
+            finally:
+                # Mutations keep the snapshot current, so this redraw needs no rescan
+                self.refresh_status(max_age=self.firewall.SNAPSHOT_TTL)
+        
+        self.scheduler.submit("mutation", self.timed("block", block_operation))
+    
+    @staticmethod
+    def describe_step(step) -> str:
+        """Human readable description of a reconcile step"""
+        if step.action == "add":
+            state = "" if step.enabled else " (disabled)"
+            return f"Created new {step.direction} rule{state}: {step.name}"
+        if step.action == "set-remoteip":
+            return f"Updated remote addresses of rule: {step.name}"
+        if step.action == "enable":
+            return f"Enabled existing rule: {step.name}"
+        if step.action == "disable":
+            return f"Disabled rule: {step.name}"
+        return f"Deleted stale rule: {step.name}"
+    
+    def switch_profile(self, profile: str):
+        """Block the regions of another profile by flipping the enable flags of precompiled rules"""
+        self.logger.log_info(f"Switching to profile: {profile}")
+        self.disable_buttons()
         
-        def block_thread():
+        def switch_operation():
             try:
-                success, output = self.firewall.run_command('netsh advfirewall firewall show rule name=all')
-                if success:
-                    analyzed_rules = self.firewall.analyze_rules(output)
-                    enabled_count = 0
-                    
-                    all_disabled_rules = analyzed_rules["inbound"]["disabled"] + analyzed_rules["outbound"]["disabled"]
-                    if all_disabled_rules:
-                        results = self.firewall.enable_rules(all_disabled_rules)
-                        for rule_name, success, output in results:
-                            if success:
-                                self.gui.root.after(0, lambda name=rule_name: self.logger.log_success(f"✅ Enabled existing rule: {name}"))
-                                enabled_count += 1
-                            else:
-                                self.gui.root.after(0, lambda name=rule_name, out=output.strip(): self.logger.log_error(f"❌ Failed to enable rule {name}: {out}"))
-                    
-                    if analyzed_rules["inbound"]["enabled"] or analyzed_rules["outbound"]["enabled"]:
-                        self.gui.root.after(0, lambda: self.logger.log_info("Some rules are already enabled"))
-                    
-                    if (not analyzed_rules["inbound"]["enabled"] and not analyzed_rules["inbound"]["disabled"] and
-                        not analyzed_rules["outbound"]["enabled"] and not analyzed_rules["outbound"]["disabled"]):
-                        
-                        self.gui.root.after(0, lambda: self.logger.log_info("No existing rules found, creating new ones..."))
-                        
-                        results = self.firewall.create_firewall_rules()
-                        for rule_type, success, output in results:
-                            if success:
-                                self.gui.root.after(0, lambda rt=rule_type: self.logger.log_success(f"✅ Created new {rt} rule"))
-                            else:
-                                self.gui.root.after(0, lambda rt=rule_type, out=output.strip(): self.logger.log_error(f"❌ Failed to create {rt} rule: {out}"))
-                
-                self.gui.root.after(0, lambda: self.logger.log_success("IP blocking completed! 🚫"))
+                success, applied = self.firewall.switch_profile(profile, max_age=self.firewall.SNAPSHOT_TTL)
+                if not success:
+                    self.logger.log_error("Failed to get firewall rules for switching profile")
+                    return
+                self.keep_blocked = True
+                
+                failures = 0
+                for step, success, output in applied:
+                    if step.action in ("enable", "disable") and success:
+                        # Flag flips are routine here; only rule changes are worth a line each
+                        continue
+                    if success:
+                        self.logger.log_success(f"✅ {self.describe_step(step)}")
+                    else:
+                        failures += 1
+                        self.logger.log_error(f"❌ Failed: {self.describe_step(step)}: {output.strip()}")
+                
+                regions = self.firewall.profiles.regions_for(profile)
+                blocked = ", ".join(regions) if regions else "nothing"
+                if failures:
+                    self.logger.log_warning(f"Profile {profile} failed with {failures} errors, "
+                                            f"{self.firewall.active_profile} stays active")
+                else:
+                    self.state_store.save_profile(profile)
+                    self.logger.log_success(f"Profile {profile} active, blocking {blocked}")
                 
             except Exception as e:
-                self.gui.root.after(0, lambda: self.logger.log_error(f"Error during blocking: {str(e)}"))
+                self.logger.log_error(f"Error switching profile: {str(e)}")
             finally:
-                self.gui.root.after(0, self.scan_rules)
+                if self.firewall.active_profile != profile:
+                    # Put the menu back on the profile that is actually in force
+                    names, active = self.firewall.profiles.profile_names(), self.firewall.active_profile
+                    self.gui.root.after(0, lambda: self.gui.set_profiles(names, active))
+                self.refresh_status(max_age=self.firewall.SNAPSHOT_TTL)
         
-        threading.Thread(target=block_thread, daemon=True).start()
+        self.scheduler.submit("mutation", self.timed("switch", switch_operation))
+    
+    def progress_logger(self, done: str, verb: str) -> Progress:
+        """Progress callback logging each rule as its command finishes"""
+        def log_progress(count: int, total: int, result: Tuple[str, bool, str]):
+            rule_name, success, output = result
+            if success:
+                self.logger.log_success(f"✅ {done}: {rule_name} ({count}/{total})")
+            else:
+                self.logger.log_error(f"❌ Failed to {verb} rule {rule_name}: {output.strip()} ({count}/{total})")
+        return log_progress
     
     def unblock_ips(self):
         """Unblock the target IP addresses by disabling existing rules"""
         self.logger.log_info("Starting IP unblocking process...")
-        self.gui.set_buttons_state(False)
+        self.disable_buttons()
         
-        def unblock_thread():
+        def unblock_operation():
             try:
-                success, output = self.firewall.run_command('netsh advfirewall firewall show rule name=all')
+                # A full scan, so enabled rules from other sources that cover our targets are disabled too
+                success, store = self.firewall.scan_rule_store(full=True, max_age=self.firewall.SNAPSHOT_TTL)
                 if not success:
-                    self.gui.root.after(0, lambda: self.logger.log_error("Failed to get firewall rules for unblocking"))
+                    self.logger.log_error("Failed to get firewall rules for unblocking")
+                    return
+                if self.scheduler.cancelled.is_set():
                     return
+                self.keep_blocked = False
                 
-                analyzed_rules = self.firewall.analyze_rules(output)
                 disabled_count = 0
                 
-                all_enabled_rules = analyzed_rules["inbound"]["enabled"] + analyzed_rules["outbound"]["enabled"]
+                all_enabled_rules = store.names(state="enabled")
                 if all_enabled_rules:
-                    results = self.firewall.disable_rules(all_enabled_rules)
-                    for rule_name, success, output in results:
-                        if success:
-                            self.gui.root.after(0, lambda name=rule_name: self.logger.log_success(f"✅ Disabled rule: {name}"))
-                            disabled_count += 1
-                        else:
-                            self.gui.root.after(0, lambda name=rule_name, out=output.strip(): self.logger.log_error(f"❌ Failed to disable rule {name}: {out}"))
+                    results = self.firewall.disable_rules(all_enabled_rules, self.progress_logger("Disabled rule", "disable"))
+                    disabled_count = len(self.firewall.succeeded(results))
                 
                 if disabled_count == 0:
-                    self.gui.root.after(0, lambda: self.logger.log_warning("No enabled target rules found to unblock"))
+                    self.logger.log_warning("No enabled target rules found to unblock")
                 else:
-                    self.gui.root.after(0, lambda count=disabled_count: self.logger.log_success(f"Disabled {count} rules successfully"))
+                    self.logger.log_success(f"Disabled {disabled_count} rules successfully")
                 
-                self.gui.root.after(0, lambda: self.logger.log_success("IP unblocking completed! ✅"))
+                self.logger.log_success("IP unblocking completed! ✅")
                 
             except Exception as e:
-                self.gui.root.after(0, lambda: self.logger.log_error(f"Error during unblocking: {str(e)}"))
+                self.logger.log_error(f"Error during unblocking: {str(e)}")
             finally:
-                self.gui.root.after(0, self.scan_rules)
+                # Mutations keep the snapshot current, so this redraw needs no rescan
+                self.refresh_status(max_age=self.firewall.SNAPSHOT_TTL)
         
-        threading.Thread(target=unblock_thread, daemon=True).start()
+        self.scheduler.submit("mutation", self.timed("unblock", unblock_operation))
     
     def delete_rules(self):
         """Delete all rules that contain our target IPs"""
         self.logger.log_info("Starting rule deletion process...")
-        self.gui.set_buttons_state(False)
+        self.disable_buttons()
         
-        def delete_thread():
+        def delete_operation():
             try:
-                success, output = self.firewall.run_command('netsh advfirewall firewall show rule name=all')
+                success, store = self.firewall.scan_rule_store(full=True, max_age=self.firewall.SNAPSHOT_TTL)
                 if not success:
-                    self.gui.root.after(0, lambda: self.logger.log_error("Failed to get firewall rules for deletion"))
+                    self.logger.log_error("Failed to get firewall rules for deletion")
+                    return
+                if self.scheduler.cancelled.is_set():
                     return
+                self.keep_blocked = False
                 
-                analyzed_rules = self.firewall.analyze_rules(output)
                 deleted_count = 0
                 
-                all_rules = (analyzed_rules["inbound"]["enabled"] + analyzed_rules["inbound"]["disabled"] +
-                           analyzed_rules["outbound"]["enabled"] + analyzed_rules["outbound"]["disabled"])
+                all_rules = store.names()
                 
                 if all_rules:
-                    results = self.firewall.delete_rules(all_rules)
-                    for rule_name, success, output in results:
-                        if success:
-                            self.gui.root.after(0, lambda name=rule_name: self.logger.log_success(f"✅ Deleted rule: {name}"))
-                            deleted_count += 1
-                        else:
-                            self.gui.root.after(0, lambda name=rule_name, out=output.strip(): self.logger.log_error(f"❌ Failed to delete rule {name}: {out}"))
+                    results = self.firewall.delete_rules(all_rules, self.progress_logger("Deleted rule", "delete"))
+                    deleted_count = len(self.firewall.succeeded(results))
                 
                 if deleted_count == 0:
-                    self.gui.root.after(0, lambda: self.logger.log_warning("No target rules found to delete"))
+                    self.logger.log_warning("No target rules found to delete")
                 else:
-                    self.gui.root.after(0, lambda count=deleted_count: self.logger.log_success(f"Deleted {count} rules successfully"))
+                    self.logger.log_success(f"Deleted {deleted_count} rules successfully")
                 
-                self.gui.root.after(0, lambda: self.logger.log_success("Rule deletion completed! 🗑️"))
+                self.logger.log_success("Rule deletion completed! 🗑️")
                 
             except Exception as e:
-                self.gui.root.after(0, lambda: self.logger.log_error(f"Error during deletion: {str(e)}"))
+                self.logger.log_error(f"Error during deletion: {str(e)}")
             finally:
-                self.gui.root.after(0, self.scan_rules)
+                # Mutations keep the snapshot current, so this redraw needs no rescan
+                self.refresh_status(max_age=self.firewall.SNAPSHOT_TTL)
         
-        threading.Thread(target=delete_thread, daemon=True).start()
\ No newline at end of file
+        self.scheduler.submit("mutation", self.timed("delete", delete_operation))
\ No newline at end of file
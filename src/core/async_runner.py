@@ -0,0 +1,117 @@
+import asyncio
+import locale
+import queue
+import threading
+import time
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+LineCallback = Optional[Callable[[str], None]]
+
+class AsyncCommandRunner:
+    """Runs commands as asyncio subprocesses on a private event loop thread"""
+
+    def __init__(self, max_concurrency: int = 4, timeout: float = 30):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.encoding = locale.getpreferredencoding(False)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the event loop thread on first use"""
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True).start()
+                self.semaphore = asyncio.run_coroutine_threadsafe(self._make_semaphore(), loop).result()
+                self.loop = loop
+            return self.loop
+
+    async def _make_semaphore(self) -> asyncio.Semaphore:
+        return asyncio.Semaphore(self.max_concurrency)
+
+    async def run(self, argv: Sequence[str], on_line: LineCallback = None, timeout: Optional[float] = None,
+                  deadline: Optional[float] = None) -> Tuple[bool, str]:
+        """Run one command, feeding each output line to on_line as it arrives"""
+        timeout = self.timeout if timeout is None else timeout
+        async with self.semaphore:
+            # Time spent waiting for a free slot counts against the deadline
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    return False, "Command timed out"
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *argv,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                    limit=1 << 20
+                )
+            except Exception as e:
+                return False, str(e)
+
+            output = []
+
+            async def collect():
+                async for raw in process.stdout:
+                    line = raw.decode(self.encoding, errors="replace")
+                    output.append(line)
+                    if on_line:
+                        on_line(line)
+                return await process.wait()
+
+            try:
+                returncode = await asyncio.wait_for(collect(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                return False, "Command timed out"
+            except asyncio.CancelledError:
+                process.kill()
+                raise
+            return returncode == 0, "".join(output)
+
+    async def run_all(self, commands: List[Sequence[str]], timeout: Optional[float] = None,
+                      deadline: Optional[float] = None) -> List[Tuple[bool, str]]:
+        """Run independent commands concurrently, none of them past the global deadline"""
+        return list(await asyncio.gather(*(self.run(argv, timeout=timeout, deadline=deadline) for argv in commands)))
+
+    def run_sync(self, argv: Sequence[str], timeout: Optional[float] = None) -> Tuple[bool, str]:
+        """Blocking adapter for callers outside the event loop"""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self.run(argv, timeout=timeout), loop).result()
+
+    def run_all_sync(self, commands: List[Sequence[str]], timeout: Optional[float] = None,
+                     global_timeout: Optional[float] = None) -> List[Tuple[bool, str]]:
+        """Blocking adapter for run_all"""
+        loop = self._ensure_loop()
+        deadline = time.monotonic() + global_timeout if global_timeout is not None else None
+        return asyncio.run_coroutine_threadsafe(self.run_all(commands, timeout, deadline), loop).result()
+
+    def stream_sync(self, argv: Sequence[str], timeout: Optional[float] = None) -> Iterator[str]:
+        """Yield output lines while the command is still running"""
+        # Success is reported through the last_success attribute once exhausted
+        self.last_success = False
+        loop = self._ensure_loop()
+        lines: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        future = asyncio.run_coroutine_threadsafe(self.run(argv, lines.put, timeout), loop)
+        future.add_done_callback(lambda _: lines.put(None))
+        try:
+            while True:
+                line = lines.get()
+                if line is None:
+                    break
+                yield line
+        finally:
+            if not future.done():
+                future.cancel()
+        if not future.cancelled():
+            self.last_success = future.result()[0]
+
+    def close(self):
+        """Stop the event loop thread"""
+        with self.lock:
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self.loop = None
@@ -0,0 +1 @@
+# Firewall backends
\ No newline at end of file
@@ -0,0 +1,75 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from ..reconciler import Step
+
+Result = Tuple[str, bool, str]
+
+class FirewallBackend(ABC):
+    """Firewall operations FirewallManager relies on, whatever implements them"""
+
+    name = "base"
+
+    def __init__(self):
+        # Set once a list_rules generator is exhausted
+        self.last_success = False
+
+    @abstractmethod
+    def list_rules(self, names: Optional[List[str]] = None) -> Iterator[Dict]:
+        """Yield parsed rule records for every rule, or only for the given names"""
+
+    @abstractmethod
+    def create_rules(self, rules: List[Dict]) -> List[Result]:
+        """Create blocking rules from desired rule records, enabled unless a record says otherwise"""
+
+    @abstractmethod
+    def enable_rules(self, names: List[str]) -> List[Result]:
+        """Enable rules by name"""
+
+    @abstractmethod
+    def disable_rules(self, names: List[str]) -> List[Result]:
+        """Disable rules by name"""
+
+    @abstractmethod
+    def delete_rules(self, names: List[str]) -> List[Result]:
+        """Delete rules by name"""
+
+    @abstractmethod
+    def set_remote_ip(self, rules: List[Tuple[str, str]]) -> List[Result]:
+        """Replace the remote addresses of (name, remoteip) pairs"""
+
+    def batchable(self, name: str) -> bool:
+        """Check whether a rule name can go into a batch, or needs a call of its own"""
+        return True
+
+    def run_rule(self, action: str, name: str, timeout: float) -> Result:
+        """Enable, disable or delete a single rule"""
+        # The executor calls this from several worker threads at once, so a backend whose
+        # changes share state has to serialize them itself
+        return getattr(self, f"{action}_rules")([name])[0]
+
+    def apply_steps(self, steps: List[Step]) -> List[Tuple[Step, bool, str]]:
+        """Apply reconcile steps in order"""
+        applied = []
+        for step in steps:
+            if step.action == "add":
+                results = self.create_rules([{"name": step.name, "direction": step.direction, "remoteip": step.remoteip,
+                                              "enabled": step.enabled}])
+            elif step.action == "set-remoteip":
+                results = self.set_remote_ip([(step.name, step.remoteip)])
+            elif step.action == "enable":
+                results = self.enable_rules([step.name])
+            elif step.action == "disable":
+                results = self.disable_rules([step.name])
+            else:
+                results = self.delete_rules([step.name])
+            _, success, output = results[0]
+            applied.append((step, success, output))
+        return applied
+
+    def run_command(self, command: Union[str, Sequence[str]]) -> Tuple[bool, str]:
+        """Execute a raw command, for backends that have such a thing"""
+        return False, f"The {self.name} backend does not run raw commands"
+
+    def close(self):
+        """Release processes or handles held by the backend"""
@@ -0,0 +1,152 @@
+import itertools
+import os
+import shlex
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from ..async_runner import AsyncCommandRunner
+from ..netsh import (CONTEXT, NetshBatch, NetshSession, add_command, delete_command, enable_command,
+                     remoteip_command, response_ok, show_command)
+from ..reconciler import Step
+from ..rule_parser import iter_rules
+from ...utils.metrics import metrics
+from .base import FirewallBackend, Result
+
+PREFIX = "netsh advfirewall firewall "
+
+def rule_args(action: str, name: str) -> List[str]:
+    """Context arguments enabling, disabling or deleting one rule, with the name as a single argument"""
+    if action == "delete":
+        return ["delete", "rule", f"name={name}"]
+    return ["set", "rule", f"name={name}", "new", f"enable={'yes' if action == 'enable' else 'no'}"]
+
+def step_command(step: Step) -> str:
+    """Context command carrying out one reconcile step"""
+    if step.action == "add":
+        return add_command({"name": step.name, "direction": step.direction, "remoteip": step.remoteip,
+                            "enabled": step.enabled})
+    if step.action == "set-remoteip":
+        return remoteip_command(step.name, step.remoteip)
+    if step.action in ("enable", "disable"):
+        return enable_command(step.name, step.action == "enable")
+    return delete_command(step.name)
+
+class NetshBackend(FirewallBackend):
+    """Windows Firewall driven through netsh advfirewall"""
+
+    name = "netsh"
+
+    def __init__(self, netsh_path: Optional[str] = None, use_session: Optional[bool] = None):
+        super().__init__()
+        self.netsh_path = netsh_path or os.environ.get("OWMEBLOCK_NETSH", "netsh")
+        if use_session is None:
+            use_session = os.name == "nt" or os.environ.get("OWMEBLOCK_NETSH_SESSION") == "1"
+        self.session = NetshSession(self.netsh_path) if use_session else None
+        self.runner = AsyncCommandRunner()
+        self.last_stream_success = False
+
+    def session_command(self, command: str) -> Optional[str]:
+        """Strip the netsh context prefix if the command can run in the session"""
+        if self.session is None or not command.startswith(PREFIX):
+            return None
+        return command[len(PREFIX):]
+
+    def command_argv(self, command: Union[str, Sequence[str]]) -> List[str]:
+        """Turn a command string into an argument list, pointing netsh at netsh_path"""
+        argv = shlex.split(command) if isinstance(command, str) else list(command)
+        if argv and argv[0] == "netsh":
+            argv[0] = self.netsh_path
+        return argv
+
+    def run_command(self, command: Union[str, Sequence[str]]) -> Tuple[bool, str]:
+        """Execute command and return success status and output"""
+        session_command = self.session_command(command) if isinstance(command, str) else None
+        if session_command is not None:
+            return self.session.execute(session_command)
+        return self.runner.run_sync(self.command_argv(command))
+
+    def stream_command(self, command: Union[str, Sequence[str]], timeout: int = 30) -> Iterator[str]:
+        """Execute command and yield its output line by line as it is produced"""
+        # Exit status is only known once the generator is exhausted
+        self.last_stream_success = False
+        session_command = self.session_command(command) if isinstance(command, str) else None
+        if session_command is not None:
+            yield from self.session.stream(session_command, timeout)
+            self.last_stream_success = self.session.last_success
+            return
+
+        yield from self.runner.stream_sync(self.command_argv(command), timeout)
+        self.last_stream_success = self.runner.last_success
+
+    def query_lines(self, names: List[str]) -> Iterable[str]:
+        """`show rule` output for the given rule names only"""
+        # A missing rule makes netsh exit non-zero, which is a valid answer here
+        commands = [PREFIX + show_command(name) for name in names]
+        if self.session is not None:
+            return itertools.chain.from_iterable(self.stream_command(command) for command in commands)
+        # Without a session the small queries run side by side
+        outputs = self.runner.run_all_sync([self.command_argv(command) for command in commands])
+        return itertools.chain.from_iterable(output.splitlines() for _, output in outputs)
+
+    def list_rules(self, names: Optional[List[str]] = None) -> Iterator[Dict]:
+        """Yield parsed rule records for every rule, or only for the given names"""
+        self.last_success = False
+        if names is None:
+            yield from iter_rules(metrics.iterate("netsh output", self.stream_command(PREFIX + show_command()), len))
+            self.last_success = self.last_stream_success
+        else:
+            yield from iter_rules(metrics.iterate("netsh output", self.query_lines(names), len))
+            self.last_success = True
+
+    def run_batch(self, commands: List[Tuple[str, str]]) -> List[Result]:
+        """Run (key, command) pairs in one netsh process and return per-command results"""
+        with metrics.span("netsh batch") as span:
+            if self.session is not None:
+                outputs = self.session.execute_many([command for _, command in commands])
+                results = [(key, success, output) for (key, _), (success, output) in zip(commands, outputs)]
+            else:
+                batch = NetshBatch(self.netsh_path)
+                for key, command in commands:
+                    batch.add(key, command)
+                results = batch.run()
+            span.add(bytes=sum(len(output) for _, _, output in results), count=len(commands))
+        return results
+
+    def batchable(self, name: str) -> bool:
+        """Names with quotes or line breaks can't be written into a batch script"""
+        return not any(char in name for char in '"\r\n')
+
+    def run_rule(self, action: str, name: str, timeout: float) -> Result:
+        """Run one rule command in its own netsh process, so several can run side by side"""
+        success, output = self.runner.run_sync([self.netsh_path] + CONTEXT + rule_args(action, name), timeout)
+        return name, response_ok(output), output
+
+    def create_rules(self, rules: List[Dict]) -> List[Result]:
+        """Create blocking rules in one batch"""
+        return self.run_batch([(rule["name"], add_command(rule)) for rule in rules])
+
+    def enable_rules(self, names: List[str]) -> List[Result]:
+        """Enable rules by name in one batch"""
+        return self.run_batch([(name, enable_command(name, True)) for name in names])
+
+    def disable_rules(self, names: List[str]) -> List[Result]:
+        """Disable rules by name in one batch"""
+        return self.run_batch([(name, enable_command(name, False)) for name in names])
+
+    def delete_rules(self, names: List[str]) -> List[Result]:
+        """Delete rules by name in one batch"""
+        return self.run_batch([(name, delete_command(name)) for name in names])
+
+    def set_remote_ip(self, rules: List[Tuple[str, str]]) -> List[Result]:
+        """Replace remote addresses in one batch"""
+        return self.run_batch([(name, remoteip_command(name, remote_ip)) for name, remote_ip in rules])
+
+    def apply_steps(self, steps: List[Step]) -> List[Tuple[Step, bool, str]]:
+        """Apply every reconcile step in a single batch"""
+        results = self.run_batch([(str(index), step_command(step)) for index, step in enumerate(steps)])
+        return [(steps[int(index)], success, output) for index, success, output in results]
+
+    def close(self):
+        """Release the persistent netsh session and the command runner"""
+        if self.session is not None:
+            self.session.close()
+        self.runner.close()
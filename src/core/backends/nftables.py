@@ -0,0 +1,266 @@
+import ipaddress
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from ..ip_index import merge_intervals, parse_remote_ip
+from ..reconciler import Step
+from ...utils.metrics import metrics
+from .base import FirewallBackend, Result
+
+FAMILY = "inet"
+TABLE = "owmeblock"
+# Rule direction to base chain, and the packet field matched against the set
+CHAINS = {"inbound": ("input", "saddr"), "outbound": ("output", "daddr")}
+DIRECTIONS = {chain: direction for direction, (chain, _) in CHAINS.items()}
+
+def set_name(rule_name: str) -> str:
+    """nft identifier for the address set of a rule"""
+    name = re.sub(r"[^a-z0-9]+", "_", rule_name.lower()).strip("_")
+    return name if name[:1].isalpha() else f"rule_{name}"
+
+def set_elements(remote_ip: str) -> List[str]:
+    """Merged, non-overlapping set elements for a netsh style address list"""
+    elements = []
+    for start, end in merge_intervals(parse_remote_ip(remote_ip)):
+        first, last = ipaddress.IPv4Address(start), ipaddress.IPv4Address(end)
+        elements.extend(str(network) for network in ipaddress.summarize_address_range(first, last))
+    return elements
+
+def render_ruleset(rules: List[Dict]) -> str:
+    """nft script that atomically replaces the owmeblock table with the given rules"""
+    # Declaring the table first makes the delete valid even when it doesn't exist yet
+    lines = [f"table {FAMILY} {TABLE}", f"delete table {FAMILY} {TABLE}"]
+    if not rules:
+        return "\n".join(lines) + "\n"
+
+    lines.append(f"table {FAMILY} {TABLE} {{")
+    sets: Dict[str, str] = {}
+    for rule in rules:
+        name = set_name(rule["name"])
+        while name in sets.values():
+            name += "_"
+        sets[rule["name"]] = name
+        lines.append(f"\tset {name} {{")
+        lines.append("\t\ttype ipv4_addr")
+        lines.append("\t\tflags interval")
+        elements = set_elements(rule["remoteip"])
+        if elements:
+            lines.append(f"\t\telements = {{ {', '.join(elements)} }}")
+        lines.append("\t}")
+
+    for direction, (chain, field) in CHAINS.items():
+        lines.append(f"\tchain {chain} {{")
+        lines.append(f"\t\ttype filter hook {chain} priority filter; policy accept;")
+        for rule in rules:
+            if rule["direction"] != direction:
+                continue
+            # nftables has no disabled rules, so a disabled one keeps matching but drops nothing
+            verdict = "drop" if rule["enabled"] else "counter"
+            comment = rule["name"].replace('"', "'")
+            lines.append(f'\t\tip {field} @{sets[rule["name"]]} {verdict} comment "{comment}"')
+        lines.append("\t}")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def element_cidrs(element) -> List[str]:
+    """Address tokens of one element of a set in `nft -j` output"""
+    if isinstance(element, dict) and "elem" in element:
+        element = element["elem"].get("val")
+    if isinstance(element, str):
+        return [element]
+    if isinstance(element, dict) and "prefix" in element:
+        return [f"{element['prefix']['addr']}/{element['prefix']['len']}"]
+    if isinstance(element, dict) and "range" in element:
+        return [f"{element['range'][0]}-{element['range'][1]}"]
+    return []
+
+def parse_table(data: Dict) -> Iterator[Dict]:
+    """Yield rule records from `nft -j list table` output"""
+    objects = data.get("nftables", [])
+    sets = {}
+    for item in objects:
+        if "set" in item:
+            elements = item["set"].get("elem", [])
+            sets[item["set"]["name"]] = ",".join(token for element in elements for token in element_cidrs(element))
+
+    for item in objects:
+        rule = item.get("rule")
+        if rule is None or rule.get("chain") not in DIRECTIONS:
+            continue
+        remote_ip = ""
+        enabled = False
+        action = "Block"
+        for expr in rule.get("expr", []):
+            right = expr.get("match", {}).get("right")
+            if isinstance(right, str) and right.startswith("@"):
+                remote_ip = sets.get(right[1:], "")
+            if "drop" in expr:
+                enabled = True
+            if "accept" in expr:
+                action = "Allow"
+        yield {
+            "name": rule.get("comment", ""),
+            "enabled": enabled,
+            "direction": DIRECTIONS[rule["chain"]],
+            "action": action,
+            "remoteip": remote_ip,
+        }
+
+class NftablesBackend(FirewallBackend):
+    """Linux firewall kept in one nftables table, rewritten in a single transaction per change"""
+
+    name = "nftables"
+
+    def __init__(self, nft_path: Optional[str] = None, timeout: int = 30):
+        super().__init__()
+        self.nft_path = nft_path or os.environ.get("OWMEBLOCK_NFT", "nft")
+        self.timeout = timeout
+        # Every change rewrites the whole table from what was read before, so changes
+        # from the executor's worker threads must not interleave
+        self.lock = threading.Lock()
+
+    def run_command(self, command: Union[str, Sequence[str]], script: Optional[str] = None) -> Tuple[bool, str]:
+        """Run nft with the given arguments, feeding script on stdin"""
+        argv = command.split() if isinstance(command, str) else list(command)
+        if argv and argv[0] == "nft":
+            argv = argv[1:]
+        with metrics.span("nft") as span:
+            try:
+                result = subprocess.run(
+                    [self.nft_path] + argv,
+                    input=script,
+                    capture_output=True,
+                    text=True,
+                    errors="replace",
+                    timeout=self.timeout
+                )
+            except subprocess.TimeoutExpired:
+                return False, "Command timed out"
+            except Exception as e:
+                return False, str(e)
+            span.add(bytes=len(result.stdout) + len(result.stderr))
+        return result.returncode == 0, result.stdout + result.stderr
+
+    def current_rules(self) -> Tuple[bool, Union[List[Dict], str]]:
+        """All rules in our table, or the nft error"""
+        success, output = self.run_command(["-j", "list", "table", FAMILY, TABLE])
+        if not success:
+            # No table simply means nothing was ever blocked
+            if "Error: No such file or directory" in output:
+                return True, []
+            return False, output
+        try:
+            return True, list(parse_table(json.loads(output)))
+        except ValueError as e:
+            return False, f"Unreadable nft output: {e}"
+
+    def list_rules(self, names: Optional[List[str]] = None) -> Iterator[Dict]:
+        """Yield rule records from our table, optionally only the given names"""
+        self.last_success = False
+        success, rules = self.current_rules()
+        if not success:
+            return
+        wanted = set(names) if names is not None else None
+        for rule in rules:
+            if wanted is None or rule["name"] in wanted:
+                yield rule
+        self.last_success = True
+
+    def check(self, rules: List[Dict]) -> Tuple[bool, str]:
+        """Validate the ruleset for rules with `nft -c` without touching the kernel"""
+        return self.run_command(["-c", "-f", "-"], render_ruleset(rules))
+
+    @staticmethod
+    def apply_step(rules: List[Dict], step: Step) -> Tuple[bool, str]:
+        """Apply one step to a list of rule records in place"""
+        found = [rule for rule in rules if rule["name"] == step.name]
+        if step.action == "add":
+            rules.append({"name": step.name, "direction": step.direction, "action": "Block",
+                          "remoteip": step.remoteip, "enabled": step.enabled})
+            return True, "Ok."
+        if not found:
+            return False, "No rules match the specified criteria."
+        if step.action == "delete":
+            rules[:] = [rule for rule in rules if rule["name"] != step.name]
+        for rule in found:
+            if step.action == "set-remoteip":
+                rule["remoteip"] = step.remoteip
+            elif step.action in ("enable", "disable"):
+                rule["enabled"] = step.action == "enable"
+        return True, "Ok."
+
+    def apply_steps(self, steps: List[Step]) -> List[Tuple[Step, bool, str]]:
+        """Apply every step to our table in one atomic `nft -f` transaction"""
+        with self.lock:
+            success, rules = self.current_rules()
+            if not success:
+                return [(step, False, rules) for step in steps]
+
+            outcomes = [self.apply_step(rules, step) for step in steps]
+            success, output = self.run_command(["-f", "-"], render_ruleset(rules))
+        if not success:
+            # The transaction is all or nothing
+            return [(step, False, output) for step in steps]
+        return [(step, applied, message) for step, (applied, message) in zip(steps, outcomes)]
+
+    def edit(self, action: str, names: List[str]) -> List[Result]:
+        """Run one step per rule name as a single transaction"""
+        applied = self.apply_steps([Step(action, name, "") for name in names])
+        return [(step.name, success, output) for step, success, output in applied]
+
+    def create_rules(self, rules: List[Dict]) -> List[Result]:
+        """Create blocking rules in one transaction"""
+        applied = self.apply_steps([Step("add", rule["name"], rule["direction"], rule["remoteip"], rule.get("enabled", True))
+                                    for rule in rules])
+        return [(step.name, success, output) for step, success, output in applied]
+
+    def enable_rules(self, names: List[str]) -> List[Result]:
+        """Enable rules by name in one transaction"""
+        return self.edit("enable", names)
+
+    def disable_rules(self, names: List[str]) -> List[Result]:
+        """Disable rules by name in one transaction"""
+        return self.edit("disable", names)
+
+    def delete_rules(self, names: List[str]) -> List[Result]:
+        """Delete rules by name in one transaction"""
+        return self.edit("delete", names)
+
+    def set_remote_ip(self, rules: List[Tuple[str, str]]) -> List[Result]:
+        """Replace remote addresses in one transaction"""
+        applied = self.apply_steps([Step("set-remoteip", name, "", remote_ip) for name, remote_ip in rules])
+        return [(step.name, success, output) for step, success, output in applied]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Print the ruleset for the current target ranges, or check it with `nft -c`"""
+    import argparse
+
+    from ..firewall import FirewallManager
+
+    parser = argparse.ArgumentParser(prog="python -m src.core.backends.nftables")
+    parser.add_argument("--list", dest="blocklist", help="text, ip-ranges JSON or binary blocklist to use")
+    parser.add_argument("--region", help="only keep prefixes from this region or scope")
+    parser.add_argument("--check", action="store_true", help="validate the ruleset with nft -c instead of printing it")
+    args = parser.parse_args(argv)
+
+    backend = NftablesBackend()
+    firewall = FirewallManager(backend)
+    if args.blocklist:
+        firewall.load_blocklist(args.blocklist, args.region)
+    rules = firewall.desired_rules()
+
+    if not args.check:
+        sys.stdout.write(render_ruleset(rules))
+        return 0
+    success, output = backend.check(rules)
+    if output.strip():
+        print(output.strip(), file=sys.stderr)
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import base64
+import json
+import os
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from ..async_runner import AsyncCommandRunner
+from ...utils.metrics import metrics
+from .netsh import NetshBackend
+
+# Emits one compact JSON object per rule. Enum values are cast to their
+# invariant names (Inbound, True, Block), so the output reads the same in every
+# Windows display language.
+FORMAT_RULE = r"""
+function Format-Rule($rule, $filter) {
+    [pscustomobject]@{
+        name = $rule.DisplayName
+        direction = [string]$rule.Direction
+        enabled = [string]$rule.Enabled
+        action = [string]$rule.Action
+        remoteip = @($filter.RemoteAddress) -join ','
+    } | ConvertTo-Json -Compress
+}
+"""
+
+PREAMBLE = "$ErrorActionPreference = 'Stop'\n[Console]::OutputEncoding = [Text.Encoding]::UTF8\n" + FORMAT_RULE
+
+# Address filters are fetched in one call and joined to their rules by InstanceID.
+# Only rules with an IPv4 remote address leave PowerShell; overlap with the
+# target ranges is decided on our side.
+ALL_RULES_SCRIPT = PREAMBLE + r"""
+$rules = @{}
+Get-NetFirewallRule -PolicyStore ActiveStore | ForEach-Object { $rules[$_.InstanceID] = $_ }
+Get-NetFirewallAddressFilter -PolicyStore ActiveStore |
+    Where-Object { @($_.RemoteAddress) -match '^\d+\.\d+\.\d+\.\d+' } |
+    ForEach-Object { Format-Rule $rules[$_.InstanceID] $_ }
+"""
+
+def quote(value: str) -> str:
+    """PowerShell single-quoted string literal"""
+    return "'" + value.replace("'", "''") + "'"
+
+def rules_script(names: Optional[List[str]] = None) -> str:
+    """Script printing every rule with an IPv4 remote address, or the named rules whatever their addresses"""
+    if names is None:
+        return ALL_RULES_SCRIPT
+    return PREAMBLE + (
+        f"$names = @({', '.join(quote(name) for name in names)})\n"
+        "Get-NetFirewallRule -PolicyStore ActiveStore -DisplayName $names -ErrorAction SilentlyContinue |\n"
+        "    ForEach-Object { Format-Rule $_ ($_ | Get-NetFirewallAddressFilter) }\n"
+    )
+
+def encoded_command(script: str) -> List[str]:
+    """powershell argument list running script, passed encoded so no quoting can break it"""
+    encoded = base64.b64encode(script.encode("utf-16-le")).decode("ascii")
+    return ["-NoProfile", "-NonInteractive", "-ExecutionPolicy", "Bypass", "-EncodedCommand", encoded]
+
+def iter_json_rules(lines: Iterable[str]) -> Iterator[Dict[str, Union[str, bool]]]:
+    """Decode one rule record per JSON line, as the line arrives"""
+    for line in lines:
+        line = line.strip().lstrip("\ufeff")
+        # Anything else is PowerShell chatter; failures show in the exit status
+        if not line.startswith("{"):
+            continue
+        data = json.loads(line)
+        yield {
+            "name": data["name"],
+            "direction": "inbound" if data["direction"] == "Inbound" else "outbound",
+            "enabled": data["enabled"] == "True",
+            "action": data["action"],
+            "remoteip": data.get("remoteip") or "",
+        }
+
+class PowerShellBackend(NetshBackend):
+    """netsh for changes, with rules read as structured JSON through the NetSecurity cmdlets"""
+
+    name = "powershell"
+
+    def __init__(self, powershell_path: Optional[str] = None, timeout: int = 120):
+        super().__init__()
+        self.powershell_path = powershell_path or os.environ.get("OWMEBLOCK_POWERSHELL", "powershell")
+        self.timeout = timeout
+        # The scripts switch PowerShell's output to UTF-8 so rule names survive any code page
+        self.ps_runner = AsyncCommandRunner(timeout=timeout)
+        self.ps_runner.encoding = "utf-8"
+
+    def list_rules(self, names: Optional[List[str]] = None) -> Iterator[Dict]:
+        """Yield rule records decoded from PowerShell's JSON output"""
+        self.last_success = False
+        if names is not None and not names:
+            self.last_success = True
+            return
+        argv = [self.powershell_path] + encoded_command(rules_script(names))
+        lines = self.ps_runner.stream_sync(argv, self.timeout)
+        yield from iter_json_rules(metrics.iterate("powershell output", lines, len))
+        self.last_success = self.ps_runner.last_success
+
+    def close(self):
+        super().close()
+        self.ps_runner.close()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Print the PowerShell script, or summarize rules recorded from its output"""
+    import argparse
+
+    from ..firewall import FirewallManager
+    from .simulator import SimulatedBackend
+
+    parser = argparse.ArgumentParser(prog="python -m src.core.backends.powershell")
+    parser.add_argument("--names", nargs="+", help="query these rule names instead of every rule")
+    parser.add_argument("--input", help="recorded JSON lines to decode and match against the target ranges")
+    args = parser.parse_args(argv)
+
+    if not args.input:
+        sys.stdout.write(rules_script(args.names))
+        return 0
+    firewall = FirewallManager(SimulatedBackend())
+    with open(args.input, "r", encoding="utf-8") as f:
+        analyzed_rules = firewall.analyze_records(iter_json_rules(f))
+    print(json.dumps(analyzed_rules, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
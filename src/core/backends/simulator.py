@@ -0,0 +1,186 @@
+import ipaddress
+import shlex
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Union
+
+from ..netsh import show_command
+from .base import Result
+from .netsh import PREFIX, NetshBackend, rule_args
+
+SEPARATOR = "-" * 70
+NO_MATCH = "No rules match the specified criteria."
+
+def netsh_address(token: str) -> str:
+    """Render an address the way netsh prints it back, with dotted masks"""
+    token = token.strip()
+    if "/" not in token or token[0].isalpha():
+        return token
+    network = ipaddress.IPv4Network(token, strict=False)
+    return f"{network.network_address}/{network.netmask}"
+
+def format_rule(rule: Dict) -> List[str]:
+    """Lines of a `show rule` block in netsh's layout"""
+    fields = [
+        ("Rule Name", rule["name"]),
+        None,
+        ("Enabled", "Yes" if rule["enabled"] else "No"),
+        ("Direction", "In" if rule["direction"] == "inbound" else "Out"),
+        ("Profiles", "Domain,Private,Public"),
+        ("Grouping", ""),
+        ("LocalIP", "Any"),
+        ("RemoteIP", rule["remoteip"]),
+        ("Protocol", rule.get("protocol", "Any")),
+    ]
+    if rule.get("protocol", "Any") in ("TCP", "UDP"):
+        fields.append(("LocalPort", rule.get("localport", "Any")))
+        fields.append(("RemotePort", rule.get("remoteport", "Any")))
+    fields.append(("Edge traversal", "No"))
+    if rule.get("program"):
+        fields.append(("Program", rule["program"]))
+    fields.append(("Action", rule["action"]))
+
+    lines = [""]
+    for field in fields:
+        lines.append(SEPARATOR if field is None else f"{field[0] + ':':<38}{field[1]}".rstrip())
+    return lines
+
+class SimulatedBackend(NetshBackend):
+    """In-memory firewall that answers netsh commands, for load tests on any OS"""
+
+    name = "simulator"
+
+    def __init__(self, latency: float = 0.0, per_rule_latency: float = 0.0):
+        super().__init__(netsh_path="netsh", use_session=False)
+        # latency models process startup per netsh call, per_rule_latency its enumeration cost
+        self.latency = latency
+        self.per_rule_latency = per_rule_latency
+        self.rules: List[Dict] = []
+        self.calls: Dict[str, int] = {}
+        # Per-rule calls arrive from several threads
+        self.lock = threading.RLock()
+
+    def add_rule(self, name: str, direction: str = "inbound", action: str = "Block", remoteip: str = "Any",
+                 enabled: bool = True, **fields):
+        """Seed a rule directly, bypassing command parsing"""
+        remote_ip = ",".join(netsh_address(token) for token in remoteip.split(","))
+        self.rules.append(dict(fields, name=name, direction=direction, action=action, remoteip=remote_ip, enabled=enabled))
+
+    def _count(self, operation: str):
+        with self.lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+
+    def _show(self, name: str) -> Iterator[str]:
+        """Output lines for `show rule`, paced by the configured latency"""
+        matched = False
+        for rule in self.rules:
+            if name != "all" and rule["name"] != name:
+                continue
+            matched = True
+            if self.per_rule_latency:
+                time.sleep(self.per_rule_latency)
+            yield from format_rule(rule)
+        if matched:
+            yield ""
+            yield "Ok."
+        else:
+            yield NO_MATCH
+        self.last_show_success = matched
+
+    def execute(self, command: str) -> Tuple[bool, str]:
+        """Apply one context command (`add rule ...`, `set rule ...`, ...) to the store"""
+        with self.lock:
+            return self._execute(command)
+
+    def _execute(self, command: str) -> Tuple[bool, str]:
+        tokens = shlex.split(command)
+        if len(tokens) < 3 or tokens[1] != "rule":
+            return False, f"The following command was not found: {command}."
+        verb = tokens[0]
+        options: Dict[str, str] = {}
+        new: Dict[str, str] = {}
+        target = options
+        for token in tokens[2:]:
+            if token == "new":
+                target = new
+                continue
+            key, _, value = token.partition("=")
+            target[key.lower()] = value
+        name = options.get("name", "")
+
+        if verb == "show":
+            lines = list(self._show(name))
+            return self.last_show_success, "\n".join(lines)
+
+        if verb == "add":
+            self.add_rule(
+                name,
+                direction="inbound" if options.get("dir") == "in" else "outbound",
+                action=options.get("action", "block").capitalize(),
+                remoteip=options.get("remoteip", "Any"),
+                enabled=options.get("enable", "yes") == "yes"
+            )
+            return True, "Ok."
+
+        matches = [rule for rule in self.rules if rule["name"] == name]
+        if not matches:
+            return False, NO_MATCH
+
+        if verb == "delete":
+            self.rules = [rule for rule in self.rules if rule["name"] != name]
+            return True, f"\nDeleted {len(matches)} rule(s).\nOk."
+        if verb == "set":
+            for rule in matches:
+                if "enable" in new:
+                    rule["enabled"] = new["enable"] == "yes"
+                if "remoteip" in new:
+                    rule["remoteip"] = ",".join(netsh_address(token) for token in new["remoteip"].split(","))
+            return True, f"Updated {len(matches)} rule(s).\nOk."
+        return False, f"The following command was not found: {command}."
+
+    def run_command(self, command: Union[str, Sequence[str]]) -> Tuple[bool, str]:
+        """Answer a full `netsh advfirewall firewall ...` command"""
+        self._count("run_command")
+        time.sleep(self.latency)
+        if not isinstance(command, str):
+            command = shlex.join(command)
+        if not command.startswith(PREFIX):
+            return False, f"The simulator only understands '{PREFIX.strip()}' commands"
+        return self.execute(command[len(PREFIX):])
+
+    def stream_command(self, command: Union[str, Sequence[str]], timeout: int = 30) -> Iterator[str]:
+        """Stream `show rule` output from the store"""
+        self._count("stream_command")
+        self.last_stream_success = False
+        time.sleep(self.latency)
+        name = shlex.split(command[len(PREFIX):])[2].partition("=")[2]
+        yield from self._show(name)
+        self.last_stream_success = self.last_show_success
+
+    def query_lines(self, names: List[str]) -> Iterable[str]:
+        """Each targeted query costs one simulated netsh call"""
+        for name in names:
+            yield from self.stream_command(PREFIX + show_command(name))
+
+    def run_rule(self, action: str, name: str, timeout: float) -> Result:
+        """One simulated netsh process per rule, overlapping with the others"""
+        self._count("run_rule")
+        if self.latency > timeout:
+            time.sleep(timeout)
+            return name, False, "Command timed out"
+        time.sleep(self.latency)
+        success, output = self.execute(shlex.join(rule_args(action, name)))
+        return name, success, output
+
+    def run_batch(self, commands: List[Tuple[str, str]]) -> List[Result]:
+        """Run a batch as one simulated netsh process"""
+        self._count("run_batch")
+        time.sleep(self.latency)
+        results = []
+        for key, command in commands:
+            success, output = self.execute(command)
+            results.append((key, success, output))
+        return results
+
+    def close(self):
+        """Nothing to release"""
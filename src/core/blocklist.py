@@ -0,0 +1,76 @@
+import ipaddress
+import json
+from typing import Iterable, List, Optional
+
+from .ip_index import merge_intervals, parse_address, parse_remote_ip
+
+# cmd.exe caps a command line at 8191 characters; leave room for the rest of the rule
+MAX_REMOTEIP_LENGTH = 7000
+# Windows Firewall rejects rules with more remote address entries than this
+MAX_REMOTEIP_ENTRIES = 1000
+
+def load_sources(path: str, region: Optional[str] = None) -> List[str]:
+    """Read CIDRs from a text list or a cloud provider's ip-ranges JSON file"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    if not content.lstrip().startswith(("{", "[")):
+        cidrs = []
+        for line in content.splitlines():
+            line = line.split("#", 1)[0].strip()
+            # IPv6 prefixes and malformed lines could never be part of a rule
+            if line and parse_address(line) is not None:
+                cidrs.append(line)
+        return cidrs
+
+    data = json.loads(content)
+    entries = data.get("prefixes", []) if isinstance(data, dict) else data
+    cidrs = []
+    for entry in entries:
+        if isinstance(entry, str):
+            if parse_address(entry) is not None:
+                cidrs.append(entry)
+            continue
+        # AWS uses ip_prefix/region, Google Cloud uses ipv4Prefix/scope
+        prefix = entry.get("ip_prefix") or entry.get("ipv4Prefix")
+        if not prefix:
+            continue
+        if region and region not in (entry.get("region"), entry.get("scope")):
+            continue
+        cidrs.append(prefix)
+    return cidrs
+
+def collapse(cidrs: Iterable[str]) -> List[str]:
+    """Merge duplicate, overlapping and adjacent ranges into the minimal CIDR cover"""
+    collapsed = []
+    for start, end in merge_intervals(parse_remote_ip(",".join(cidrs))):
+        networks = ipaddress.summarize_address_range(ipaddress.IPv4Address(start), ipaddress.IPv4Address(end))
+        collapsed.extend(str(network) for network in networks)
+    return collapsed
+
+def shard(cidrs: List[str], max_entries: int = MAX_REMOTEIP_ENTRIES, max_length: int = MAX_REMOTEIP_LENGTH) -> List[List[str]]:
+    """Split CIDRs into groups that each fit into a single rule's remoteip argument"""
+    shards: List[List[str]] = []
+    current: List[str] = []
+    length = 0
+    for cidr in cidrs:
+        added = len(cidr) + (1 if current else 0)
+        if current and (len(current) >= max_entries or length + added > max_length):
+            shards.append(current)
+            current = []
+            added = len(cidr)
+            length = 0
+        current.append(cidr)
+        length += added
+    if current:
+        shards.append(current)
+    return shards
+
+def shard_rule_name(rule_name: str, direction: str, index: int) -> str:
+    """Deterministic rule name for a shard, keeping the original name for the first one"""
+    name = f"{rule_name} - {direction.capitalize()}"
+    return name if index == 0 else f"{name} #{index + 1}"
+
+def compile_blocklist(cidrs: Iterable[str]) -> List[List[str]]:
+    """Collapse and shard CIDRs into the remote address lists of our rules"""
+    return shard(collapse(cidrs))
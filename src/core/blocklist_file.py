@@ -0,0 +1,116 @@
+import ipaddress
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from typing import Iterable, List, Optional
+
+from .ip_index import IPRangeIndex, merge_intervals, parse_remote_ip
+
+# magic, version, reserved, range count, crc32 of the payload
+HEADER = struct.Struct("<4sHHII")
+MAGIC = b"OWBL"
+VERSION = 1
+
+def _uint32_array(values: Iterable[int]) -> array:
+    """Little-endian uint32 array, matching the on-disk layout"""
+    typecode = "I" if array("I").itemsize == 4 else "L"
+    data = array(typecode, values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+def write_blocklist(path: str, cidrs: Iterable[str]):
+    """Write CIDRs as sorted, merged start/end arrays in the binary format"""
+    intervals = merge_intervals(parse_remote_ip(",".join(cidrs)))
+    payload = (_uint32_array(start for start, _ in intervals).tobytes() +
+               _uint32_array(end for _, end in intervals).tobytes())
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(intervals), zlib.crc32(payload)))
+        f.write(payload)
+
+def is_binary_blocklist(path: str) -> bool:
+    """Check whether a file starts with the binary blocklist magic"""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+class BinaryBlocklist:
+    """Memory-mapped binary blocklist whose ranges are read in place"""
+
+    def __init__(self, path: str):
+        # Files that aren't a complete, intact blocklist raise ValueError
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                # mmap refuses empty files, so this is checked before mapping
+                raise ValueError(f"{path} is too short to be a blocklist")
+            self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            count, checksum = self._check(path)
+        except ValueError:
+            self.mapping.close()
+            raise
+
+        self.count = count
+        self.checksum = checksum
+        words = memoryview(self.mapping)[HEADER.size:].cast("I")
+        self.starts = words[:count]
+        self.ends = words[count:]
+        self.index = IPRangeIndex.from_arrays(self.starts, self.ends)
+
+    def _check(self, path: str):
+        """Validate header, length and checksum, returning the range count and checksum"""
+        magic, version, _, count, checksum = HEADER.unpack_from(self.mapping)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a binary blocklist")
+        if version != VERSION:
+            raise ValueError(f"Unsupported blocklist version {version} in {path}")
+        if len(self.mapping) != HEADER.size + count * 8:
+            raise ValueError(f"{path} is truncated")
+        with memoryview(self.mapping) as view:
+            if zlib.crc32(view[HEADER.size:]) != checksum:
+                raise ValueError(f"Checksum mismatch in {path}")
+        if sys.byteorder == "big":
+            raise ValueError("Memory-mapped blocklists need a little-endian machine")
+        return count, checksum
+
+    def __len__(self) -> int:
+        return self.count
+
+    def cidrs(self) -> List[str]:
+        """Expand the stored ranges back into a minimal CIDR list"""
+        cidrs = []
+        for start, end in zip(self.starts, self.ends):
+            networks = ipaddress.summarize_address_range(ipaddress.IPv4Address(start), ipaddress.IPv4Address(end))
+            cidrs.extend(str(network) for network in networks)
+        return cidrs
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Convert between text/JSON blocklists and the binary format"""
+    import argparse
+
+    from .blocklist import load_sources
+
+    parser = argparse.ArgumentParser(prog="python -m src.core.blocklist_file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="compile a text or ip-ranges JSON file")
+    build.add_argument("source")
+    build.add_argument("output")
+    build.add_argument("--region", help="only keep prefixes from this region or scope")
+
+    dump = commands.add_parser("dump", help="print a binary blocklist as CIDRs")
+    dump.add_argument("blocklist")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        write_blocklist(args.output, load_sources(args.source, args.region))
+        print(f"Wrote {len(BinaryBlocklist(args.output))} ranges to {args.output}")
+    else:
+        for cidr in BinaryBlocklist(args.blocklist).cidrs():
+            print(cidr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import bisect
+import csv
+import heapq
+import socket
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..utils.metrics import metrics
+from .blocklist import collapse
+
+try:
+    import numpy
+except ImportError:
+    # Optional: without numpy the same lookups run through array and bisect
+    numpy = None
+
+CHUNK_SIZE = 1 << 16
+
+def pack_addresses(tokens: List[str]) -> Tuple[bytes, int]:
+    """Pack dotted IPv4 strings into big-endian 4-byte words, skipping malformed ones"""
+    try:
+        return b"".join(map(socket.inet_pton, [socket.AF_INET] * len(tokens), tokens)), 0
+    except (OSError, TypeError, ValueError):
+        # Rare slow path: find out which tokens are bad
+        packed = []
+        for token in tokens:
+            try:
+                packed.append(socket.inet_pton(socket.AF_INET, token))
+            except (OSError, TypeError, ValueError):
+                pass
+        return b"".join(packed), len(tokens) - len(packed)
+
+def to_uint32(tokens: List[str]) -> Tuple[Union["numpy.ndarray", array], int]:
+    """Convert address strings to an unsigned 32-bit array and the number rejected"""
+    packed, invalid = pack_addresses(tokens)
+    if numpy is not None:
+        return numpy.frombuffer(packed, dtype=">u4").astype(numpy.uint32), invalid
+    addresses = array("I")
+    if addresses.itemsize != 4:
+        addresses = array("L")
+    addresses.frombytes(packed)
+    if socket.htonl(1) != 1:
+        addresses.byteswap()
+    return addresses, invalid
+
+def address_token(field: str) -> str:
+    """The address part of a log field such as "1.2.3.4", "1.2.3.4:5000" or "1.2.3.4 extra" """
+    words = field.split(None, 1)
+    return words[0].partition(":")[0] if words else ""
+
+def read_chunks(path: str, column: Optional[str] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[List[str]]:
+    """Yield lists of address strings from a text file or one column of a CSV file"""
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        if column is None:
+            # Plain text: about 16 bytes per line, read a chunk worth at a time
+            while True:
+                lines = f.readlines(chunk_size * 16)
+                if not lines:
+                    return
+                chunk = [address_token(line) for line in lines if not line.isspace() and not line.startswith("#")]
+                if chunk:
+                    yield chunk
+
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if column.isdigit():
+            position = int(column)
+            # A numeric column means the file may have no header; keep its first row
+            rows = _prepend(header, reader)
+        elif column in header:
+            position = header.index(column)
+            rows = reader
+        else:
+            raise ValueError(f"no column named {column}")
+
+        chunk = []
+        for row in rows:
+            if len(row) > position:
+                chunk.append(address_token(row[position]))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+def _prepend(first: List[str], rows: Iterable[List[str]]) -> Iterator[List[str]]:
+    yield first
+    yield from rows
+
+class RangeClassifier:
+    """Assigns IPv4 addresses to the target range that covers them, a chunk at a time"""
+
+    def __init__(self, cidrs: Iterable[str]):
+        import ipaddress
+
+        # Collapsed ranges never overlap, so every address belongs to at most one
+        self.ranges = collapse(cidrs)
+        networks = [ipaddress.IPv4Network(cidr) for cidr in self.ranges]
+        starts = [int(network.network_address) for network in networks]
+        ends = [int(network.broadcast_address) for network in networks]
+        if numpy is not None:
+            self.starts = numpy.array(starts, dtype=numpy.uint32)
+            self.ends = numpy.array(ends, dtype=numpy.uint32)
+        else:
+            self.starts = starts
+            self.ends = ends
+        self.hits = [0] * len(self.ranges)
+        self.unmatched: Dict[int, int] = {}
+        self.total = 0
+        self.invalid = 0
+
+    def classify(self, addresses) -> List[int]:
+        """Range position for each address, -1 where no range covers it"""
+        if numpy is not None:
+            positions = numpy.searchsorted(self.starts, addresses, side="right").astype(numpy.int64) - 1
+            covered = positions >= 0
+            covered[covered] = addresses[covered] <= self.ends[positions[covered]]
+            positions[~covered] = -1
+            return positions
+
+        positions = []
+        starts, ends = self.starts, self.ends
+        for address in addresses:
+            i = bisect.bisect_right(starts, address) - 1
+            positions.append(i if i >= 0 and address <= ends[i] else -1)
+        return positions
+
+    def add(self, addresses, invalid: int = 0):
+        """Count one chunk of uint32 addresses into the running totals"""
+        self.total += len(addresses) + invalid
+        self.invalid += invalid
+        positions = self.classify(addresses)
+
+        if numpy is not None:
+            matched = positions >= 0
+            counts = numpy.bincount(positions[matched], minlength=len(self.ranges))
+            for i in numpy.flatnonzero(counts):
+                self.hits[i] += int(counts[i])
+            missed, missed_counts = numpy.unique(addresses[~matched], return_counts=True)
+            for address, count in zip(missed.tolist(), missed_counts.tolist()):
+                self.unmatched[address] = self.unmatched.get(address, 0) + count
+            return
+
+        for address, position in zip(addresses, positions):
+            if position >= 0:
+                self.hits[position] += 1
+            else:
+                self.unmatched[address] = self.unmatched.get(address, 0) + 1
+
+    def add_strings(self, tokens: List[str]):
+        """Convert and count one chunk of address strings"""
+        addresses, invalid = to_uint32(tokens)
+        self.add(addresses, invalid)
+
+    def add_file(self, path: str, column: Optional[str] = None):
+        """Count every address of a text or CSV file, reading it in chunks"""
+        for chunk in metrics.iterate("classify read", read_chunks(path, column), len):
+            with metrics.span("classify chunk") as span:
+                span.add(count=len(chunk))
+                self.add_strings(chunk)
+
+    def report(self, unmatched_limit: Optional[int] = None) -> Dict:
+        """Per-range hit counts and the unmatched addresses, most frequent first"""
+        order = lambda item: (-item[1], item[0])
+        if unmatched_limit is None:
+            unmatched = sorted(self.unmatched.items(), key=order)
+        else:
+            unmatched = heapq.nsmallest(unmatched_limit, self.unmatched.items(), key=order)
+        matched = sum(self.hits)
+        return {
+            "total": self.total,
+            "matched": matched,
+            "unmatched": self.total - matched - self.invalid,
+            "invalid": self.invalid,
+            "ranges": {cidr: hits for cidr, hits in zip(self.ranges, self.hits)},
+            "unmatched_addresses": [
+                {"address": socket.inet_ntoa(address.to_bytes(4, "big")), "count": count}
+                for address, count in unmatched
+            ],
+        }
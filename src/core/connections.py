@@ -0,0 +1,115 @@
+import os
+import socket
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .async_runner import AsyncCommandRunner
+from .ip_index import IPRangeIndex
+
+# Connections already closed that linger in the table, in English and German netstat output
+CLOSED_STATES = {"TIME_WAIT", "WARTEND"}
+
+class Connection(NamedTuple):
+    """One socket from a netstat listing"""
+    protocol: str
+    local: str
+    remote: str
+    state: str
+    pid: int
+    program: str
+
+def snapshot_command() -> List[str]:
+    """netstat invocation listing every socket with its owning process"""
+    if os.name == "nt":
+        return ["netstat", "-ano"]
+    return ["netstat", "-tunap"]
+
+def split_endpoint(endpoint: str) -> Tuple[str, str]:
+    """Host and port of "1.2.3.4:443", "[::1]:443" or "*:*" """
+    host, _, port = endpoint.rpartition(":")
+    if host.startswith("["):
+        host = host[1:].split("]", 1)[0]
+    if host.startswith("::ffff:") and "." in host:
+        # IPv4 peers of dual-stack sockets
+        host = host[7:]
+    return host, port
+
+def endpoint_address(endpoint: str) -> Optional[int]:
+    """IPv4 address of an endpoint as an integer, None for IPv6 and wildcards"""
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, split_endpoint(endpoint)[0]), "big")
+    except OSError:
+        return None
+
+def parse_connection(line: str) -> Optional[Connection]:
+    """Parse one socket line of Windows `netstat -ano` or Linux `netstat -tunap` output"""
+    fields = line.split()
+    if len(fields) < 4 or not fields[0].upper().startswith(("TCP", "UDP")):
+        # Titles, column headers and blank lines
+        return None
+    if len(fields) >= 6 and fields[1].isdigit() and fields[2].isdigit():
+        # Linux puts the Recv-Q and Send-Q counters before the addresses
+        del fields[1:3]
+
+    protocol, local, remote = fields[0].upper(), fields[1], fields[2]
+    rest = fields[3:]
+    # UDP sockets usually have no state, so the owner may come right after the addresses
+    state = "" if rest[0] == "-" or rest[0].split("/", 1)[0].isdigit() else rest.pop(0)
+    if not rest:
+        return None
+    # Windows prints a bare PID, Linux "PID/program", where the name may contain spaces
+    pid, _, program = " ".join(rest).partition("/")
+    return Connection(protocol, local, remote, state, int(pid) if pid.isdigit() else 0, program)
+
+def iter_connections(lines: Iterable[str]) -> Iterator[Connection]:
+    """Yield connections as lines arrive, skipping everything that isn't a socket"""
+    for line in lines:
+        connection = parse_connection(line)
+        if connection is not None:
+            yield connection
+
+def find_blocked(connections: Iterable[Connection], index: IPRangeIndex,
+                 regions: Sequence[Tuple[str, IPRangeIndex]]) -> Tuple[int, List[Tuple[Connection, str]]]:
+    """Count sockets and pick those whose remote end is in one of the regions, with the region's name"""
+    # index covers at least every region, so most sockets are rejected with a single lookup
+    total = 0
+    offending = []
+    for connection in connections:
+        total += 1
+        if connection.state in CLOSED_STATES:
+            continue
+        address = endpoint_address(connection.remote)
+        # Listening sockets have a wildcard remote end and drop out here
+        if not address or not index.contains(address):
+            continue
+        region = next((name for name, region_index in regions if region_index.contains(address)), None)
+        if region is not None:
+            offending.append((connection, region))
+    return total, offending
+
+def audit_report(total: int, offending: List[Tuple[Connection, str]]) -> Dict:
+    """JSON-ready summary of an audit pass, grouped by process"""
+    processes: Dict[int, Dict] = {}
+    for connection, region in offending:
+        process = processes.setdefault(connection.pid, {"pid": connection.pid, "program": connection.program,
+                                                        "connections": []})
+        process["connections"].append({"protocol": connection.protocol, "local": connection.local,
+                                       "remote": connection.remote, "state": connection.state, "region": region})
+    return {"sockets": total, "offending": len(offending), "processes": list(processes.values())}
+
+class ConnectionSource:
+    """Streams one snapshot of the system's sockets from netstat"""
+
+    def __init__(self, command: Optional[Sequence[str]] = None):
+        self.command = list(command or snapshot_command())
+        self.runner = AsyncCommandRunner()
+        # Set once a lines() generator is exhausted
+        self.last_success = False
+
+    def lines(self) -> Iterator[str]:
+        """Yield netstat output lines while netstat is still running"""
+        self.last_success = False
+        yield from self.runner.stream_sync(self.command)
+        self.last_success = self.runner.last_success
+
+    def close(self):
+        self.runner.close()
@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Tuple
+
+Result = Tuple[str, bool, str]
+
+# Failures worth another try: the command never got an answer, or the firewall
+# service was briefly unreachable. "No rules match" and the like are final.
+TRANSIENT_ERRORS = ("Command timed out", "No response from netsh", "RPC server is unavailable")
+DEADLINE_EXCEEDED = "Deadline exceeded"
+
+def is_transient(output: str) -> bool:
+    """Check whether a failed command's output suggests retrying it"""
+    return any(error in output for error in TRANSIENT_ERRORS)
+
+class RuleExecutor:
+    """Runs independent per-rule operations on a bounded pool, retrying transient failures"""
+
+    def __init__(self, max_workers: int = 4, retries: int = 2, backoff: float = 0.5, call_timeout: float = 30):
+        self.max_workers = max_workers
+        self.retries = retries
+        # Seconds before the first retry, doubled for each further one
+        self.backoff = backoff
+        self.call_timeout = call_timeout
+
+    def run(self, names: List[str], operation: Callable[[str, float], Result], global_timeout: Optional[float] = None,
+            on_result: Optional[Callable[[Result], None]] = None) -> List[Result]:
+        """Call operation(name, timeout) for every name and return the results in the order of names"""
+        # on_result sees each result as it finishes, from a worker thread
+        if not names:
+            return []
+        deadline = time.monotonic() + global_timeout if global_timeout is not None else None
+        stopped = threading.Event()
+        lock = threading.Lock()
+        finished: List[Optional[Result]] = [None] * len(names)
+
+        def report(index: int, result: Result):
+            # Once the deadline has passed, calls still hanging are failed by the caller instead
+            with lock:
+                if stopped.is_set():
+                    return
+                finished[index] = result
+                if on_result is not None:
+                    on_result(result)
+
+        def remaining() -> float:
+            return float("inf") if deadline is None else deadline - time.monotonic()
+
+        def attempt(index: int, name: str):
+            delay = self.backoff
+            result = (name, False, DEADLINE_EXCEEDED)
+            for retry in range(self.retries + 1):
+                if remaining() <= 0 or stopped.is_set():
+                    result = (name, False, DEADLINE_EXCEEDED)
+                    break
+                try:
+                    result = operation(name, min(self.call_timeout, remaining()))
+                except Exception as e:
+                    result = (name, False, str(e))
+                if result[1] or not is_transient(result[2]) or retry == self.retries:
+                    break
+                if stopped.wait(min(delay, max(remaining(), 0))):
+                    break
+                delay *= 2
+            report(index, result)
+
+        pool = ThreadPoolExecutor(max_workers=min(self.max_workers, len(names)))
+        try:
+            futures = [pool.submit(attempt, index, name) for index, name in enumerate(names)]
+            wait(futures, timeout=None if deadline is None else max(remaining(), 0))
+            with lock:
+                stopped.set()
+                for index, name in enumerate(names):
+                    if finished[index] is None:
+                        futures[index].cancel()
+                        finished[index] = (name, False, DEADLINE_EXCEEDED)
+                        if on_result is not None:
+                            on_result(finished[index])
+            return finished
+        finally:
+            stopped.set()
+            # A hung call keeps its worker thread, but no longer holds up the caller
+            pool.shutdown(wait=False)
@@ -1,146 +1,511 @@
-import subprocess
-from typing import List, Dict, Tuple
+import hashlib
+import os
+import sys
+import time
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Sequence, Tuple, Union
 from datetime import datetime
 
+from .backends.base import FirewallBackend
+from .blocklist import collapse, compile_blocklist, load_sources, shard_rule_name
+from .blocklist_file import BinaryBlocklist, is_binary_blocklist
+from .connections import ConnectionSource, audit_report, find_blocked, iter_connections
+from .executor import RuleExecutor, is_transient
+from .ip_index import IPRangeIndex, merge_intervals, parse_remote_ip
+from .profiles import DEFAULT_REGION, ProfileRegistry, load_profiles
+from .reconciler import Step, desired_rule, plan
+from .rule_cache import RuleSnapshotCache
+from .rule_parser import iter_output_lines, iter_rules
+from .rule_store import FirewallRule, RuleStore
+from ..utils.metrics import metrics
+
+# Called with (done, total, result) as each rule of an enable, disable or delete finishes
+Progress = Callable[[int, int, Tuple[str, bool, str]], None]
+
+def create_backend(name: Optional[str] = None) -> FirewallBackend:
+    """Build the firewall backend named by `name` or OWMEBLOCK_BACKEND"""
+    # netsh is the only firewall on Windows; Linux players (Proton) get nftables
+    default = "nftables" if sys.platform.startswith("linux") else "netsh"
+    name = name or os.environ.get("OWMEBLOCK_BACKEND", default)
+    if name == "simulator":
+        from .backends.simulator import SimulatedBackend
+        return SimulatedBackend()
+    if name == "nftables":
+        from .backends.nftables import NftablesBackend
+        return NftablesBackend()
+    if name == "powershell":
+        from .backends.powershell import PowerShellBackend
+        return PowerShellBackend()
+    if name != "netsh":
+        raise ValueError(f"Unknown firewall backend: {name}")
+    from .backends.netsh import NetshBackend
+    return NetshBackend()
+
 class FirewallManager:
-    def __init__(self):
+    def __init__(self, backend: Optional[FirewallBackend] = None):
         self.RULE_NAME = "Overwatch MiddleEast"
         self.IP_LIST = ["34.1.48.0/20", "34.152.84.0/23", "34.166.0.0/16", "34.177.48.0/23", "35.192.0.0/12", "34.32.0.0/11"]
+        self.backend = backend or create_backend()
+        # "targeted" queries our own rule names first, "full" always dumps every rule
+        self.LOOKUP_MODE = "targeted"
+        # Seconds a scanned state may be reused instead of asking netsh again
+        self.SNAPSHOT_TTL = 30
+        self.snapshot = RuleSnapshotCache()
+        # Rules that can't be batched, or failed in a batch for a transient reason, are retried one by one
+        self.executor = RuleExecutor()
+        # Seconds an enable, disable or delete may take in total, however many netsh calls hang
+        self.RULE_DEADLINE = 120
+        self._target_index = None
+        self._target_index_key = None
+        self._shards = []
+        self._shards_key = None
+        self._expected_hash = None
+        self._expected_hash_key = None
+        self._region_shards: Dict[str, List[List[str]]] = {}
+        self._region_indexes: Dict[str, IPRangeIndex] = {}
+        self._region_indexes_key = None
+        # netstat runner for connection audits, started on first use
+        self.connection_source: Optional[ConnectionSource] = None
+        # Set once every region's rules are known to exist, so profile switches can skip the lookup
+        self._profiles_ready_key = None
+        # A loaded binary blocklist replaces IP_LIST as the source of target ranges
+        self.blocklist: Optional[BinaryBlocklist] = None
+        if os.environ.get("OWMEBLOCK_BLOCKLIST"):
+            self.load_blocklist(os.environ["OWMEBLOCK_BLOCKLIST"])
+        # Extra regions get their own rules; the active profile decides which are enabled
+        self.profile_error: Optional[str] = None
+        try:
+            self.profiles = load_profiles()
+        except (OSError, ValueError, KeyError) as e:
+            self.profiles = ProfileRegistry()
+            self.profile_error = str(e)
+        self.active_profile = DEFAULT_REGION
+    
+    def targets_key(self) -> Tuple:
+        """Identity of the current target ranges, used to invalidate compiled forms"""
+        if self.blocklist is not None:
+            return ("blocklist", self.blocklist.checksum, self.blocklist.count)
+        return tuple(self.IP_LIST)
+    
+    def all_targets_key(self) -> Tuple:
+        """Identity of the ranges of every region"""
+        return (self.targets_key(), self.profiles.key())
+    
+    def target_cidrs(self) -> List[str]:
+        """Target ranges as CIDR strings, from the binary blocklist if one is loaded"""
+        if self.blocklist is not None:
+            return self.blocklist.cidrs()
+        return self.IP_LIST
+    
+    def all_target_cidrs(self) -> List[str]:
+        """Target ranges of every region"""
+        cidrs = list(self.target_cidrs())
+        for region in self.profiles.regions.values():
+            cidrs.extend(region.cidrs)
+        return cidrs
+    
+    @property
+    def target_index(self) -> IPRangeIndex:
+        """Interval index of the ranges of every region, rebuilt only when they change"""
+        if self.blocklist is not None and not self.profiles.regions:
+            return self.blocklist.index
+        key = self.all_targets_key()
+        if key != self._target_index_key:
+            self._target_index = IPRangeIndex(self.all_target_cidrs())
+            self._target_index_key = key
+        return self._target_index
     
-    def run_command(self, command: str) -> Tuple[bool, str]:
+    @property
+    def shards(self) -> List[List[str]]:
+        """Target ranges collapsed and split into per-rule remote address lists"""
+        key = self.targets_key()
+        if key != self._shards_key:
+            self._shards = compile_blocklist(self.target_cidrs())
+            self._shards_key = key
+        return self._shards
+    
+    def region_shards(self, region: str) -> List[List[str]]:
+        """Per-rule remote address lists of one region, compiled once"""
+        if region == DEFAULT_REGION:
+            return self.shards
+        if region not in self._region_shards:
+            self._region_shards[region] = compile_blocklist(self.profiles.regions[region].cidrs)
+        return self._region_shards[region]
+    
+    def region_index(self, region: str) -> IPRangeIndex:
+        """Interval index of one region's ranges, rebuilt only when the ranges change"""
+        key = self.all_targets_key()
+        if key != self._region_indexes_key:
+            self._region_indexes = {}
+            self._region_indexes_key = key
+        if region not in self._region_indexes:
+            cidrs = self.target_cidrs() if region == DEFAULT_REGION else self.profiles.regions[region].cidrs
+            self._region_indexes[region] = IPRangeIndex(cidrs)
+        return self._region_indexes[region]
+    
+    def region_rule_name(self, region: str) -> str:
+        """Base name of a region's rules"""
+        return self.RULE_NAME if region == DEFAULT_REGION else self.profiles.regions[region].rule_name
+    
+    def region_rule_names(self, region: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """Names of one region's rules, one pair per shard"""
+        if stop is None:
+            stop = max(len(self.region_shards(region)), 1)
+        return [shard_rule_name(self.region_rule_name(region), direction, index)
+                for direction in ("inbound", "outbound") for index in range(start, stop)]
+    
+    def state_fingerprint(self) -> str:
+        """Cheap identity of what a stored rule state was computed for"""
+        key = (self.backend.name, self.RULE_NAME, self.targets_key(), self.profiles.fingerprint())
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+    
+    def load_blocklist(self, path: str, region: Optional[str] = None):
+        """Load target ranges from a binary blocklist, a text list or an ip-ranges JSON file"""
+        if is_binary_blocklist(path):
+            self.blocklist = BinaryBlocklist(path)
+        else:
+            self.blocklist = None
+            self.IP_LIST = collapse(load_sources(path, region))
+    
+    def close(self):
+        """Release whatever the firewall backend holds open"""
+        self.backend.close()
+        if self.connection_source is not None:
+            self.connection_source.close()
+    
+    def run_command(self, command: Union[str, Sequence[str]]) -> Tuple[bool, str]:
         """Execute command and return success status and output"""
+        with metrics.span("run_command") as span:
+            success, output = self.backend.run_command(command)
+            span.add(bytes=len(output))
+        return success, output
+    
+    def owned_rule_names(self) -> List[str]:
+        """Names of the rules this app creates, for every region"""
+        return [name for region in self.profiles.region_names() for name in self.region_rule_names(region)]
+    
+    def scan_rule_store(self, full: bool = False, on_rule: Optional[Callable[[Dict], None]] = None, max_age: Optional[float] = None) -> Tuple[bool, RuleStore]:
+        """Find target rules, querying our own rule names before falling back to a full dump"""
+        # on_rule sees each target rule as soon as it is parsed, before netsh finishes
+        cached = self.snapshot.get_store(full, max_age)
+        if cached is not None:
+            return True, cached
+        
+        with metrics.span("scan"):
+            return self._scan_target_rules(full, on_rule)
+    
+    def scan_target_rules(self, full: bool = False, on_rule: Optional[Callable[[Dict], None]] = None, max_age: Optional[float] = None) -> Tuple[bool, Dict[str, Dict[str, List[str]]]]:
+        """Names of the target rules per direction and state"""
+        success, rules = self.scan_rule_store(full, on_rule, max_age)
+        return success, rules.analyzed()
+    
+    def _scan_target_rules(self, full: bool, on_rule: Optional[Callable[[Dict], None]]) -> Tuple[bool, RuleStore]:
+        """scan_rule_store without the snapshot"""
+        if not full and self.LOOKUP_MODE == "targeted":
+            success, rules = self.scan_owned_rules(on_rule)
+            if success and len(rules) > 0:
+                self.snapshot.store(rules, full=False)
+                return success, rules
+        
+        try:
+            rules = self.collect_rules(self.backend.list_rules(), on_rule)
+        except Exception:
+            return False, RuleStore()
+        if self.backend.last_success:
+            self.snapshot.store(rules, full=True)
+        return self.backend.last_success, rules
+    
+    def scan_owned_rules(self, on_rule: Optional[Callable[[Dict], None]] = None) -> Tuple[bool, RuleStore]:
+        """Query only the rules this app creates"""
+        try:
+            rules = self.collect_rules(self.backend.list_rules(self.owned_rule_names()), on_rule)
+        except Exception:
+            return False, RuleStore()
+        return True, rules
+    
+    def get_owned_rules(self) -> Tuple[bool, List[Dict]]:
+        """Parsed records of our own rules, whatever their addresses or action"""
+        try:
+            rules = list(self.backend.list_rules(self.owned_rule_names()))
+            # Shards left over from a longer blocklist are numbered on from ours
+            for region in self.profiles.region_names():
+                index = max(len(self.region_shards(region)), 1)
+                while True:
+                    leftovers = list(self.backend.list_rules(self.region_rule_names(region, index, index + 1)))
+                    if not leftovers:
+                        break
+                    rules.extend(leftovers)
+                    index += 1
+            return True, rules
+        except Exception:
+            return False, []
+    
+    def desired_rules(self, profile: Optional[str] = None) -> List[Dict]:
+        """The rules of every region, enabled for the regions a profile blocks, the active one by default"""
+        active = self.profiles.regions_for(profile or self.active_profile)
+        return [desired_rule(shard_rule_name(self.region_rule_name(region), direction, index), direction, cidrs,
+                             enabled=region in active)
+                for region in self.profiles.region_names()
+                for direction in ("inbound", "outbound") for index, cidrs in enumerate(self.region_shards(region))]
+    
+    def plan_block(self, max_age: Optional[float] = None, profile: Optional[str] = None) -> Tuple[bool, List[Step]]:
+        """Work out the minimal changes that make our rules match the desired state of a profile"""
+        success, current = self.get_owned_rules()
+        if not success:
+            return False, []
+        steps = plan(self.desired_rules(profile), current)
+        if not any(step.action in ("add", "delete", "set-remoteip") for step in steps):
+            self._profiles_ready_key = self.all_targets_key()
+        
+        # Disabled rules from other sources that cover what the profile blocks are switched back on too,
+        # so this needs a full scan; the targeted one only returns our own rules once they exist
+        owned = set(self.owned_rule_names())
+        success, store = self.scan_rule_store(full=True, max_age=max_age)
+        if success:
+            for rule in self.active_target_rules(store, profile):
+                if not rule.enabled and rule.name not in owned:
+                    owned.add(rule.name)
+                    steps.append(Step("enable", rule.name, rule.direction))
+        return True, steps
+    
+    def active_target_rules(self, store: RuleStore, profile: Optional[str] = None) -> List[FirewallRule]:
+        """Rules of a store overlapping the ranges of the regions a profile blocks, the active one by default"""
+        found: Dict[int, FirewallRule] = {}
+        for region in self.profiles.regions_for(profile or self.active_profile):
+            index = self.region_index(region)
+            for start, end in zip(index.starts, index.ends):
+                for rule in store.overlapping(start, end):
+                    found.setdefault(id(rule), rule)
+        return [rule for rule in store if id(rule) in found]
+    
+    @staticmethod
+    def rules_state_hash(rules: Iterable[Dict]) -> str:
+        """Hash of the parts of rule records that decide whether the block works"""
+        normalized = sorted(
+            (rule["name"], rule["direction"], rule["action"], rule["enabled"],
+             tuple(merge_intervals(parse_remote_ip(rule["remoteip"]))))
+            for rule in rules
+        )
+        return hashlib.sha1(repr(normalized).encode()).hexdigest()
+    
+    def expected_state_hash(self) -> str:
+        """State hash of our rules while the block is in force, recomputed only when targets or profile change"""
+        key = (self.RULE_NAME, self.active_profile, self.all_targets_key())
+        if key != self._expected_hash_key:
+            self._expected_hash = self.rules_state_hash(dict(rule, action="Block") for rule in self.desired_rules())
+            self._expected_hash_key = key
+        return self._expected_hash
+    
+    def detect_drift(self) -> Tuple[bool, bool, List[Dict]]:
+        """Query only our own rules and report (success, drifted, current records)"""
         try:
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            return result.returncode == 0, result.stdout + result.stderr
-        except subprocess.TimeoutExpired:
-            return False, "Command timed out"
-        except Exception as e:
-            return False, str(e)
-    
-    def get_existing_rules_by_ip(self) -> Dict[str, Dict[str, int]]:
+            current = list(self.backend.list_rules(self.owned_rule_names()))
+        except Exception:
+            return False, False, []
+        if not self.backend.last_success:
+            return False, False, current
+        drifted = self.rules_state_hash(current) != self.expected_state_hash()
+        if drifted:
+            # Whatever changed our rules also made the snapshot stale
+            self.snapshot.invalidate()
+        return True, drifted, current
+    
+    def repair_drift(self, current: List[Dict]) -> List[Tuple[Step, bool, str]]:
+        """Apply the minimal steps that restore our rules from their drifted state"""
+        return self.apply_plan(plan(self.desired_rules(), current))
+    
+    def audit_connections(self, lines: Optional[Iterable[str]] = None) -> Tuple[bool, Dict]:
+        """Find open sockets to ranges the active profile blocks, from one netstat snapshot or the given lines"""
+        live = lines is None
+        if live:
+            if self.connection_source is None:
+                self.connection_source = ConnectionSource()
+            lines = self.connection_source.lines()
+        
+        regions = [(region, self.region_index(region)) for region in self.profiles.regions_for(self.active_profile)]
+        with metrics.span("audit") as span:
+            connections = iter_connections(metrics.iterate("netstat output", lines, len))
+            total, offending = find_blocked(connections, self.target_index, regions)
+            span.add(count=total)
+        if live and not self.connection_source.last_success:
+            return False, {}
+        return True, audit_report(total, offending)
+    
+    def profile_steps(self, profile: str) -> List[Step]:
+        """Enable flag flips that put the existing rules of every region on a profile"""
+        active = self.profiles.regions_for(profile)
+        return [Step("enable" if region in active else "disable",
+                     shard_rule_name(self.region_rule_name(region), direction, index), direction)
+                for region in self.profiles.region_names()
+                for direction in ("inbound", "outbound") for index in range(len(self.region_shards(region)))]
+    
+    def switch_profile(self, profile: str, max_age: Optional[float] = None) -> Tuple[bool, List[Tuple[Step, bool, str]]]:
+        """Block the regions of profile, flipping enable flags in one batch"""
+        # The profile only becomes active once every step succeeded, so a failed switch keeps the old one
+        self.profiles.regions_for(profile)
+        if self._profiles_ready_key == self.all_targets_key():
+            applied = self.apply_plan(self.profile_steps(profile))
+            if all(success for _, success, _ in applied):
+                self.active_profile = profile
+            else:
+                # Someone removed rules behind our back; plan properly next time
+                self._profiles_ready_key = None
+            return True, applied
+        
+        # Rules missing or outdated: create them once, already flipped for this profile
+        success, steps = self.plan_block(max_age, profile)
+        if not success:
+            return False, []
+        applied = self.apply_plan(steps)
+        if all(success for _, success, _ in applied):
+            self.active_profile = profile
+            self._profiles_ready_key = self.all_targets_key()
+        return True, applied
+    
+    def apply_plan(self, steps: List[Step]) -> List[Tuple[Step, bool, str]]:
+        """Apply a reconcile plan and return results per step"""
+        with metrics.span("apply_plan") as span:
+            applied = self.backend.apply_steps(steps)
+            span.add(count=len(steps))
+        
+        for step, success, _ in applied:
+            if not success:
+                continue
+            if step.action == "delete":
+                self.snapshot.remove([step.name])
+            elif step.action in ("enable", "disable"):
+                self.snapshot.set_enabled([step.name], step.action == "enable")
+            elif step.action == "add":
+                self.snapshot.remove([step.name])
+                self.snapshot.add(step.direction, step.name, step.enabled, step.remoteip)
+            else:
+                # A re-addressed rule may not have counted as a target rule before
+                self.snapshot.invalidate()
+        return applied
+    
+    def get_existing_rules_by_ip(self, max_age: Optional[float] = None) -> Dict[str, Dict[str, int]]:
         """Get detailed info about existing firewall rules that match our target IPs"""
+        success, rules = self.scan_rule_store(max_age=max_age)
+        return rules.counts() if success else self.count_by_state(None)
+    
+    @staticmethod
+    def count_by_state(analyzed_rules: Optional[Dict[str, Dict[str, List[str]]]]) -> Dict[str, Dict[str, int]]:
+        """Rule counts per direction and state, all zero without a scan result"""
         result = {
             "inbound": {"enabled": 0, "disabled": 0},
             "outbound": {"enabled": 0, "disabled": 0}
         }
         
-        success, output = self.run_command('netsh advfirewall firewall show rule name=all')
-        
-        if success:
-            analyzed_rules = self.analyze_rules(output)
-            
-            result["inbound"]["enabled"] = len(analyzed_rules["inbound"]["enabled"])
-            result["inbound"]["disabled"] = len(analyzed_rules["inbound"]["disabled"])
-            result["outbound"]["enabled"] = len(analyzed_rules["outbound"]["enabled"])
-            result["outbound"]["disabled"] = len(analyzed_rules["outbound"]["disabled"])
+        if analyzed_rules is not None:
+            for direction, states in analyzed_rules.items():
+                for state, names in states.items():
+                    result[direction][state] = len(names)
         
         return result
     
-    def analyze_rules(self, output: str) -> Dict[str, Dict[str, List[str]]]:
-        """Analyze firewall rules and return detailed information"""
-        result = {
-            "inbound": {"enabled": [], "disabled": []},
-            "outbound": {"enabled": [], "disabled": []}
-        }
-        
-        rules = output.split("Rule Name:")
-        
-        for rule_text in rules[1:]:
-            if not rule_text.strip():
+    def filter_target_rules(self, rules: Iterable[Dict]) -> Iterator[Dict]:
+        """Keep only the blocking rule records whose remote addresses overlap our targets"""
+        target_index = self.target_index
+        for rule in rules:
+            if rule["action"] != "Block":
                 continue
-            
-            rule_name = rule_text.split('\n')[0].strip()
-            
-            is_target = False
-            for ip in self.IP_LIST:
-                if ip in rule_text or ip.split('/')[0] in rule_text:
-                    is_target = True
-                    break
-            
-            if is_target and "Block" in rule_text:
-                direction = "outbound"
-                for line in rule_text.split('\n'):
-                    if "Direction:" in line:
-                        if "In" in line:
-                            direction = "inbound"
-                        elif "Out" in line:
-                            direction = "outbound"
-                        break
-                
-                if "Enabled:" in rule_text:
-                    for line in rule_text.split('\n'):
-                        if "Enabled:" in line:
-                            if "Yes" in line:
-                                result[direction]["enabled"].append(rule_name)
-                            elif "No" in line:
-                                result[direction]["disabled"].append(rule_name)
-                            break
-        return result
+            rule["ranges"] = parse_remote_ip(rule["remoteip"])
+            if target_index.overlaps_any(rule["ranges"]):
+                yield rule
+    
+    def analyze_rules(self, output: Union[str, Iterable[str]], on_rule: Optional[Callable[[Dict], None]] = None) -> Dict[str, Dict[str, List[str]]]:
+        """Analyze firewall rules and return detailed information"""
+        return self.analyze_records(iter_rules(iter_output_lines(output)), on_rule)
+    
+    def analyze_records(self, rules: Iterable[Dict], on_rule: Optional[Callable[[Dict], None]] = None) -> Dict[str, Dict[str, List[str]]]:
+        """Group parsed target rules by direction and enabled state"""
+        return self.collect_rules(rules, on_rule).analyzed()
+    
+    def collect_rules(self, rules: Iterable[Dict], on_rule: Optional[Callable[[Dict], None]] = None) -> RuleStore:
+        """Index the parsed records that are target rules"""
+        store = RuleStore()
+        # "parse" covers producing the records, "match" the filtering and indexing around it
+        with metrics.span("match") as span:
+            for rule in self.filter_target_rules(metrics.iterate("parse", rules)):
+                store.add(FirewallRule.from_record(rule))
+                span.add(count=1)
+                if on_rule:
+                    on_rule(rule)
+        return store
     
     def rule_matches_target_ips(self, rule_text: str, target_ips: List[str]) -> bool:
         """Check if a rule matches our target IPs and is a blocking rule"""
-        if "Action:" not in rule_text or "Block" not in rule_text:
-            return False
-            
-        for ip in target_ips:
-            base_ip = ip.split('/')[0]
-            if ip in rule_text or base_ip in rule_text:
+        index = IPRangeIndex(target_ips)
+        for rule in iter_rules(iter_output_lines(rule_text)):
+            if rule["action"] != "Block":
+                continue
+            if rule["name"].startswith(self.RULE_NAME):
+                return True
+            if index.overlaps_any(parse_remote_ip(rule["remoteip"])):
                 return True
-                
-        if self.RULE_NAME in rule_text:
-            return True
-            
-        if "34.1.48" in rule_text or "34.152.84" in rule_text or "34.166" in rule_text or "34.177.48" in rule_text:
-            return True
-            
         return False
     
     def create_firewall_rules(self) -> List[Tuple[str, bool, str]]:
         """Create new firewall rules and return results"""
+        desired = self.desired_rules()
         results = []
-        ip_list_str = ",".join(self.IP_LIST)
+        for rule, (name, success, output) in zip(desired, self.backend.create_rules(desired)):
+            if success:
+                self.snapshot.add(rule["direction"], name, rule["enabled"], rule["remoteip"])
+            results.append((rule["direction"], success, output))
+        return results
+    
+    @staticmethod
+    def succeeded(results: List[Tuple[str, bool, str]]) -> List[str]:
+        """Names of the rules whose command succeeded"""
+        return [name for name, success, _ in results if success]
+    
+    def run_rule_action(self, action: str, rule_names: List[str], on_progress: Optional[Progress] = None) -> List[Tuple[str, bool, str]]:
+        """Enable, disable or delete rules in one batch, then the rest one by one in parallel"""
+        # on_progress may be called from the executor's worker threads
+        deadline = time.monotonic() + self.RULE_DEADLINE
+        total = len(rule_names)
+        done = 0
         
-        # Create inbound rule
-        inbound_cmd = f'netsh advfirewall firewall add rule name="{self.RULE_NAME} - Inbound" dir=in action=block remoteip={ip_list_str} enable=yes'
-        success, output = self.run_command(inbound_cmd)
-        results.append(("inbound", success, output))
+        def progress(result: Tuple[str, bool, str]):
+            nonlocal done
+            done += 1
+            if on_progress:
+                on_progress(done, total, result)
         
-        # Create outbound rule
-        outbound_cmd = f'netsh advfirewall firewall add rule name="{self.RULE_NAME} - Outbound" dir=out action=block remoteip={ip_list_str} enable=yes'
-        success, output = self.run_command(outbound_cmd)
-        results.append(("outbound", success, output))
+        results: List[Optional[Tuple[str, bool, str]]] = [None] * total
+        batched = [index for index, name in enumerate(rule_names) if self.backend.batchable(name)]
+        if batched:
+            batch_results = getattr(self.backend, f"{action}_rules")([rule_names[index] for index in batched])
+            for index, result in zip(batched, batch_results):
+                if result[1] or not is_transient(result[2]):
+                    results[index] = result
+                    progress(result)
         
+        retry = [index for index in range(total) if results[index] is None]
+        if retry:
+            with metrics.span("rule executor") as span:
+                retried = self.executor.run([rule_names[index] for index in retry],
+                                            lambda name, timeout: self.backend.run_rule(action, name, timeout),
+                                            deadline - time.monotonic(), progress)
+                span.add(count=len(retry))
+            for index, result in zip(retry, retried):
+                results[index] = result
         return results
     
-    def enable_rules(self, rule_names: List[str]) -> List[Tuple[str, bool, str]]:
+    def enable_rules(self, rule_names: List[str], on_progress: Optional[Progress] = None) -> List[Tuple[str, bool, str]]:
         """Enable firewall rules and return results"""
-        results = []
-        for rule_name in rule_names:
-            cmd = f'netsh advfirewall firewall set rule name="{rule_name}" new enable=yes'
-            success, output = self.run_command(cmd)
-            results.append((rule_name, success, output))
+        results = self.run_rule_action("enable", rule_names, on_progress)
+        self.snapshot.set_enabled(self.succeeded(results), True)
         return results
     
-    def disable_rules(self, rule_names: List[str]) -> List[Tuple[str, bool, str]]:
+    def disable_rules(self, rule_names: List[str], on_progress: Optional[Progress] = None) -> List[Tuple[str, bool, str]]:
         """Disable firewall rules and return results"""
-        results = []
-        for rule_name in rule_names:
-            cmd = f'netsh advfirewall firewall set rule name="{rule_name}" new enable=no'
-            success, output = self.run_command(cmd)
-            results.append((rule_name, success, output))
+        results = self.run_rule_action("disable", rule_names, on_progress)
+        self.snapshot.set_enabled(self.succeeded(results), False)
         return results
     
-    def delete_rules(self, rule_names: List[str]) -> List[Tuple[str, bool, str]]:
+    def delete_rules(self, rule_names: List[str], on_progress: Optional[Progress] = None) -> List[Tuple[str, bool, str]]:
         """Delete firewall rules and return results"""
-        results = []
-        for rule_name in rule_names:
-            cmd = f'netsh advfirewall firewall delete rule name="{rule_name}"'
-            success, output = self.run_command(cmd)
-            results.append((rule_name, success, output))
-        return results
\ No newline at end of file
+        results = self.run_rule_action("delete", rule_names, on_progress)
+        self.snapshot.remove(self.succeeded(results))
+        return results
@@ -0,0 +1,76 @@
+import bisect
+import ipaddress
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+Interval = Tuple[int, int]
+
+def parse_address(token: str) -> Optional[Interval]:
+    """Parse one netsh address token into an inclusive integer interval"""
+    token = token.strip()
+    if not token or token[0].isalpha():
+        # Keywords such as Any, LocalSubnet, DNS or DefaultGateway
+        return None
+    try:
+        if "-" in token:
+            first, last = token.split("-", 1)
+            start = ipaddress.IPv4Address(first.strip())
+            end = ipaddress.IPv4Address(last.strip())
+            return int(start), int(end)
+        # Handles single addresses, prefix lengths and dotted masks alike
+        network = ipaddress.IPv4Network(token, strict=False)
+        return int(network.network_address), int(network.broadcast_address)
+    except ValueError:
+        # IPv6 or malformed entries never match our IPv4 targets
+        return None
+
+def parse_remote_ip(field: str) -> List[Interval]:
+    """Parse a comma separated RemoteIP field into integer intervals"""
+    intervals = []
+    for token in field.split(","):
+        interval = parse_address(token)
+        if interval is not None:
+            intervals.append(interval)
+    return intervals
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Sort intervals and merge the ones that overlap or touch"""
+    merged: List[List[int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+class IPRangeIndex:
+    """Sorted, non-overlapping integer intervals searchable with bisect"""
+
+    def __init__(self, cidrs: Iterable[str] = ()):
+        intervals = merge_intervals(parse_remote_ip(",".join(cidrs)))
+        self.starts = [start for start, _ in intervals]
+        self.ends = [end for _, end in intervals]
+
+    @classmethod
+    def from_arrays(cls, starts: Sequence[int], ends: Sequence[int]) -> "IPRangeIndex":
+        """Wrap already sorted, merged start/end sequences without copying them"""
+        index = cls()
+        index.starts = starts
+        index.ends = ends
+        return index
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """Check whether [start, end] overlaps any indexed interval"""
+        i = bisect.bisect_right(self.starts, end) - 1
+        return i >= 0 and self.ends[i] >= start
+
+    def overlaps_any(self, intervals: Iterable[Interval]) -> bool:
+        """Check whether any of the given intervals overlaps the index"""
+        return any(self.overlaps(start, end) for start, end in intervals)
+
+    def contains(self, address: int) -> bool:
+        """Check whether a single integer address is covered by the index"""
+        return self.overlaps(address, address)
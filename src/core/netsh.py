@@ -0,0 +1,248 @@
+import queue
+import subprocess
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+CONTEXT = ["advfirewall", "firewall"]
+PROMPT = "netsh advfirewall firewall>"
+SENTINEL_PREFIX = "__owmeblock_"
+
+def sentinel(index: int) -> str:
+    """Unknown netsh command whose error message echoes a unique marker back"""
+    return f"{SENTINEL_PREFIX}{index}__"
+
+def response_ok(output: str) -> bool:
+    """netsh prints a bare "Ok." line after every command that succeeded"""
+    return any(line.strip().lower() == "ok." for line in output.splitlines())
+
+def show_command(name: str = "all") -> str:
+    """Context command listing one rule name, or every rule"""
+    return "show rule name=all" if name == "all" else f'show rule name="{name}"'
+
+def add_command(rule: Dict) -> str:
+    """Context command creating a blocking rule, enabled unless the record says otherwise"""
+    direction = "in" if rule["direction"] == "inbound" else "out"
+    enable = "yes" if rule.get("enabled", True) else "no"
+    return f'add rule name="{rule["name"]}" dir={direction} action=block remoteip={rule["remoteip"]} enable={enable}'
+
+def enable_command(name: str, enabled: bool) -> str:
+    """Context command switching a rule on or off"""
+    return f'set rule name="{name}" new enable={"yes" if enabled else "no"}'
+
+def remoteip_command(name: str, remote_ip: str) -> str:
+    """Context command replacing a rule's remote addresses"""
+    return f'set rule name="{name}" new remoteip={remote_ip}'
+
+def delete_command(name: str) -> str:
+    """Context command deleting every rule with this name"""
+    return f'delete rule name="{name}"'
+
+def split_responses(output: str, count: int) -> List[str]:
+    """Split piped netsh output into one response per command using the sentinels"""
+    responses = []
+    current = []
+    for line in output.splitlines():
+        line = line.replace(PROMPT, "")
+        if sentinel(len(responses)) in line:
+            responses.append("\n".join(current).strip())
+            current = []
+            if len(responses) == count:
+                break
+        else:
+            current.append(line)
+    return responses
+
+class NetshBatch:
+    """Collects firewall commands and runs them all in one netsh process"""
+
+    def __init__(self, netsh_path: str = "netsh", timeout: int = 30):
+        self.netsh_path = netsh_path
+        self.timeout = timeout
+        self.commands: List[Tuple[str, str]] = []
+
+    def add(self, key: str, command: str):
+        """Queue a command relative to the `advfirewall firewall` context"""
+        self.commands.append((key, command))
+
+    def script(self) -> str:
+        """Render the queued commands, each followed by its sentinel"""
+        lines = []
+        for index, (_, command) in enumerate(self.commands):
+            lines.append(command)
+            lines.append(sentinel(index))
+        lines.append("exit")
+        return "\n".join(lines) + "\n"
+
+    def run(self) -> List[Tuple[str, bool, str]]:
+        """Run every queued command and return (key, success, output) per command"""
+        if not self.commands:
+            return []
+
+        try:
+            result = subprocess.run(
+                [self.netsh_path] + CONTEXT,
+                input=self.script(),
+                capture_output=True,
+                text=True,
+                errors="replace",
+                timeout=self.timeout
+            )
+            responses = split_responses(result.stdout + result.stderr, len(self.commands))
+        except subprocess.TimeoutExpired:
+            responses = []
+            missing = "Command timed out"
+        except Exception as e:
+            responses = []
+            missing = str(e)
+        else:
+            missing = "No response from netsh"
+
+        results = []
+        for index, (key, _) in enumerate(self.commands):
+            if index < len(responses):
+                results.append((key, response_ok(responses[index]), responses[index]))
+            else:
+                results.append((key, False, missing))
+        return results
+
+class NetshSession:
+    """Long-lived `netsh advfirewall firewall` process driven over its pipes"""
+
+    def __init__(self, netsh_path: str = "netsh", timeout: int = 30):
+        self.netsh_path = netsh_path
+        self.timeout = timeout
+        self.process: Optional[subprocess.Popen] = None
+        self.lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def is_alive(self) -> bool:
+        """Check whether the netsh process is still running"""
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Start a fresh netsh process and the thread that reads its output"""
+        self._stop()
+        self.lines = queue.Queue()
+        self.process = subprocess.Popen(
+            [self.netsh_path] + CONTEXT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            bufsize=1
+        )
+        threading.Thread(target=self._read_output, args=(self.process, self.lines), daemon=True).start()
+
+    @staticmethod
+    def _read_output(process: subprocess.Popen, lines: "queue.Queue[Optional[str]]"):
+        """Forward output lines to the queue, ending with None when the pipe closes"""
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def close(self):
+        """Stop the netsh process, cutting short a command another thread is running"""
+        if not self.lock.acquire(blocking=False):
+            # The command's reader sees the output end and abandons the process itself
+            process = self.process
+            if process is not None:
+                process.kill()
+            return
+        try:
+            self._stop()
+        finally:
+            self.lock.release()
+
+    def _stop(self):
+        """Ask the netsh process to exit, killing it if it doesn't; callers hold the lock"""
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.write("exit\n")
+            self.process.stdin.flush()
+            self.process.wait(timeout=2)
+        except Exception:
+            self.process.kill()
+        self.process = None
+
+    def _abandon(self):
+        """Kill the netsh process and wait until it is gone, so the next command starts a new one"""
+        # Without the wait, is_alive() may still see the process between its exit and being reaped
+        self.process.kill()
+        self.process.wait()
+
+    def _send(self, commands: List[str]) -> List[str]:
+        """Write commands followed by their sentinels, returning the sentinels"""
+        if not self.is_alive():
+            self.start()
+        markers = []
+        script = []
+        for command in commands:
+            marker = sentinel(self.counter)
+            self.counter += 1
+            markers.append(marker)
+            script.append(command)
+            script.append(marker)
+        self.process.stdin.write("\n".join(script) + "\n")
+        self.process.stdin.flush()
+        return markers
+
+    def _read_until(self, marker: str, deadline: float) -> Iterator[str]:
+        """Yield response lines until the marker comes back or the deadline passes"""
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                line = self.lines.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                # A hung command poisons the session, so start over next time
+                self._abandon()
+                raise TimeoutError("Command timed out")
+            if line is None:
+                self._abandon()
+                raise RuntimeError("netsh session ended unexpectedly")
+            if marker in line:
+                return
+            yield line.replace(PROMPT, "")
+
+    def execute_many(self, commands: List[str], timeout: Optional[float] = None) -> List[Tuple[bool, str]]:
+        """Run commands in the session and return (success, output) for each one"""
+        with self.lock:
+            try:
+                markers = self._send(commands)
+            except Exception as e:
+                return [(False, str(e)) for _ in commands]
+
+            results = []
+            for marker in markers:
+                deadline = time.monotonic() + (timeout or self.timeout)
+                try:
+                    output = "".join(self._read_until(marker, deadline)).strip()
+                    results.append((response_ok(output), output))
+                except Exception as e:
+                    results.append((False, str(e)))
+            return results
+
+    def execute(self, command: str, timeout: Optional[float] = None) -> Tuple[bool, str]:
+        """Run a single command in the session"""
+        return self.execute_many([command], timeout)[0]
+
+    def stream(self, command: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Run a command and yield its output lines as they arrive"""
+        # Success is reported through the last_success attribute once exhausted
+        self.last_success = False
+        with self.lock:
+            marker = self._send([command])[0]
+            deadline = time.monotonic() + (timeout or self.timeout)
+            lines = self._read_until(marker, deadline)
+            try:
+                for line in lines:
+                    if line.strip().lower() == "ok.":
+                        self.last_success = True
+                    yield line
+            finally:
+                # Drain the rest of the response so the next command starts clean
+                for _ in lines:
+                    pass
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .blocklist import collapse, load_sources
+
+# The region FirewallManager has always blocked; its rules keep RULE_NAME and its
+# ranges follow IP_LIST or a loaded blocklist
+DEFAULT_REGION = "Middle East"
+NO_REGIONS = "Nothing"
+
+class Region(NamedTuple):
+    """A named set of server ranges, blocked through its own rules"""
+    name: str
+    rule_name: str
+    cidrs: Tuple[str, ...]
+
+def default_profiles_path() -> str:
+    """Per-user location of the profiles file, next to the state file"""
+    from ..utils.state_store import default_state_path
+    return os.environ.get("OWMEBLOCK_PROFILES") or os.path.join(os.path.dirname(default_state_path()), "profiles.json")
+
+class ProfileRegistry:
+    """Extra regions with their CIDRs, and profiles naming the regions each one blocks"""
+
+    def __init__(self):
+        self.regions: Dict[str, Region] = {}
+        self.profiles: Dict[str, List[str]] = {DEFAULT_REGION: [DEFAULT_REGION], NO_REGIONS: []}
+
+    def add_region(self, name: str, cidrs: List[str], rule_name: Optional[str] = None):
+        """Register a region; its rules are named "<rule_name> - Inbound" and so on"""
+        if name == DEFAULT_REGION:
+            raise ValueError(f"{DEFAULT_REGION} is built in and takes its ranges from the blocklist")
+        self.regions[name] = Region(name, rule_name or f"Overwatch {name}", tuple(collapse(cidrs)))
+        # Every region on its own is a profile too
+        self.profiles.setdefault(name, [name])
+
+    def add_profile(self, name: str, regions: List[str]):
+        """Register a profile blocking the given regions"""
+        unknown = [region for region in regions if region != DEFAULT_REGION and region not in self.regions]
+        if unknown:
+            raise ValueError(f"Profile {name} uses unknown regions: {', '.join(unknown)}")
+        self.profiles[name] = list(regions)
+
+    def region_names(self) -> List[str]:
+        """Every region with rules, the built-in one first"""
+        return [DEFAULT_REGION] + list(self.regions)
+
+    def profile_names(self) -> List[str]:
+        return list(self.profiles)
+
+    def regions_for(self, profile: str) -> List[str]:
+        """Regions a profile blocks"""
+        if profile not in self.profiles:
+            raise ValueError(f"Unknown profile: {profile}")
+        return self.profiles[profile]
+
+    def key(self) -> Tuple:
+        """Identity of the extra regions, used to invalidate compiled rules"""
+        return tuple((region.name, region.rule_name, region.cidrs) for region in self.regions.values())
+
+    def fingerprint(self) -> str:
+        return hashlib.sha1(repr(self.key()).encode()).hexdigest()
+
+    def load_file(self, path: str):
+        """Read regions and profiles from a JSON file"""
+        # {"regions": {"Europe": ["1.2.3.0/24"], "Asia": {"source": "ip-ranges.json", "region": "asia-east1"}},
+        #  "profiles": {"Middle East + Europe": ["Middle East", "Europe"]}}
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        base = os.path.dirname(os.path.abspath(path))
+        for name, spec in data.get("regions", {}).items():
+            if isinstance(spec, dict):
+                # Ranges taken from a text or ip-ranges JSON file, relative to the profiles file
+                source = os.path.join(base, spec["source"])
+                self.add_region(name, load_sources(source, spec.get("region")), spec.get("rule_name"))
+            else:
+                self.add_region(name, spec)
+        for name, regions in data.get("profiles", {}).items():
+            self.add_profile(name, regions)
+
+def load_profiles(path: Optional[str] = None) -> ProfileRegistry:
+    """Built-in profiles plus whatever the profiles file adds"""
+    registry = ProfileRegistry()
+    path = path or default_profiles_path()
+    if os.path.exists(path):
+        registry.load_file(path)
+    return registry
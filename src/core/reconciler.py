@@ -0,0 +1,56 @@
+from typing import Dict, List, NamedTuple
+
+from .ip_index import merge_intervals, parse_remote_ip
+
+class Step(NamedTuple):
+    """One change needed to bring a rule to its desired state"""
+    action: str
+    name: str
+    direction: str
+    remoteip: str = ""
+    enabled: bool = True
+
+def desired_rule(name: str, direction: str, cidrs: List[str], enabled: bool = True) -> Dict:
+    """Build the desired record for a blocking rule"""
+    remote_ip = ",".join(cidrs)
+    return {
+        "name": name,
+        "direction": direction,
+        "remoteip": remote_ip,
+        "enabled": enabled,
+        "ranges": merge_intervals(parse_remote_ip(remote_ip)),
+    }
+
+def plan(desired: List[Dict], current: List[Dict]) -> List[Step]:
+    """Compare desired rules with the parsed current ones and list the minimal changes"""
+    wanted = {rule["name"]: rule for rule in desired}
+    existing: Dict[str, List[Dict]] = {}
+    for rule in current:
+        existing.setdefault(rule["name"], []).append(rule)
+
+    steps = []
+    for name, rules in existing.items():
+        if name not in wanted:
+            steps.append(Step("delete", name, rules[0]["direction"]))
+
+    for name, rule in wanted.items():
+        found = existing.get(name, [])
+        # Copies of a rule can't be told apart by name, and deleting by name removes them all
+        broken = len(found) > 1 or any(r["direction"] != rule["direction"] or r["action"] != "Block" for r in found)
+
+        if not found or broken:
+            # netsh can't change a rule's direction or action in place
+            if found:
+                steps.append(Step("delete", name, rule["direction"]))
+            steps.append(Step("add", name, rule["direction"], rule["remoteip"], rule["enabled"]))
+            continue
+
+        if any(merge_intervals(parse_remote_ip(r["remoteip"])) != rule["ranges"] for r in found):
+            steps.append(Step("set-remoteip", name, rule["direction"], rule["remoteip"]))
+
+        if rule["enabled"] and not all(r["enabled"] for r in found):
+            steps.append(Step("enable", name, rule["direction"]))
+        elif not rule["enabled"] and any(r["enabled"] for r in found):
+            steps.append(Step("disable", name, rule["direction"]))
+
+    return steps
@@ -0,0 +1,62 @@
+import threading
+import time
+from typing import Iterable, Optional
+
+from .rule_store import FirewallRule, RuleStore
+
+class RuleSnapshotCache:
+    """Last parsed rule state, kept current from the results of our own changes"""
+
+    def __init__(self):
+        self.rules: Optional[RuleStore] = None
+        self.full = False
+        self.taken_at = 0.0
+        self.lock = threading.Lock()
+
+    def get_store(self, full: bool = False, max_age: Optional[float] = None) -> Optional[RuleStore]:
+        """Return the snapshot if it is young enough, otherwise None"""
+        # The store is shared, so callers only read it; changes go through the methods below
+        if max_age is None:
+            return None
+        with self.lock:
+            if self.rules is None or (full and not self.full):
+                return None
+            if time.monotonic() - self.taken_at > max_age:
+                return None
+            return self.rules
+
+    def store(self, rules: RuleStore, full: bool):
+        """Replace the snapshot with a freshly scanned state"""
+        with self.lock:
+            self.rules = rules
+            self.full = full
+            self.taken_at = time.monotonic()
+
+    def invalidate(self):
+        """Force the next lookup to scan the firewall"""
+        with self.lock:
+            self.rules = None
+
+    def set_enabled(self, names: Iterable[str], enabled: bool):
+        """Switch rules between enabled and disabled"""
+        with self.lock:
+            if self.rules is None:
+                return
+            for name in names:
+                self.rules.set_enabled(name, enabled)
+
+    def remove(self, names: Iterable[str]):
+        """Drop deleted rules from the snapshot"""
+        with self.lock:
+            if self.rules is None:
+                return
+            for name in names:
+                self.rules.remove(name)
+
+    def add(self, direction: str, name: str, enabled: bool = True, remoteip: str = ""):
+        """Record a newly created rule"""
+        # Creating a rule under a name already in use adds a second copy, so it is counted again
+        with self.lock:
+            if self.rules is None:
+                return
+            self.rules.add(FirewallRule(name, direction, enabled=enabled, remoteip=remoteip))
@@ -0,0 +1,70 @@
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+# netsh labels we keep, mapped to record keys. Everything else is dropped
+# while parsing so a record never holds more than a handful of short strings.
+# netsh prints labels and values in the Windows display language, so the
+# German ones are accepted alongside English.
+FIELD_MAP = {
+    "Rule Name": "name",
+    "Enabled": "enabled",
+    "Direction": "direction",
+    "Action": "action",
+    "Program": "program",
+    "Protocol": "protocol",
+    "LocalPort": "localport",
+    "RemotePort": "remoteport",
+    "RemoteIP": "remoteip",
+    "Regelname": "name",
+    "Aktiviert": "enabled",
+    "Richtung": "direction",
+    "Aktion": "action",
+    "Programm": "program",
+    "Protokoll": "protocol",
+    "Lokaler Port": "localport",
+    "Remoteport": "remoteport",
+    "Remote-IP": "remoteip",
+}
+
+INBOUND_VALUES = {"Eingehend", "Eingang"}
+ENABLED_VALUES = {"Yes", "Ja"}
+ACTION_VALUES = {"Blockieren": "Block", "Zulassen": "Allow", "Umgehen": "Bypass"}
+
+def _normalize(record: Dict[str, str]) -> Dict[str, Union[str, bool]]:
+    """Turn raw netsh values into the shapes the rest of the app uses"""
+    direction = record.get("direction", "")
+    record["direction"] = "inbound" if direction.startswith("In") or direction in INBOUND_VALUES else "outbound"
+    record["enabled"] = record.get("enabled", "") in ENABLED_VALUES
+    action = record.get("action", "")
+    record["action"] = ACTION_VALUES.get(action, action)
+    record.setdefault("remoteip", "")
+    return record
+
+def iter_rules(lines: Iterable[str]) -> Iterator[Dict[str, Union[str, bool]]]:
+    """Parse `show rule` output line by line and yield one record per rule block"""
+    record: Optional[Dict[str, str]] = None
+
+    for line in lines:
+        label, sep, value = line.partition(":")
+        if not sep:
+            continue
+
+        key = FIELD_MAP.get(label.strip())
+        if key is None:
+            continue
+
+        if key == "name":
+            if record is not None:
+                yield _normalize(record)
+            record = {}
+
+        if record is not None:
+            record[key] = value.strip()
+
+    if record is not None:
+        yield _normalize(record)
+
+def iter_output_lines(output: Union[str, Iterable[str]]) -> Iterable[str]:
+    """Accept either a captured output string or an iterable of lines"""
+    if isinstance(output, str):
+        return output.splitlines()
+    return output
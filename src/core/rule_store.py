@@ -0,0 +1,142 @@
+import bisect
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .ip_index import Interval, parse_remote_ip
+
+DIRECTIONS = ("inbound", "outbound")
+STATES = ("enabled", "disabled")
+
+def intern(value: Optional[str]) -> str:
+    """Share one copy of strings that repeat across thousands of rules"""
+    return sys.intern(value) if value else ""
+
+class FirewallRule:
+    """One firewall rule with its remote addresses already parsed"""
+
+    __slots__ = ("name", "direction", "action", "enabled", "program", "protocol", "localport", "remoteport", "ranges")
+
+    def __init__(self, name: str, direction: str, action: str = "Block", enabled: bool = True, program: str = "",
+                 protocol: str = "", localport: str = "", remoteport: str = "",
+                 ranges: Optional[Sequence[Interval]] = None, remoteip: str = ""):
+        self.name = intern(name)
+        self.direction = intern(direction)
+        self.action = intern(action)
+        self.enabled = enabled
+        self.program = intern(program)
+        self.protocol = intern(protocol)
+        self.localport = intern(localport)
+        self.remoteport = intern(remoteport)
+        self.ranges = tuple(ranges) if ranges is not None else tuple(parse_remote_ip(remoteip))
+
+    @classmethod
+    def from_record(cls, record: Dict) -> "FirewallRule":
+        """Build a rule from a parsed netsh or PowerShell record, reusing ranges already parsed"""
+        return cls(record["name"], record["direction"], record.get("action", ""), record["enabled"],
+                   record.get("program", ""), record.get("protocol", ""), record.get("localport", ""),
+                   record.get("remoteport", ""), record.get("ranges"), record.get("remoteip", ""))
+
+    @property
+    def state(self) -> str:
+        return "enabled" if self.enabled else "disabled"
+
+    def __repr__(self) -> str:
+        return f"FirewallRule({self.name!r}, {self.direction!r}, {self.action!r}, enabled={self.enabled})"
+
+class RuleStore:
+    """Rules indexed by name, by direction and state, and by remote range"""
+
+    def __init__(self, rules: Iterable[FirewallRule] = ()):
+        # Windows allows several rules with the same name, so names map to lists
+        self.by_name: Dict[str, List[FirewallRule]] = {}
+        # Per direction and state, how many rules carry each name, in the order they were found
+        self.by_state: Dict[Tuple[str, str], Dict[str, int]] = {(direction, state): {}
+                                                                for direction in DIRECTIONS for state in STATES}
+        self.counts_by_state: Dict[Tuple[str, str], int] = {key: 0 for key in self.by_state}
+        # Sorted (start, end, rule) entries, rebuilt on the first range query after a change
+        self._ranges: Optional[List[Tuple[int, int, FirewallRule]]] = None
+        self._range_starts: List[int] = []
+        self._longest_range = 0
+        for rule in rules:
+            self.add(rule)
+
+    def __len__(self) -> int:
+        return sum(self.counts_by_state.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.by_name
+
+    def __iter__(self) -> Iterator[FirewallRule]:
+        for rules in self.by_name.values():
+            yield from rules
+
+    def _link(self, rule: FirewallRule):
+        key = (rule.direction, rule.state)
+        names = self.by_state[key]
+        names[rule.name] = names.get(rule.name, 0) + 1
+        self.counts_by_state[key] += 1
+
+    def _unlink(self, rule: FirewallRule):
+        key = (rule.direction, rule.state)
+        names = self.by_state[key]
+        names[rule.name] -= 1
+        if not names[rule.name]:
+            del names[rule.name]
+        self.counts_by_state[key] -= 1
+
+    def add(self, rule: FirewallRule):
+        """Index a rule"""
+        self.by_name.setdefault(rule.name, []).append(rule)
+        self._link(rule)
+        self._ranges = None
+
+    def remove(self, name: str) -> int:
+        """Drop every rule with this name and return how many there were"""
+        rules = self.by_name.pop(name, [])
+        for rule in rules:
+            self._unlink(rule)
+        if rules:
+            self._ranges = None
+        return len(rules)
+
+    def set_enabled(self, name: str, enabled: bool):
+        """Switch every rule with this name on or off"""
+        for rule in self.by_name.get(name, ()):
+            if rule.enabled != enabled:
+                self._unlink(rule)
+                rule.enabled = enabled
+                self._link(rule)
+
+    def names(self, direction: Optional[str] = None, state: Optional[str] = None) -> List[str]:
+        """Rule names in one direction and state, or across all of them when left out"""
+        names = []
+        for (rule_direction, rule_state), counts in self.by_state.items():
+            if direction in (None, rule_direction) and state in (None, rule_state):
+                for name, count in counts.items():
+                    names.extend([name] * count)
+        return names
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Rule counts per direction and state"""
+        return {direction: {state: self.counts_by_state[(direction, state)] for state in STATES}
+                for direction in DIRECTIONS}
+
+    def analyzed(self) -> Dict[str, Dict[str, List[str]]]:
+        """Rule names per direction and state, shaped like an analyze_rules result"""
+        return {direction: {state: self.names(direction, state) for state in STATES} for direction in DIRECTIONS}
+
+    def overlapping(self, start: int, end: int) -> List[FirewallRule]:
+        """Rules with a remote range overlapping [start, end], each listed once"""
+        if self._ranges is None:
+            self._ranges = sorted(((first, last, rule) for rule in self for first, last in rule.ranges),
+                                  key=lambda entry: entry[0])
+            self._range_starts = [entry[0] for entry in self._ranges]
+            self._longest_range = max((last - first for first, last, _ in self._ranges), default=0)
+        # A range overlapping the query starts at most one longest range before it
+        low = bisect.bisect_left(self._range_starts, start - self._longest_range)
+        high = bisect.bisect_right(self._range_starts, end)
+        found: Dict[int, FirewallRule] = {}
+        for first, last, rule in self._ranges[low:high]:
+            if last >= start:
+                found.setdefault(id(rule), rule)
+        return list(found.values())
@@ -0,0 +1,71 @@
+import threading
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple
+
+class OperationScheduler:
+    """Runs firewall operations one at a time on a single worker thread"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pending: Deque[Tuple[str, Callable[[], None]]] = deque()
+        self.running: Optional[str] = None
+        self.cancelled = threading.Event()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def submit(self, kind: str, operation: Callable[[], None]) -> bool:
+        """Queue a "scan", "watch", "audit" or "mutation" operation, returning False if it was coalesced"""
+        with self.condition:
+            if self.cancelled.is_set():
+                return False
+
+            if kind == "scan":
+                # Every mutation ends by publishing fresh status, which covers a queued scan
+                if self.running == "mutation" or any(k in ("scan", "mutation") for k, _ in self.pending):
+                    return False
+            elif kind == "watch":
+                # Background checks never delay anything the user asked for
+                if self.running is not None or self.pending:
+                    return False
+            elif kind == "audit":
+                # An audit snapshots the sockets when it runs, so one queued is as good as two
+                if any(k == "audit" for k, _ in self.pending):
+                    return False
+            else:
+                self.pending = deque(item for item in self.pending if item[0] not in ("scan", "watch"))
+
+            self.pending.append((kind, operation))
+            self.condition.notify()
+            return True
+
+    def is_busy(self) -> bool:
+        """Check whether an operation is running or waiting"""
+        with self.condition:
+            return self.running is not None or bool(self.pending)
+
+    def shutdown(self):
+        """Drop queued operations and tell the running one to stop"""
+        with self.condition:
+            self.cancelled.set()
+            self.pending.clear()
+            self.condition.notify()
+
+    def _run(self):
+        """Worker loop executing queued operations in order"""
+        while True:
+            with self.condition:
+                while not self.pending and not self.cancelled.is_set():
+                    self.condition.wait()
+                if self.cancelled.is_set():
+                    return
+                kind, operation = self.pending.popleft()
+                self.running = kind
+
+            try:
+                operation()
+            except Exception:
+                # Operations report their own errors; keep the worker alive regardless
+                pass
+            finally:
+                with self.condition:
+                    self.running = None
@@ -0,0 +1,48 @@
+import threading
+from typing import Callable, Optional
+
+class DriftWatcher:
+    """Background thread calling check() at intervals that grow while nothing changes"""
+
+    def __init__(self, check: Callable[[], Optional[bool]], min_interval: float = 5, max_interval: float = 120,
+                 backoff: float = 2):
+        # check returns True after repairing drift, False if all was well, None if it couldn't look
+        self.check = check
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start polling, unless already running"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.interval = self.min_interval
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop polling; a check already in progress finishes on its own"""
+        self.stopped.set()
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive() and not self.stopped.is_set()
+
+    def next_interval(self, drifted: Optional[bool]) -> float:
+        """Poll quickly again after a repair, slow down while the rules stay intact"""
+        if drifted:
+            return self.min_interval
+        if drifted is None:
+            return self.interval
+        return min(self.interval * self.backoff, self.max_interval)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                drifted = self.check()
+            except Exception:
+                drifted = None
+            self.interval = self.next_interval(drifted)
@@ -1,14 +1,22 @@
 import tkinter as tk
 import customtkinter as ctk
 import webbrowser
-from typing import Dict
+from typing import Dict, List
 
 class MainWindow:
-    def __init__(self, on_block_callback, on_unblock_callback, on_delete_callback, on_scan_callback):
+    def __init__(self, on_block_callback, on_unblock_callback, on_delete_callback, on_scan_callback, on_close_callback=None,
+                 on_metrics_callback=None, on_watch_callback=None, watch_enabled=False, on_profile_callback=None,
+                 on_audit_callback=None):
         self.on_block_callback = on_block_callback
         self.on_unblock_callback = on_unblock_callback
         self.on_delete_callback = on_delete_callback
         self.on_scan_callback = on_scan_callback
+        self.on_close_callback = on_close_callback
+        self.on_metrics_callback = on_metrics_callback
+        self.on_watch_callback = on_watch_callback
+        self.watch_enabled = watch_enabled
+        self.on_profile_callback = on_profile_callback
+        self.on_audit_callback = on_audit_callback
         
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
@@ -21,6 +29,10 @@ class MainWindow:
         self.root.title("OW Middle East Blocker")
         self.root.geometry("500x450")
         self.root.resizable(False, False)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        if self.on_metrics_callback:
+            # F12 logs operation timings for troubleshooting slow clicks
+            self.root.bind("<F12>", lambda event: self.on_metrics_callback())
         
         self.root.grid_columnconfigure(0, weight=1)
         self.root.grid_rowconfigure(0, weight=1)
@@ -44,9 +56,10 @@ class MainWindow:
         status_frame.grid(row=0, column=0, sticky="ew", padx=15, pady=(15, 8))
         status_frame.grid_propagate(False)
         
+        self.status_text = "🔍 Scanning firewall rules..."
         self.status_label = ctk.CTkLabel(
             status_frame,
-            text="🔍 Scanning firewall rules...",
+            text=self.status_text,
             font=ctk.CTkFont(size=13, weight="bold")
         )
         self.status_label.pack(pady=12)
@@ -113,6 +126,31 @@ class MainWindow:
         )
         self.log_text.grid(row=1, column=0, sticky="nsew", padx=12, pady=(0, 5))
         
+        if self.on_watch_callback:
+            self.watch_var = ctk.BooleanVar(value=self.watch_enabled)
+            watch_checkbox = ctk.CTkCheckBox(
+                log_frame,
+                text="Keep block in force",
+                font=ctk.CTkFont(size=10),
+                variable=self.watch_var,
+                command=lambda: self.on_watch_callback(self.watch_var.get()),
+                checkbox_width=16,
+                checkbox_height=16
+            )
+            watch_checkbox.grid(row=2, column=0, sticky="w", padx=12, pady=(3, 8))
+        
+        if self.on_profile_callback:
+            # Filled in by set_profiles once the controller knows them
+            self.profile_menu = ctk.CTkOptionMenu(
+                log_frame,
+                values=[""],
+                font=ctk.CTkFont(size=10),
+                height=20,
+                width=140,
+                command=self.on_profile_callback
+            )
+            self.profile_menu.grid(row=2, column=0, padx=12, pady=(3, 8))
+        
         github_frame = ctk.CTkFrame(log_frame, fg_color="transparent")
         github_frame.grid(row=2, column=0, sticky="e", padx=12, pady=(3, 8))
         
@@ -130,9 +168,26 @@ class MainWindow:
             border_color=("#CCCCCC", "#666666")
         )
         github_btn.pack(side="right")
+        
+        if self.on_audit_callback:
+            audit_btn = ctk.CTkButton(
+                github_frame,
+                text="Connections",
+                font=ctk.CTkFont(size=9),
+                height=20,
+                width=70,
+                command=self.on_audit_callback,
+                fg_color="transparent",
+                hover_color=("#F0F0F0", "#2B2B2B"),
+                text_color=("#666666", "#AAAAAA"),
+                border_width=1,
+                border_color=("#CCCCCC", "#666666")
+            )
+            audit_btn.pack(side="right", padx=(0, 6))
     
-    def update_status_display(self, rules: Dict[str, Dict[str, int]]):
-        """Update the status display with rule information"""
+    def update_status_display(self, rules: Dict[str, Dict[str, int]], provisional: bool = False):
+        """Update the status display with rule information, marking saved state as unverified"""
+        # rules holds RuleStore.counts(), taken on the worker thread that owns the store
         inbound_enabled = rules["inbound"]["enabled"]
         inbound_disabled = rules["inbound"]["disabled"]
         outbound_enabled = rules["outbound"]["enabled"]
@@ -155,6 +210,9 @@ class MainWindow:
             status_text = "🔴 No firewall rules found"
             text_color = ("#F44336", "#EF5350")
         
+        self.status_text = status_text
+        if provisional:
+            status_text += " (checking...)"
         self.status_label.configure(
             text=status_text,
             text_color=text_color
@@ -162,6 +220,10 @@ class MainWindow:
         
         self.update_button_states(total_enabled, total_disabled)
     
+    def confirm_status(self):
+        """Drop the unverified mark once a scan agrees with the displayed state"""
+        self.status_label.configure(text=self.status_text)
+    
     def update_button_states(self, enabled_count: int, disabled_count: int):
         """Update button states based on current rule status"""
         if enabled_count > 0:
@@ -209,6 +271,12 @@ class MainWindow:
                 text_color=("#FFFFFF", "#FFFFFF")
             )
     
+    def set_profiles(self, names: List[str], active: str):
+        """Offer the available blocking profiles, with the active one selected"""
+        if self.on_profile_callback:
+            self.profile_menu.configure(values=names)
+            self.profile_menu.set(active)
+    
     def set_buttons_state(self, enabled: bool):
         """Enable or disable all buttons during operations"""
         if not enabled:
@@ -224,6 +292,12 @@ class MainWindow:
         """Open GitHub profile in default browser"""
         webbrowser.open("https://github.com/Abodivic/")
     
+    def close(self):
+        """Stop background work and close the window"""
+        if self.on_close_callback:
+            self.on_close_callback()
+        self.root.destroy()
+    
     def run(self):
         """Start the application"""
         self.root.mainloop()
@@ -1,15 +1,23 @@
+import queue
 from datetime import datetime
 from typing import Optional
 
+from .metrics import metrics
+
 class Logger:
-    def __init__(self, log_widget=None):
+    def __init__(self, log_widget=None, max_lines: int = 1000, flush_interval_ms: int = 100):
         self.log_widget = log_widget
         self.root = None
+        self.max_lines = max_lines
+        self.flush_interval_ms = flush_interval_ms
+        # Any thread may log; only the Tk thread touches the widget
+        self.pending: "queue.SimpleQueue[str]" = queue.SimpleQueue()
     
     def set_log_widget(self, widget, root):
         """Set the log widget and root window for GUI logging"""
         self.log_widget = widget
         self.root = root
+        self.root.after(self.flush_interval_ms, self.flush)
     
     def log_message(self, message: str, level: str = "INFO"):
         """Add message to log"""
@@ -17,12 +25,31 @@ class Logger:
         log_entry = f"[{timestamp}] {level}: {message}\n"
         
         if self.log_widget and self.root:
-            self.log_widget.insert("end", log_entry)
-            self.log_widget.see("end")
-            self.root.update_idletasks()
+            self.pending.put(log_entry)
         else:
             print(log_entry.strip())
     
+    def flush(self):
+        """Write queued entries to the widget in one update and trim old lines"""
+        entries = []
+        while True:
+            try:
+                entries.append(self.pending.get_nowait())
+            except queue.Empty:
+                break
+        
+        if entries:
+            with metrics.span("log flush") as span:
+                self.log_widget.insert("end", "".join(entries))
+                # Every entry ends with a newline, so the last line is always empty
+                line_count = int(self.log_widget.index("end-1c").split(".")[0]) - 1
+                if line_count > self.max_lines:
+                    self.log_widget.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+                self.log_widget.see("end")
+                span.add(count=len(entries))
+        
+        self.root.after(self.flush_interval_ms, self.flush)
+    
     def log_success(self, message: str):
         """Log success message"""
         self.log_message(message, "SUCCESS")
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+class Span:
+    """Timing of one operation; time spent in nested spans is kept apart as child time"""
+
+    __slots__ = ("metrics", "name", "wall", "cpu", "child", "bytes", "count", "started", "cpu_started")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.child = 0.0
+        self.bytes = 0
+        self.count = 0
+        self.started = 0.0
+        self.cpu_started = 0.0
+
+    def add(self, bytes: int = 0, count: int = 0):
+        """Account output bytes and handled items (rules, lines, log entries)"""
+        self.bytes += bytes
+        self.count += count
+
+    def resume(self):
+        self.metrics.stack().append(self)
+        self.started = time.perf_counter()
+        self.cpu_started = time.thread_time()
+
+    def pause(self):
+        self.cpu += time.thread_time() - self.cpu_started
+        wall = time.perf_counter() - self.started
+        self.wall += wall
+        stack = self.metrics.stack()
+        stack.pop()
+        if stack:
+            stack[-1].child += wall
+
+    def __enter__(self) -> "Span":
+        self.resume()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pause()
+        self.metrics.record(self)
+
+class NullSpan:
+    """Span handed out while metrics are off; every method does nothing"""
+
+    __slots__ = ()
+
+    def add(self, bytes: int = 0, count: int = 0):
+        pass
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+NULL_SPAN = NullSpan()
+
+class Metrics:
+    """Per-operation wall time, CPU time, bytes and item counts, aggregated by span name"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def stack(self) -> List[Span]:
+        """Spans currently open on this thread"""
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def span(self, name: str):
+        """Context manager timing one call of the named operation"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    def iterate(self, name: str, iterable: Iterable[T], size: Optional[Callable[[T], int]] = None) -> Iterable[T]:
+        """Time only the work of producing each item, not what the consumer does with it"""
+        if not self.enabled:
+            return iterable
+        return self._iterate(name, iterable, size)
+
+    def _iterate(self, name: str, iterable: Iterable[T], size: Optional[Callable[[T], int]]) -> Iterator[T]:
+        span = Span(self, name)
+        iterator = iter(iterable)
+        try:
+            while True:
+                span.resume()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    span.pause()
+                span.add(size(item) if size else 0, 1)
+                yield item
+        finally:
+            self.record(span)
+
+    def record(self, span: Span):
+        """Fold a finished span into the totals for its name"""
+        with self.lock:
+            stats = self.stats.get(span.name)
+            if stats is None:
+                stats = self.stats[span.name] = {"calls": 0, "wall": 0.0, "self": 0.0, "cpu": 0.0, "max": 0.0,
+                                                 "bytes": 0, "count": 0}
+            stats["calls"] += 1
+            stats["wall"] += span.wall
+            stats["self"] += span.wall - span.child
+            stats["cpu"] += span.cpu
+            stats["max"] = max(stats["max"], span.wall)
+            stats["bytes"] += span.bytes
+            stats["count"] += span.count
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Copy of the totals, safe to serialize while other threads keep recording"""
+        with self.lock:
+            return {name: dict(stats) for name, stats in self.stats.items()}
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self.lock:
+            self.stats.clear()
+
+    def report(self) -> List[str]:
+        """One readable line per span name, slowest first"""
+        lines = []
+        for name, stats in sorted(self.snapshot().items(), key=lambda item: item[1]["wall"], reverse=True):
+            line = (f"{name}: {stats['calls']} calls, {stats['wall'] * 1000:.1f} ms total "
+                    f"({stats['self'] * 1000:.1f} ms own, {stats['cpu'] * 1000:.1f} ms CPU, "
+                    f"max {stats['max'] * 1000:.1f} ms)")
+            if stats["bytes"]:
+                line += f", {stats['bytes'] / 1024:.1f} KiB"
+            if stats["count"]:
+                line += f", {stats['count']} items"
+            lines.append(line)
+        return lines
+
+    def dump(self, path: str):
+        """Write the totals as JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+# Shared collector; OWMEBLOCK_METRICS=1 turns it on from the start
+metrics = Metrics(enabled=os.environ.get("OWMEBLOCK_METRICS") == "1")
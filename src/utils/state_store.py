@@ -0,0 +1,65 @@
+import json
+import os
+import time
+from typing import Dict, Optional
+
+def default_state_path() -> str:
+    """Per-user location of the state file"""
+    if os.environ.get("OWMEBLOCK_STATE_FILE"):
+        return os.environ["OWMEBLOCK_STATE_FILE"]
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(base, "owmeblock", "state.json")
+
+class StateStore:
+    """Last known rule counts on disk, so the next launch can show them before scanning"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_state_path()
+
+    def read(self) -> Dict:
+        """Whole state file, empty if missing or unreadable"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def load(self, fingerprint: str) -> Optional[Dict[str, Dict[str, int]]]:
+        """Stored rule counts, or None if missing, unreadable or saved for other targets"""
+        state = self.read()
+        if state.get("fingerprint") != fingerprint:
+            return None
+        return state.get("rules")
+
+    def save(self, rules: Dict[str, Dict[str, int]], fingerprint: str) -> bool:
+        """Replace the stored rule counts; failures only cost the next launch its head start"""
+        state = self.read()
+        state.update(fingerprint=fingerprint, saved_at=time.time(), rules=rules)
+        return self.write(state)
+
+    def load_profile(self) -> Optional[str]:
+        """Profile chosen in the last session"""
+        return self.read().get("profile")
+
+    def save_profile(self, profile: str) -> bool:
+        """Remember the chosen profile for the next session"""
+        state = self.read()
+        state["profile"] = profile
+        return self.write(state)
+
+    def write(self, state: Dict) -> bool:
+        """Replace the state file"""
+        temp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            # Readers never see a half written file
+            os.replace(temp_path, self.path)
+            return True
+        except OSError:
+            return False
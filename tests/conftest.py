@@ -0,0 +1,8 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def isolated_environment(tmp_path, monkeypatch):
+    """Keep profiles, state and blocklists of the machine running the tests out of them"""
+    monkeypatch.setenv("OWMEBLOCK_PROFILES", str(tmp_path / "profiles.json"))
+    monkeypatch.setenv("OWMEBLOCK_STATE_FILE", str(tmp_path / "state.json"))
+    monkeypatch.delenv("OWMEBLOCK_BLOCKLIST", raising=False)
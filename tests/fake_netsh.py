@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Stand-in for `netsh advfirewall firewall` that answers piped commands from an in-memory firewall"""
+# Rules named in FAKE_NETSH_RULES exist from the start. The commands "hang" and
+# "crash" make the process stop answering or exit, the way a broken netsh would.
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.backends.simulator import SimulatedBackend
+from src.core.netsh import PROMPT
+
+def main() -> int:
+    firewall = SimulatedBackend()
+    for name in filter(None, os.environ.get("FAKE_NETSH_RULES", "").split(",")):
+        firewall.add_rule(name, remoteip="34.166.0.0/16")
+
+    for line in sys.stdin:
+        command = line.strip()
+        if command == "exit":
+            return 0
+        if command == "crash":
+            return 1
+        if command == "hang":
+            time.sleep(3600)
+        _, output = firewall.execute(command)
+        sys.stdout.write(f"{PROMPT}{output}\n")
+        sys.stdout.flush()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
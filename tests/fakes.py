@@ -0,0 +1,74 @@
+"""Stand-ins for the Tk objects the controller and logger talk to"""
+from typing import Callable, List, Tuple
+
+class FakeRoot:
+    """Collects after() callbacks and runs them when asked, like one turn of the Tk event loop"""
+
+    def __init__(self):
+        self.scheduled: List[Tuple[int, Callable[[], None]]] = []
+
+    def after(self, delay_ms: int, callback: Callable[[], None]):
+        self.scheduled.append((delay_ms, callback))
+
+    def run_pending(self):
+        """Run callbacks scheduled so far, but not the ones they schedule in turn"""
+        scheduled, self.scheduled = self.scheduled, []
+        for _, callback in scheduled:
+            callback()
+
+class FakeText:
+    """The part of a Tk text widget the logger uses"""
+
+    def __init__(self):
+        self.text = ""
+
+    def insert(self, index: str, text: str):
+        assert index == "end"
+        self.text += text
+
+    def index(self, index: str) -> str:
+        assert index == "end-1c"
+        return f"{self.text.count(chr(10)) + 1}.0"
+
+    def delete(self, first: str, last: str):
+        assert first == "1.0" and last.endswith(".0")
+        self.text = "".join(self.text.splitlines(keepends=True)[int(last.split(".")[0]) - 1:])
+
+    def see(self, index: str):
+        pass
+
+    def lines(self) -> List[str]:
+        return self.text.splitlines()
+
+class FakeWindow:
+    """Records what the controller shows instead of drawing it"""
+
+    def __init__(self):
+        self.root = FakeRoot()
+        self.log_widget = FakeText()
+        self.buttons_enabled = True
+        self.statuses = []
+        self.confirmed = 0
+
+    def get_log_widget(self):
+        return self.log_widget
+
+    def get_root(self):
+        return self.root
+
+    def set_profiles(self, names, active):
+        self.profiles = (names, active)
+
+    def set_buttons_state(self, enabled: bool):
+        self.buttons_enabled = enabled
+
+    def update_status_display(self, rules, provisional: bool = False):
+        self.statuses.append((rules, provisional))
+        # The real window unlocks the buttons whenever it redraws the status
+        self.buttons_enabled = True
+
+    def confirm_status(self):
+        self.confirmed += 1
+
+    def update_button_states(self, enabled_count: int, disabled_count: int):
+        self.buttons_enabled = True
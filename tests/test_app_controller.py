@@ -0,0 +1,29 @@
+import pytest
+
+from src.core.app_controller import AppController
+from src.core.backends.simulator import SimulatedBackend
+from src.core.firewall import FirewallManager
+from src.utils.logger import Logger
+from src.utils.metrics import metrics
+from src.utils.state_store import StateStore
+
+from .fakes import FakeWindow
+
+@pytest.fixture
+def metrics_enabled():
+    enabled = metrics.enabled
+    metrics.enabled = True
+    yield
+    metrics.enabled = enabled
+
+def test_shutdown_survives_unwritable_metrics_file(tmp_path, monkeypatch, metrics_enabled):
+    # A directory where the file should go makes the write fail
+    monkeypatch.setenv("OWMEBLOCK_METRICS_FILE", str(tmp_path))
+    window = FakeWindow()
+    controller = AppController(window, Logger(), FirewallManager(SimulatedBackend()),
+                               StateStore(str(tmp_path / "state.json")))
+    controller.shutdown()
+
+    assert controller.scheduler.cancelled.is_set()
+    window.root.run_pending()
+    assert "ERROR: Could not write metrics" in window.log_widget.text
@@ -0,0 +1,47 @@
+import sys
+import time
+
+import pytest
+
+from src.core.async_runner import AsyncCommandRunner
+
+def sleep_command(seconds: float):
+    return [sys.executable, "-c", f"import time; time.sleep({seconds})"]
+
+@pytest.fixture
+def runner():
+    runner = AsyncCommandRunner(max_concurrency=2)
+    yield runner
+    runner.close()
+
+def test_output_and_exit_status(runner):
+    assert runner.run_sync([sys.executable, "-c", "print('Ok.')"]) == (True, "Ok.\n")
+    assert runner.run_sync([sys.executable, "-c", "import sys; print('no'); sys.exit(1)"]) == (False, "no\n")
+    assert list(runner.stream_sync([sys.executable, "-c", "print('a'); print('b')"])) == ["a\n", "b\n"]
+    assert runner.last_success
+
+def test_concurrency_limit(runner):
+    started = time.monotonic()
+    results = runner.run_all_sync([sleep_command(0.5)] * 4)
+    elapsed = time.monotonic() - started
+    assert all(success for success, _ in results)
+    # Two at a time: two rounds of half a second
+    assert 1.0 <= elapsed < 1.9
+
+def test_per_command_timeout(runner):
+    started = time.monotonic()
+    assert runner.run_sync(sleep_command(5), timeout=0.3) == (False, "Command timed out")
+    assert time.monotonic() - started < 2
+
+def test_global_deadline_covers_queued_commands(runner):
+    started = time.monotonic()
+    results = runner.run_all_sync([sleep_command(1)] * 6, global_timeout=1.5)
+    elapsed = time.monotonic() - started
+    # The first pair finishes, the second is cut off at the deadline, the third never starts
+    assert [success for success, _ in results] == [True, True, False, False, False, False]
+    assert all(output == "Command timed out" for _, output in results[2:])
+    assert elapsed < 2.2
+
+def test_missing_executable(runner):
+    success, output = runner.run_sync(["/nonexistent/owmeblock-netsh"])
+    assert not success and "No such file" in output
@@ -0,0 +1,19 @@
+import pytest
+
+from src.core.backends.base import FirewallBackend
+from src.core.backends.netsh import NetshBackend
+from src.core.backends.nftables import NftablesBackend
+from src.core.backends.powershell import PowerShellBackend
+from src.core.backends.simulator import SimulatedBackend
+
+class ListOnlyBackend(FirewallBackend):
+    def list_rules(self, names=None):
+        return iter(())
+
+def test_incomplete_backend_fails_when_created():
+    with pytest.raises(TypeError, match="create_rules"):
+        ListOnlyBackend()
+
+@pytest.mark.parametrize("backend_class", [NetshBackend, NftablesBackend, PowerShellBackend, SimulatedBackend])
+def test_backends_implement_every_operation(backend_class):
+    assert not backend_class.__abstractmethods__
@@ -0,0 +1,49 @@
+import json
+
+from src.core.blocklist import (MAX_REMOTEIP_ENTRIES, MAX_REMOTEIP_LENGTH, collapse, compile_blocklist, load_sources,
+                                shard, shard_rule_name)
+
+def test_collapse_merges_overlapping_and_adjacent_ranges():
+    assert collapse(["34.166.0.0/16", "34.166.12.0/24", "34.167.0.0/16", "34.166.0.0/16"]) == ["34.166.0.0/15"]
+    assert collapse(["10.0.0.0/24", "10.0.1.0-10.0.1.255", "10.0.2.5"]) == ["10.0.0.0/23", "10.0.2.5/32"]
+    assert collapse(["Any", "::1/128", "not a range"]) == []
+
+def test_shards_fit_into_a_rule():
+    # 3000 single addresses in distinct /24s, so nothing merges and several shards are needed
+    cidrs = collapse(f"{10 + index // 65536}.{index // 256 % 256}.{index % 256}.1" for index in range(3000))
+    shards = compile_blocklist(cidrs)
+    assert [cidr for group in shards for cidr in group] == cidrs
+    for group in shards:
+        assert len(group) <= MAX_REMOTEIP_ENTRIES
+        assert len(",".join(group)) <= MAX_REMOTEIP_LENGTH
+
+def test_shard_limits():
+    assert shard(["1.1.1.1/32"] * 5, max_entries=2) == [["1.1.1.1/32"] * 2] * 2 + [["1.1.1.1/32"]]
+    # 10 characters each, 21 with the separating comma
+    assert shard(["1.1.1.1/32"] * 3, max_length=21) == [["1.1.1.1/32"] * 2, ["1.1.1.1/32"]]
+    assert shard([]) == []
+
+def test_shard_rule_name():
+    assert shard_rule_name("Overwatch MiddleEast", "inbound", 0) == "Overwatch MiddleEast - Inbound"
+    assert shard_rule_name("Overwatch MiddleEast", "outbound", 2) == "Overwatch MiddleEast - Outbound #3"
+
+def test_load_text_skips_comments_and_invalid_lines(tmp_path):
+    path = tmp_path / "list.txt"
+    path.write_text("# Middle East servers\n34.166.0.0/16  # Dammam\n\n   \n2600:1900::/28\nnot a range\n"
+                    "34.1.48.0-34.1.63.255\n", encoding="utf-8")
+    assert load_sources(str(path)) == ["34.166.0.0/16", "34.1.48.0-34.1.63.255"]
+
+def test_load_ip_ranges_json(tmp_path):
+    path = tmp_path / "ip-ranges.json"
+    path.write_text(json.dumps({"prefixes": [
+        {"ipv4Prefix": "34.1.48.0/20", "scope": "me-central2"},
+        {"ipv6Prefix": "2600:1900:4010::/44", "scope": "me-central2"},
+        {"ip_prefix": "35.192.0.0/12", "region": "us-central1"},
+    ]}), encoding="utf-8")
+    assert load_sources(str(path)) == ["34.1.48.0/20", "35.192.0.0/12"]
+    assert load_sources(str(path), "me-central2") == ["34.1.48.0/20"]
+
+def test_load_json_list_skips_invalid_entries(tmp_path):
+    path = tmp_path / "list.json"
+    path.write_text(json.dumps(["34.166.0.0/16", "::/0", "bogus"]), encoding="utf-8")
+    assert load_sources(str(path)) == ["34.166.0.0/16"]
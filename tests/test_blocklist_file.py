@@ -0,0 +1,65 @@
+import struct
+
+import pytest
+
+from src.core.blocklist_file import HEADER, MAGIC, BinaryBlocklist, is_binary_blocklist, write_blocklist
+from src.core.ip_index import parse_address
+
+def written(tmp_path, cidrs) -> str:
+    path = str(tmp_path / "list.owbl")
+    write_blocklist(path, cidrs)
+    return path
+
+def test_round_trip(tmp_path):
+    path = written(tmp_path, ["34.166.0.0/16", "34.167.0.0/16", "10.0.0.0/8", "10.1.2.3"])
+    assert is_binary_blocklist(path)
+    blocklist = BinaryBlocklist(path)
+    # Adjacent and covered ranges are merged when written
+    assert len(blocklist) == 2
+    assert blocklist.cidrs() == ["10.0.0.0/8", "34.166.0.0/15"]
+    assert blocklist.index.contains(parse_address("34.167.255.255")[0])
+    assert not blocklist.index.contains(parse_address("34.168.0.0")[0])
+
+def test_empty_list(tmp_path):
+    blocklist = BinaryBlocklist(written(tmp_path, []))
+    assert len(blocklist) == 0 and blocklist.cidrs() == []
+    assert not blocklist.index.contains(0)
+
+def corrupt(path: str, offset: int, data: bytes):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+
+def test_wrong_magic(tmp_path):
+    path = written(tmp_path, ["34.166.0.0/16"])
+    corrupt(path, 0, b"XXXX")
+    assert not is_binary_blocklist(path)
+    with pytest.raises(ValueError, match="not a binary blocklist"):
+        BinaryBlocklist(path)
+
+def test_wrong_version(tmp_path):
+    path = written(tmp_path, ["34.166.0.0/16"])
+    corrupt(path, len(MAGIC), struct.pack("<H", 2))
+    with pytest.raises(ValueError, match="Unsupported blocklist version 2"):
+        BinaryBlocklist(path)
+
+@pytest.mark.parametrize("size", [0, 3, HEADER.size - 1])
+def test_too_short(tmp_path, size):
+    path = written(tmp_path, ["34.166.0.0/16"])
+    with open(path, "r+b") as f:
+        f.truncate(size)
+    with pytest.raises(ValueError, match="too short"):
+        BinaryBlocklist(path)
+
+def test_truncated_payload(tmp_path):
+    path = written(tmp_path, ["34.166.0.0/16", "10.0.0.0/8"])
+    with open(path, "r+b") as f:
+        f.truncate(HEADER.size + 12)
+    with pytest.raises(ValueError, match="truncated"):
+        BinaryBlocklist(path)
+
+def test_checksum_mismatch(tmp_path):
+    path = written(tmp_path, ["34.166.0.0/16"])
+    corrupt(path, HEADER.size, b"\xff")
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        BinaryBlocklist(path)
@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+from src import cli
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_cli_import_skips_classifier():
+    code = "import sys, src.cli; print('src.core.classifier' in sys.modules, 'numpy' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert output.split() == ["False", "False"]
+
+def test_classify(tmp_path, capsys):
+    path = tmp_path / "addresses.txt"
+    path.write_text("34.166.1.1\n8.8.8.8\nnot an address\n34.166.1.1\n")
+    assert cli.main(["classify", str(path), "--backend", "simulator"]) == 0
+    assert capsys.readouterr().out.startswith("4 addresses: 2 in target ranges, 1 outside, 1 invalid")
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from src.core.backends.simulator import SimulatedBackend
+from src.core.connections import Connection, iter_connections, parse_connection, split_endpoint
+from src.core.firewall import FirewallManager
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def read_fixture(name: str):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.readlines()
+
+def audit(name: str):
+    success, report = FirewallManager(SimulatedBackend()).audit_connections(read_fixture(name))
+    assert success
+    return report
+
+@pytest.mark.parametrize("line, expected", [
+    ("  TCP    192.168.1.20:50412     34.166.12.7:26503      ESTABLISHED     8812",
+     Connection("TCP", "192.168.1.20:50412", "34.166.12.7:26503", "ESTABLISHED", 8812, "")),
+    # Windows leaves the state column of UDP sockets empty
+    ("  UDP    192.168.1.20:60123     34.1.50.3:26504                        8812",
+     Connection("UDP", "192.168.1.20:60123", "34.1.50.3:26504", "", 8812, "")),
+    ("tcp        0     36 10.0.0.5:41000          34.166.3.4:26503        ESTABLISHED 4021/Overwatch Launcher",
+     Connection("TCP", "10.0.0.5:41000", "34.166.3.4:26503", "ESTABLISHED", 4021, "Overwatch Launcher")),
+    ("udp        0      0 0.0.0.0:68              0.0.0.0:*                           655/dhclient        ",
+     Connection("UDP", "0.0.0.0:68", "0.0.0.0:*", "", 655, "dhclient")),
+    ("tcp        0      0 10.0.0.5:41002          34.32.1.1:443           TIME_WAIT   -                   ",
+     Connection("TCP", "10.0.0.5:41002", "34.32.1.1:443", "TIME_WAIT", 0, "")),
+])
+def test_parse_connection(line, expected):
+    assert parse_connection(line) == expected
+
+@pytest.mark.parametrize("line", ["", "Active Connections", "  Proto  Local Address          Foreign Address        State           PID",
+                                  "Proto Recv-Q Send-Q Local Address           Foreign Address         State       PID/Program name"])
+def test_skips_headers(line):
+    assert parse_connection(line) is None
+
+def test_split_endpoint():
+    assert split_endpoint("[::ffff:35.200.1.9]:443") == ("35.200.1.9", "443")
+    assert split_endpoint("::ffff:35.200.7.7:443") == ("35.200.7.7", "443")
+    assert split_endpoint("[::]:0") == ("::", "0")
+    assert split_endpoint("*:*") == ("*", "*")
+
+def test_fixtures_parse_every_socket():
+    assert len(list(iter_connections(read_fixture("netstat_windows.txt")))) == 9
+    assert len(list(iter_connections(read_fixture("netstat_linux.txt")))) == 8
+
+def test_audit_windows_fixture():
+    report = audit("netstat_windows.txt")
+    assert (report["sockets"], report["offending"]) == (9, 3)
+    # The TIME_WAIT socket to a blocked range is already closed and not reported
+    assert [(process["pid"], [connection["remote"] for connection in process["connections"]])
+            for process in report["processes"]] == [
+        (8812, ["34.166.12.7:26503", "[::ffff:35.200.1.9]:443", "34.1.50.3:26504"])]
+    assert {connection["region"] for connection in report["processes"][0]["connections"]} == {"Middle East"}
+
+def test_audit_linux_fixture():
+    report = audit("netstat_linux.txt")
+    assert (report["sockets"], report["offending"]) == (8, 3)
+    assert [(process["pid"], process["program"], len(process["connections"])) for process in report["processes"]] == [
+        (4021, "Overwatch Launcher", 2), (4100, "wine64-preloader", 1)]
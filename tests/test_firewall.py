@@ -0,0 +1,54 @@
+from src import cli
+from src.core.backends.simulator import SimulatedBackend
+from src.core.firewall import FirewallManager
+
+def make_firewall() -> FirewallManager:
+    return FirewallManager(SimulatedBackend())
+
+def test_unblock_disables_foreign_target_rules():
+    firewall = make_firewall()
+    firewall.backend.add_rule("Foreign", remoteip="34.166.0.0/16", enabled=False)
+    firewall.apply_plan(firewall.plan_block()[1])
+    assert firewall.scan_target_rules(full=True)[1]["inbound"]["enabled"] == [
+        "Foreign", "Overwatch MiddleEast - Inbound"]
+
+    assert cli.unblock(firewall) == 0
+    firewall.snapshot.invalidate()
+    analyzed_rules = firewall.scan_target_rules(full=True)[1]
+    assert analyzed_rules["inbound"]["enabled"] == [] and analyzed_rules["outbound"]["enabled"] == []
+    assert sorted(analyzed_rules["inbound"]["disabled"]) == ["Foreign", "Overwatch MiddleEast - Inbound"]
+
+def test_repair_removes_duplicate_rules():
+    firewall = make_firewall()
+    firewall.apply_plan(firewall.plan_block()[1])
+    # Another tool recreated one of our rules without removing the old copy
+    firewall.backend.add_rule("Overwatch MiddleEast - Inbound", remoteip=",".join(firewall.IP_LIST))
+
+    success, drifted, current = firewall.detect_drift()
+    assert success and drifted
+    applied = firewall.repair_drift(current)
+    assert [(step.action, step.name) for step, _, _ in applied] == [
+        ("delete", "Overwatch MiddleEast - Inbound"), ("add", "Overwatch MiddleEast - Inbound")]
+    assert all(success for _, success, _ in applied)
+    assert firewall.detect_drift()[:2] == (True, False)
+
+def test_block_enables_foreign_rules_of_active_regions_only():
+    firewall = make_firewall()
+    firewall.profiles.add_region("Europe", ["1.2.3.0/24"])
+    firewall.backend.add_rule("Foreign ME", remoteip="34.166.1.0/24", enabled=False)
+    firewall.backend.add_rule("Foreign EU", remoteip="1.2.3.4", enabled=False)
+
+    success, steps = firewall.plan_block()
+    assert success
+    assert [step.name for step in steps if step.action == "enable"] == ["Foreign ME"]
+
+def test_block_enables_foreign_rules_after_own_rules_exist():
+    firewall = make_firewall()
+    firewall.apply_plan(firewall.plan_block()[1])
+    firewall.backend.add_rule("Foreign", remoteip="34.166.0.0/16", enabled=False)
+
+    success, steps = firewall.plan_block()
+    assert success
+    assert [(step.action, step.name) for step in steps] == [("enable", "Foreign")]
+    assert all(success for _, success, _ in firewall.apply_plan(steps))
+    assert "Foreign" in firewall.scan_target_rules(full=True)[1]["inbound"]["enabled"]
@@ -0,0 +1,54 @@
+import ipaddress
+
+import pytest
+
+from src.core.ip_index import IPRangeIndex, merge_intervals, parse_address, parse_remote_ip
+
+def address(text: str) -> int:
+    return int(ipaddress.IPv4Address(text))
+
+@pytest.mark.parametrize("token, expected", [
+    ("34.166.0.0/16", ("34.166.0.0", "34.166.255.255")),
+    ("34.1.48.0/255.255.240.0", ("34.1.48.0", "34.1.63.255")),
+    ("35.200.1.0-35.200.1.9", ("35.200.1.0", "35.200.1.9")),
+    (" 35.200.1.0 - 35.200.1.9 ", ("35.200.1.0", "35.200.1.9")),
+    ("10.1.2.3", ("10.1.2.3", "10.1.2.3")),
+    # netsh shows host bits of a mask as it got them
+    ("34.166.1.7/16", ("34.166.0.0", "34.166.255.255")),
+])
+def test_parse_address(token, expected):
+    assert parse_address(token) == (address(expected[0]), address(expected[1]))
+
+@pytest.mark.parametrize("token", ["Any", "LocalSubnet", "DNS", "DefaultGateway", "", "2600:1900::/28", "fe80::1-fe80::9",
+                                   "300.1.1.1", "34.166.0.0/33", "1.2.3.4-banana"])
+def test_parse_address_rejects(token):
+    assert parse_address(token) is None
+
+def test_parse_remote_ip():
+    assert parse_remote_ip("Any") == []
+    assert parse_remote_ip("LocalSubnet,34.1.48.0/255.255.240.0,::1,10.0.0.1-10.0.0.2") == [
+        (address("34.1.48.0"), address("34.1.63.255")), (address("10.0.0.1"), address("10.0.0.2"))]
+
+def test_merge_intervals():
+    assert merge_intervals([(10, 20), (1, 5), (6, 8), (15, 30), (40, 50)]) == [(1, 8), (10, 30), (40, 50)]
+    assert merge_intervals([]) == []
+
+def test_index_queries():
+    index = IPRangeIndex(["34.166.0.0/16", "34.167.0.0/16", "35.200.1.0-35.200.1.9", "Any"])
+    # Adjacent ranges are merged into one interval
+    assert len(index) == 2
+    assert index.contains(address("34.167.255.255"))
+    assert not index.contains(address("34.168.0.0"))
+    assert not index.contains(address("35.200.1.10"))
+    # A query range overlapping either end or enclosing an interval
+    assert index.overlaps(address("35.200.1.9"), address("35.200.2.0"))
+    assert index.overlaps(address("35.200.0.0"), address("35.200.1.0"))
+    assert index.overlaps(address("35.0.0.0"), address("36.0.0.0"))
+    assert not index.overlaps(address("35.200.1.10"), address("35.200.255.255"))
+    assert index.overlaps_any(parse_remote_ip("8.8.8.8,34.166.12.0/24"))
+    assert not index.overlaps_any(parse_remote_ip("Any,8.8.8.8"))
+
+def test_empty_index():
+    index = IPRangeIndex()
+    assert len(index) == 0
+    assert not index.contains(0) and not index.overlaps(0, 2 ** 32 - 1)
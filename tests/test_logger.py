@@ -0,0 +1,56 @@
+import threading
+
+from src.utils.logger import Logger
+
+from .fakes import FakeRoot, FakeText
+
+def attached_logger(max_lines: int = 1000):
+    logger = Logger(max_lines=max_lines)
+    widget, root = FakeText(), FakeRoot()
+    logger.set_log_widget(widget, root)
+    return logger, widget, root
+
+def messages(widget: FakeText):
+    return [line.split(": ", 1)[1] for line in widget.lines()]
+
+def test_queued_until_flushed_in_order():
+    logger, widget, root = attached_logger()
+    logger.log_info("first")
+    logger.log_error("second")
+    logger.log_success("third")
+    # Nothing touches the widget outside the Tk thread's flush
+    assert widget.text == ""
+
+    root.run_pending()
+    assert messages(widget) == ["first", "second", "third"]
+    assert [line.split("] ", 1)[1].split(":")[0] for line in widget.lines()] == ["INFO", "ERROR", "SUCCESS"]
+    # Each flush schedules the next one
+    assert [delay for delay, _ in root.scheduled] == [logger.flush_interval_ms]
+
+def test_trims_to_line_cap():
+    logger, widget, root = attached_logger(max_lines=5)
+    for index in range(3):
+        logger.log_info(f"message {index}")
+    root.run_pending()
+    for index in range(3, 12):
+        logger.log_info(f"message {index}")
+    root.run_pending()
+    assert messages(widget) == [f"message {index}" for index in range(7, 12)]
+
+def test_messages_from_other_threads():
+    logger, widget, root = attached_logger()
+    threads = [threading.Thread(target=lambda n=n: [logger.log_info(f"{n}-{i}") for i in range(50)]) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    root.run_pending()
+    logged = messages(widget)
+    assert len(logged) == 200
+    # Each thread's messages keep their order
+    for n in range(4):
+        assert [message for message in logged if message.startswith(f"{n}-")] == [f"{n}-{i}" for i in range(50)]
+
+def test_prints_without_widget(capsys):
+    Logger().log_warning("no window yet")
+    assert capsys.readouterr().out.rstrip().endswith("WARNING: no window yet")
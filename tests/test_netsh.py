@@ -0,0 +1,100 @@
+import os
+import stat
+import sys
+import threading
+import time
+
+import pytest
+
+from src.core.backends.netsh import NetshBackend
+from src.core.netsh import PROMPT, NetshBatch, NetshSession, enable_command, sentinel, split_responses
+
+FAKE_NETSH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_netsh.py")
+
+@pytest.fixture
+def netsh_path(tmp_path, monkeypatch) -> str:
+    """Executable running fake_netsh.py with the current interpreter, knowing rule A"""
+    monkeypatch.setenv("FAKE_NETSH_RULES", "A")
+    path = tmp_path / "netsh"
+    path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_NETSH}" "$@"\n')
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+def test_split_responses():
+    output = (f"{PROMPT}Updated 1 rule(s).\nOk.\n"
+              f"{PROMPT}The following command was not found: {sentinel(0)}.\n"
+              f"{PROMPT}No rules match the specified criteria.\n"
+              f"{PROMPT}The following command was not found: {sentinel(1)}.\n")
+    assert split_responses(output, 2) == ["Updated 1 rule(s).\nOk.", "No rules match the specified criteria."]
+    # Output cut short before the second sentinel
+    assert split_responses(output.split(sentinel(1))[0], 2) == ["Updated 1 rule(s).\nOk."]
+
+def test_batch_reports_each_command(netsh_path):
+    batch = NetshBatch(netsh_path)
+    batch.add("A", enable_command("A", False))
+    batch.add("B", enable_command("B", False))
+    (key_a, success_a, output_a), (key_b, success_b, output_b) = batch.run()
+    assert (key_a, success_a, output_a) == ("A", True, "Updated 1 rule(s).\nOk.")
+    assert (key_b, success_b, output_b) == ("B", False, "No rules match the specified criteria.")
+
+def test_batch_timeout(netsh_path):
+    batch = NetshBatch(netsh_path, timeout=1)
+    batch.add("A", enable_command("A", False))
+    batch.add("hang", "hang")
+    assert batch.run() == [("A", False, "Command timed out"), ("hang", False, "Command timed out")]
+
+def test_batch_missing_sentinel(netsh_path):
+    batch = NetshBatch(netsh_path)
+    batch.add("A", enable_command("A", False))
+    batch.add("crash", "crash")
+    batch.add("A again", enable_command("A", True))
+    results = batch.run()
+    assert results[0] == ("A", True, "Updated 1 rule(s).\nOk.")
+    assert results[1:] == [("crash", False, "No response from netsh"), ("A again", False, "No response from netsh")]
+
+def test_backend_uses_configured_netsh(netsh_path, monkeypatch):
+    monkeypatch.setenv("OWMEBLOCK_NETSH", netsh_path)
+    backend = NetshBackend(use_session=False)
+    assert [success for _, success, _ in backend.disable_rules(["A", "B"])] == [True, False]
+
+def test_session_restarts_after_process_dies(netsh_path):
+    session = NetshSession(netsh_path)
+    try:
+        assert session.execute(enable_command("A", False)) == (True, "Updated 1 rule(s).\nOk.")
+        first = session.process.pid
+
+        assert session.execute("crash") == (False, "netsh session ended unexpectedly")
+        assert not session.is_alive()
+        assert session.execute(enable_command("A", False)) == (True, "Updated 1 rule(s).\nOk.")
+        assert session.process.pid != first
+    finally:
+        session.close()
+
+def test_session_restarts_after_timeout(netsh_path):
+    session = NetshSession(netsh_path)
+    try:
+        assert session.execute("hang", timeout=1) == (False, "Command timed out")
+        assert not session.is_alive()
+        assert session.execute(enable_command("A", True)) == (True, "Updated 1 rule(s).\nOk.")
+    finally:
+        session.close()
+
+def test_close_interrupts_running_command(netsh_path):
+    session = NetshSession(netsh_path)
+    results = []
+    worker = threading.Thread(target=lambda: results.append(session.execute("hang", timeout=30)))
+    try:
+        worker.start()
+        while not session.lock.locked():
+            time.sleep(0.01)
+        time.sleep(0.2)
+        started = time.monotonic()
+        session.close()
+        worker.join(timeout=5)
+        assert not worker.is_alive()
+        assert time.monotonic() - started < 5
+        assert results == [(False, "netsh session ended unexpectedly")]
+        assert session.execute(enable_command("A", False)) == (True, "Updated 1 rule(s).\nOk.")
+    finally:
+        session.close()
+    assert session.process is None
@@ -0,0 +1,93 @@
+import copy
+import json
+import os
+import stat
+import threading
+import time
+
+from src.core.backends.nftables import NftablesBackend, parse_table, render_ruleset
+from src.core.firewall import FirewallManager
+from src.core.ip_index import merge_intervals, parse_remote_ip
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "nft_owmeblock.json")
+
+# What the fixture was recorded for; the outbound set later got 36.0.0.1-36.0.0.6 added by hand
+RULES = [
+    {"name": "Overwatch MiddleEast - Inbound", "direction": "inbound", "remoteip": "34.1.48.0/20,35.200.1.0-35.200.1.9,10.1.2.3",
+     "enabled": True},
+    {"name": "Overwatch MiddleEast - Outbound", "direction": "outbound", "remoteip": "34.1.48.0/20", "enabled": False},
+]
+
+def read_fixture():
+    with open(FIXTURE, "r", encoding="utf-8") as f:
+        return list(parse_table(json.load(f)))
+
+def intervals(remote_ip: str):
+    return merge_intervals(parse_remote_ip(remote_ip))
+
+class FakeNftables(NftablesBackend):
+    """nftables backend keeping its table in memory, slow enough for changes to overlap"""
+
+    def __init__(self, rules):
+        super().__init__(nft_path="nft")
+        self.table = rules
+        self.read = threading.local()
+
+    def current_rules(self):
+        rules = copy.deepcopy(self.table)
+        # apply_steps edits what it read in place and writes the whole table back
+        self.read.rules = rules
+        time.sleep(0.02)
+        return True, rules
+
+    def run_command(self, command, script=None):
+        assert script == render_ruleset(self.read.rules)
+        self.table = self.read.rules
+        return True, ""
+
+    def batchable(self, name):
+        # Sends every rule through the executor's worker threads
+        return False
+
+def test_concurrent_rule_changes_are_not_lost():
+    names = [f"r{index}" for index in range(4)]
+    backend = FakeNftables([{"name": name, "direction": "inbound", "action": "Block", "remoteip": "34.166.0.0/16",
+                             "enabled": True} for name in names])
+    firewall = FirewallManager(backend)
+
+    results = firewall.disable_rules(names)
+    assert [success for _, success, _ in results] == [True] * 4
+    assert [rule["enabled"] for rule in backend.table] == [False] * 4
+
+def test_parse_recorded_table():
+    assert read_fixture() == [
+        {"name": "Overwatch MiddleEast - Inbound", "enabled": True, "direction": "inbound", "action": "Block",
+         "remoteip": "10.1.2.3,34.1.48.0/20,35.200.1.0/29,35.200.1.8/31"},
+        {"name": "Allow LAN", "enabled": False, "direction": "inbound", "action": "Allow", "remoteip": "192.168.0.0/16"},
+        {"name": "Overwatch MiddleEast - Outbound", "enabled": False, "direction": "outbound", "action": "Block",
+         "remoteip": "34.1.48.0/20,36.0.0.1-36.0.0.6"},
+    ]
+
+def test_rendered_rules_round_trip():
+    script = render_ruleset(RULES)
+    assert "elements = { 10.1.2.3/32, 34.1.48.0/20, 35.200.1.0/29, 35.200.1.8/31 }" in script
+    assert 'ip saddr @overwatch_middleeast_inbound drop comment "Overwatch MiddleEast - Inbound"' in script
+    assert 'ip daddr @overwatch_middleeast_outbound counter comment "Overwatch MiddleEast - Outbound"' in script
+
+    parsed = {rule["name"]: rule for rule in read_fixture()}
+    inbound = parsed["Overwatch MiddleEast - Inbound"]
+    assert (inbound["direction"], inbound["enabled"]) == ("inbound", True)
+    # Prefix, range and single host elements come back as the same addresses
+    assert intervals(inbound["remoteip"]) == intervals(RULES[0]["remoteip"])
+    outbound = parsed["Overwatch MiddleEast - Outbound"]
+    assert (outbound["direction"], outbound["enabled"]) == ("outbound", False)
+    assert intervals(outbound["remoteip"]) == intervals(RULES[1]["remoteip"] + ",36.0.0.1-36.0.0.6")
+
+def test_list_rules_reads_table(tmp_path):
+    nft = tmp_path / "nft"
+    nft.write_text(f'#!/bin/sh\ncat "{FIXTURE}"\n')
+    nft.chmod(nft.stat().st_mode | stat.S_IEXEC)
+    backend = NftablesBackend(str(nft))
+    assert [rule["name"] for rule in backend.list_rules(["Overwatch MiddleEast - Outbound"])] == [
+        "Overwatch MiddleEast - Outbound"]
+    assert backend.last_success
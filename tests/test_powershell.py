@@ -0,0 +1,55 @@
+import base64
+import os
+import stat
+
+from src.core.backends.powershell import (ALL_RULES_SCRIPT, PowerShellBackend, encoded_command, iter_json_rules,
+                                          rules_script)
+from src.core.backends.simulator import SimulatedBackend
+from src.core.firewall import FirewallManager
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "powershell_rules.jsonl")
+
+def read_fixture():
+    with open(FIXTURE, "r", encoding="utf-8") as f:
+        return list(iter_json_rules(f))
+
+def test_decodes_recorded_rules():
+    rules = read_fixture()
+    # The BOM, the warning line and blank lines are skipped
+    assert len(rules) == 7
+    assert rules[0] == {"name": "Overwatch MiddleEast - Inbound", "direction": "inbound", "enabled": True,
+                        "action": "Block", "remoteip": "34.1.48.0/255.255.240.0,34.166.0.0/255.255.0.0"}
+    assert rules[1]["direction"] == "outbound" and rules[1]["enabled"] is False
+    assert [rule["name"] for rule in rules[2:5]] == ["Überwachung Nahost – Blockieren", "ブロック 中東サーバー",
+                                                      "Разрешить DNS"]
+    assert rules[4]["action"] == "Allow"
+    assert rules[6]["remoteip"] == ""
+
+def test_matches_recorded_rules_against_targets():
+    analyzed_rules = FirewallManager(SimulatedBackend()).analyze_records(read_fixture())
+    assert analyzed_rules == {
+        "inbound": {"enabled": ["Overwatch MiddleEast - Inbound"], "disabled": ["ブロック 中東サーバー"]},
+        "outbound": {"enabled": ["Überwachung Nahost – Blockieren"], "disabled": ["Overwatch MiddleEast - Outbound"]},
+    }
+
+def test_rules_script_quotes_names():
+    assert rules_script() == ALL_RULES_SCRIPT
+    script = rules_script(["Overwatch MiddleEast - Inbound", "Joe's rule"])
+    assert "$names = @('Overwatch MiddleEast - Inbound', 'Joe''s rule')" in script
+
+def test_encoded_command_round_trips():
+    script = rules_script(["ブロック"])
+    argv = encoded_command(script)
+    assert argv[-2] == "-EncodedCommand"
+    assert base64.b64decode(argv[-1]).decode("utf-16-le") == script
+
+def test_backend_streams_recorded_output(tmp_path):
+    powershell = tmp_path / "powershell"
+    powershell.write_text(f'#!/bin/sh\ncat "{FIXTURE}"\n')
+    powershell.chmod(powershell.stat().st_mode | stat.S_IEXEC)
+    backend = PowerShellBackend(str(powershell))
+    try:
+        assert list(backend.list_rules()) == read_fixture()
+        assert backend.last_success
+    finally:
+        backend.close()
@@ -0,0 +1,108 @@
+import json
+import time
+
+import pytest
+
+from src.core.app_controller import AppController
+from src.core.backends.simulator import SimulatedBackend
+from src.core.firewall import FirewallManager
+from src.core.profiles import DEFAULT_REGION, NO_REGIONS, ProfileRegistry
+from src.utils.logger import Logger
+from src.utils.state_store import StateStore
+
+from .fakes import FakeWindow
+
+class FailingBackend(SimulatedBackend):
+    """Simulator whose batches fail once failing is set, as if the firewall service went away"""
+
+    failing = False
+
+    def run_batch(self, commands):
+        if self.failing:
+            self._count("run_batch")
+            return [(key, False, "The RPC server is unavailable.") for key, _ in commands]
+        return super().run_batch(commands)
+
+def make_firewall() -> FirewallManager:
+    firewall = FirewallManager(FailingBackend())
+    firewall.profiles.add_region("Europe", ["1.2.3.0/24"])
+    firewall.profiles.add_profile("Everything", [DEFAULT_REGION, "Europe"])
+    return firewall
+
+def enabled_rules(firewall: FirewallManager):
+    return sorted(rule["name"] for rule in firewall.backend.rules if rule["enabled"])
+
+def test_registry():
+    registry = ProfileRegistry()
+    registry.add_region("Europe", ["1.2.3.0/24", "1.2.2.0/24"])
+    assert registry.regions["Europe"].cidrs == ("1.2.2.0/23",)
+    assert registry.regions["Europe"].rule_name == "Overwatch Europe"
+    assert registry.profile_names() == [DEFAULT_REGION, NO_REGIONS, "Europe"]
+    assert registry.region_names() == [DEFAULT_REGION, "Europe"]
+    assert registry.regions_for(NO_REGIONS) == []
+    with pytest.raises(ValueError, match="built in"):
+        registry.add_region(DEFAULT_REGION, ["1.1.1.1"])
+    with pytest.raises(ValueError, match="unknown regions: Asia"):
+        registry.add_profile("Far", ["Asia"])
+    with pytest.raises(ValueError, match="Unknown profile"):
+        registry.regions_for("Far")
+
+def test_load_file(tmp_path):
+    (tmp_path / "asia.txt").write_text("5.6.7.0/24\n", encoding="utf-8")
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps({
+        "regions": {"Europe": ["1.2.3.0/24"], "Asia": {"source": "asia.txt", "rule_name": "OW Asia"}},
+        "profiles": {"Everything": [DEFAULT_REGION, "Europe", "Asia"]},
+    }), encoding="utf-8")
+    registry = ProfileRegistry()
+    registry.load_file(str(path))
+    assert registry.regions["Asia"].cidrs == ("5.6.7.0/24",) and registry.regions["Asia"].rule_name == "OW Asia"
+    assert registry.regions_for("Everything") == [DEFAULT_REGION, "Europe", "Asia"]
+
+def test_switch_is_one_batch():
+    firewall = make_firewall()
+    assert all(success for _, success, _ in firewall.switch_profile("Everything")[1])
+    assert firewall.active_profile == "Everything"
+
+    calls = dict(firewall.backend.calls)
+    success, applied = firewall.switch_profile("Europe")
+    assert success and all(success for _, success, _ in applied)
+    assert firewall.active_profile == "Europe"
+    # Once every region's rules exist, a switch only flips flags, without listing rules first
+    assert firewall.backend.calls["run_batch"] == calls["run_batch"] + 1
+    assert firewall.backend.calls.get("stream_command") == calls.get("stream_command")
+    assert enabled_rules(firewall) == ["Overwatch Europe - Inbound", "Overwatch Europe - Outbound"]
+
+def test_failed_switch_keeps_the_old_profile():
+    firewall = make_firewall()
+    firewall.backend.failing = True
+    success, applied = firewall.switch_profile("Europe")
+    assert success and not any(success for _, success, _ in applied)
+    assert firewall.active_profile == DEFAULT_REGION
+
+    firewall.backend.failing = False
+    firewall.switch_profile("Everything")
+    firewall.backend.failing = True
+    firewall.switch_profile(NO_REGIONS)
+    assert firewall.active_profile == "Everything"
+    # The watcher keeps guarding the rules of the profile still in force
+    assert firewall.expected_state_hash() == firewall.rules_state_hash(
+        dict(rule, action="Block") for rule in firewall.desired_rules("Everything"))
+
+def test_controller_keeps_the_saved_profile_when_a_switch_fails(tmp_path):
+    window = FakeWindow()
+    state_store = StateStore(str(tmp_path / "state.json"))
+    firewall = make_firewall()
+    firewall.backend.failing = True
+    controller = AppController(window, Logger(), firewall, state_store)
+    try:
+        controller.switch_profile("Europe")
+        deadline = time.monotonic() + 5
+        while controller.scheduler.is_busy():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        window.root.run_pending()
+        assert state_store.load_profile() is None
+        assert window.profiles == (firewall.profiles.profile_names(), DEFAULT_REGION)
+    finally:
+        controller.shutdown()
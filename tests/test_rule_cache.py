@@ -0,0 +1,39 @@
+from src.core.backends.simulator import SimulatedBackend
+from src.core.firewall import FirewallManager
+from src.core.reconciler import Step
+
+def sorted_names(analyzed_rules):
+    return {direction: {state: sorted(names) for state, names in states.items()}
+            for direction, states in analyzed_rules.items()}
+
+def cached_and_fresh(firewall: FirewallManager):
+    """Rule names from the snapshot within its TTL, and from a scan that bypasses it"""
+    success, cached = firewall.scan_target_rules(full=True, max_age=firewall.SNAPSHOT_TTL)
+    assert success
+    fresh = firewall.collect_rules(firewall.backend.list_rules()).analyzed()
+    return sorted_names(cached), sorted_names(fresh)
+
+def test_mutations_keep_the_snapshot_current():
+    firewall = FirewallManager(SimulatedBackend())
+    firewall.backend.add_rule("Foreign", remoteip="34.166.0.0/16")
+    firewall.create_firewall_rules()
+    # Takes the snapshot that every later check reads back
+    assert firewall.scan_target_rules(full=True)[0]
+
+    names = ["Foreign", "Overwatch MiddleEast - Inbound"]
+    for mutate in (lambda: firewall.disable_rules(names), lambda: firewall.enable_rules(names[:1]),
+                   lambda: firewall.delete_rules(names[1:]),
+                   # Creates the inbound rule again and a second copy of the outbound one
+                   firewall.create_firewall_rules,
+                   lambda: firewall.apply_plan([Step("disable", "Overwatch MiddleEast - Outbound", "outbound")]),
+                   lambda: firewall.apply_plan([Step("set-remoteip", "Foreign", "inbound", "8.8.8.8")])):
+        mutate()
+        cached, fresh = cached_and_fresh(firewall)
+        assert cached == fresh
+
+def test_set_remoteip_forces_a_rescan():
+    firewall = FirewallManager(SimulatedBackend())
+    firewall.create_firewall_rules()
+    assert firewall.scan_rule_store(full=True)[0]
+    firewall.apply_plan([Step("set-remoteip", "Overwatch MiddleEast - Inbound", "inbound", "8.8.8.8")])
+    assert firewall.snapshot.get_store(full=True, max_age=firewall.SNAPSHOT_TTL) is None
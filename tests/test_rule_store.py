@@ -0,0 +1,39 @@
+from src.core.ip_index import parse_address
+from src.core.rule_store import FirewallRule, RuleStore
+
+def interval(token: str):
+    return parse_address(token)
+
+def make_store() -> RuleStore:
+    return RuleStore([
+        FirewallRule("wide", "inbound", remoteip="34.0.0.0/8"),
+        FirewallRule("narrow", "outbound", enabled=False, remoteip="34.166.1.0/24,35.200.0.1"),
+        FirewallRule("copy", "inbound", remoteip="10.0.0.1"),
+        FirewallRule("copy", "inbound", enabled=False, remoteip="10.0.0.2"),
+    ])
+
+def test_counts_and_names():
+    store = make_store()
+    assert len(store) == 4 and "copy" in store
+    assert store.counts() == {"inbound": {"enabled": 2, "disabled": 1}, "outbound": {"enabled": 0, "disabled": 1}}
+    assert store.names(state="disabled") == ["copy", "narrow"]
+    assert store.analyzed()["inbound"]["enabled"] == ["wide", "copy"]
+
+def test_set_enabled_and_remove_keep_indexes_current():
+    store = make_store()
+    store.set_enabled("copy", True)
+    assert store.counts()["inbound"] == {"enabled": 3, "disabled": 0}
+    assert store.remove("copy") == 2 and store.remove("copy") == 0
+    assert store.names() == ["wide", "narrow"]
+    assert [rule.name for rule in store.overlapping(*interval("10.0.0.0/24"))] == []
+
+def test_overlapping():
+    store = make_store()
+    # The wide range starts long before the query and must still be found
+    assert sorted(rule.name for rule in store.overlapping(*interval("34.166.1.5"))) == ["narrow", "wide"]
+    assert [rule.name for rule in store.overlapping(*interval("35.200.0.0/16"))] == ["narrow"]
+    assert [rule.name for rule in store.overlapping(*interval("10.0.0.2-10.0.0.9"))] == ["copy"]
+    assert store.overlapping(*interval("8.8.8.8")) == []
+
+    store.add(FirewallRule("late", "inbound", remoteip="8.8.8.0/24"))
+    assert [rule.name for rule in store.overlapping(*interval("8.8.8.8"))] == ["late"]
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from src.core.app_controller import AppController
+from src.core.backends.simulator import SimulatedBackend
+from src.core.firewall import FirewallManager
+from src.core.scheduler import OperationScheduler
+from src.utils.logger import Logger
+from src.utils.state_store import StateStore
+
+from .fakes import FakeWindow
+
+class Blocker:
+    """Operation that holds the worker until released"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.started.set()
+        self.release.wait(5)
+
+def wait_idle(scheduler: OperationScheduler):
+    deadline = time.monotonic() + 5
+    while scheduler.is_busy():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+@pytest.fixture
+def scheduler():
+    scheduler = OperationScheduler()
+    yield scheduler
+    scheduler.shutdown()
+
+def running(scheduler: OperationScheduler, kind: str) -> Blocker:
+    blocker = Blocker()
+    assert scheduler.submit(kind, blocker)
+    assert blocker.started.wait(5)
+    return blocker
+
+def test_scan_dropped_while_mutation_runs(scheduler):
+    blocker = running(scheduler, "mutation")
+    assert not scheduler.submit("scan", lambda: None)
+    blocker.release.set()
+
+def test_scan_dropped_while_scan_or_mutation_pending(scheduler):
+    blocker = running(scheduler, "scan")
+    # A scan already running may be outdated, so one more is queued, but only one
+    assert scheduler.submit("scan", lambda: None)
+    assert not scheduler.submit("scan", lambda: None)
+    blocker.release.set()
+    wait_idle(scheduler)
+
+    blocker = running(scheduler, "audit")
+    assert scheduler.submit("mutation", lambda: None)
+    assert not scheduler.submit("scan", lambda: None)
+    blocker.release.set()
+
+def test_watch_dropped_while_anything_runs_or_waits(scheduler):
+    blocker = running(scheduler, "audit")
+    assert not scheduler.submit("watch", lambda: None)
+    blocker.release.set()
+    wait_idle(scheduler)
+    assert scheduler.submit("watch", lambda: None)
+
+def test_mutation_evicts_pending_scans_and_watches(scheduler):
+    ran = []
+    blocker = running(scheduler, "audit")
+    assert scheduler.submit("scan", lambda: ran.append("scan"))
+    assert scheduler.submit("audit", lambda: ran.append("audit"))
+    assert not scheduler.submit("audit", lambda: ran.append("second audit"))
+    assert scheduler.submit("mutation", lambda: ran.append("mutation"))
+    blocker.release.set()
+    wait_idle(scheduler)
+    assert ran == ["audit", "mutation"]
+
+def test_nothing_queued_after_shutdown(scheduler):
+    scheduler.shutdown()
+    assert not scheduler.submit("mutation", lambda: None)
+
+@pytest.fixture
+def controller(tmp_path):
+    window = FakeWindow()
+    controller = AppController(window, Logger(), FirewallManager(SimulatedBackend()),
+                               StateStore(str(tmp_path / "state.json")))
+    yield controller
+    controller.shutdown()
+
+def test_coalesced_scan_leaves_buttons_unlocked(controller):
+    blocker = running(controller.scheduler, "mutation")
+    controller.scan_rules()
+    assert controller.gui.buttons_enabled
+    blocker.release.set()
+
+def test_queued_scan_locks_buttons_until_redrawn(controller):
+    controller.provisional = True
+    controller.displayed = controller.firewall.count_by_state(None)
+    blocker = running(controller.scheduler, "audit")
+    controller.scan_rules()
+    assert not controller.gui.buttons_enabled
+    blocker.release.set()
+    wait_idle(controller.scheduler)
+
+    controller.gui.root.run_pending()
+    # Even though the scan agrees with the display, it redraws so the buttons come back
+    assert controller.gui.buttons_enabled and controller.gui.confirmed == 0
@@ -0,0 +1,71 @@
+import time
+
+from src.core.app_controller import AppController
+from src.core.backends.simulator import SimulatedBackend
+from src.core.firewall import FirewallManager
+from src.utils.logger import Logger
+from src.utils.state_store import StateStore, default_state_path
+
+from .fakes import FakeWindow
+
+RULES = {"inbound": {"enabled": 1, "disabled": 0}, "outbound": {"enabled": 1, "disabled": 0}}
+
+def test_round_trip(tmp_path):
+    store = StateStore(str(tmp_path / "owmeblock" / "state.json"))
+    assert store.save(RULES, "abc")
+    assert store.save_profile("Europe")
+    assert store.load("abc") == RULES
+    # Saving counts keeps the profile and the other way round
+    assert store.save(RULES, "abc") and store.load_profile() == "Europe"
+
+def test_missing_file(tmp_path):
+    store = StateStore(str(tmp_path / "state.json"))
+    assert store.read() == {}
+    assert store.load("abc") is None and store.load_profile() is None
+
+def test_invalid_json(tmp_path):
+    path = tmp_path / "state.json"
+    for content in ("{not json", "[1, 2]", ""):
+        path.write_text(content, encoding="utf-8")
+        store = StateStore(str(path))
+        assert store.load("abc") is None
+        # A corrupt file is simply replaced by the next save
+        assert store.save(RULES, "abc") and store.load("abc") == RULES
+
+def test_fingerprint_mismatch(tmp_path):
+    store = StateStore(str(tmp_path / "state.json"))
+    store.save(RULES, "abc")
+    assert store.load("def") is None
+
+def test_unwritable_location(tmp_path):
+    (tmp_path / "file").write_text("", encoding="utf-8")
+    assert not StateStore(str(tmp_path / "file" / "state.json")).save(RULES, "abc")
+
+def test_default_path(monkeypatch, tmp_path):
+    monkeypatch.setenv("OWMEBLOCK_STATE_FILE", str(tmp_path / "mine.json"))
+    assert default_state_path() == str(tmp_path / "mine.json")
+
+def start_controller(tmp_path, fingerprint_of_saved_state):
+    window = FakeWindow()
+    firewall = FirewallManager(SimulatedBackend())
+    state_store = StateStore(str(tmp_path / "state.json"))
+    state_store.save(RULES, fingerprint_of_saved_state(firewall))
+    controller = AppController(window, Logger(), firewall, state_store)
+    controller.start()
+    deadline = time.monotonic() + 5
+    while controller.scheduler.is_busy():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    controller.shutdown()
+    return window
+
+def test_saved_state_shown_before_the_scan(tmp_path):
+    window = start_controller(tmp_path, lambda firewall: firewall.state_fingerprint())
+    assert window.statuses == [(RULES, True)]
+
+def test_fingerprint_mismatch_forces_a_rescan(tmp_path):
+    window = start_controller(tmp_path, lambda firewall: "saved for other targets")
+    # Nothing shown until the scan finishes, and the buttons wait for it
+    assert window.statuses == [] and not window.buttons_enabled
+    window.root.run_pending()
+    assert window.statuses == [(FirewallManager.count_by_state(None), False)]